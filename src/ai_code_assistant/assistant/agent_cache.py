@@ -0,0 +1,75 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import logging
+from collections import OrderedDict
+from os.path import basename
+from typing import Callable
+
+from langgraph.graph.graph import CompiledGraph
+
+from ai_code_assistant.assistant.interfaces import AiConfig
+
+logger = logging.getLogger(basename(__name__))
+
+AgentKey = tuple[str, tuple[tuple[str, int], ...]]
+
+
+class AgentCache:
+    """
+    A size-bounded cache of compiled agent graphs keyed by the LLM configuration and the tool set.
+
+    Tools are identified by name and instance, so a graph is reused only while its tool instances are reused
+    (see AiTools.load_tools_async()), and the least recently used graphs are dropped first.
+    """
+
+    def __init__(self, max_size: int = 4) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            max_size: The maximum number of graphs to keep.
+        """
+        super().__init__()
+        self._max_size = max_size
+        self._agents: OrderedDict[AgentKey, CompiledGraph] = OrderedDict()
+
+    def get_or_create(self, ai_config: AiConfig, create_agent: Callable[[], CompiledGraph]) -> CompiledGraph:
+        """
+        Gets the graph for the configuration, creating it if it is not cached.
+
+        Args:
+            ai_config: The configuration of the agent.
+            create_agent: Creates the graph on a cache miss.
+
+        Returns:
+            The compiled graph.
+        """
+        key = self.make_key(ai_config)
+        agent = self._agents.get(key)
+        if agent is not None:
+            logger.info("get_or_create(): reuse compiled agent")
+            self._agents.move_to_end(key)
+            return agent
+        agent = create_agent()
+        self._agents[key] = agent
+        if len(self._agents) > self._max_size:
+            self._agents.popitem(last=False)
+        return agent
+
+    @staticmethod
+    def make_key(ai_config: AiConfig) -> AgentKey:
+        """
+        Makes the cache key of a configuration.
+
+        Args:
+            ai_config: The configuration of the agent.
+
+        Returns:
+            The cache key.
+        """
+        return (
+            ai_config.chat_llm.model_dump_json(),
+            tuple((ai_tool.tool_settings.name, id(ai_tool.tool)) for ai_tool in ai_config.tools),
+        )
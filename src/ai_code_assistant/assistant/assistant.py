@@ -3,15 +3,20 @@
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
 import logging
+from collections import deque
 from os.path import basename
 from typing import AsyncIterator, Optional
 
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage, SystemMessage, BaseMessage, AIMessage, ToolMessage
 from langgraph.graph.graph import CompiledGraph
 from langgraph.prebuilt import create_react_agent
 
+from ai_code_assistant.assistant.agent_cache import AgentCache
+from ai_code_assistant.assistant.history import HistoryWindow
 from ai_code_assistant.assistant.interfaces import AiConfig
 from ai_code_assistant.llm.llm import AiLlms
+from ai_code_assistant.tools.context_compression import RetrievalContext, use_retrieval_context
 
 logger = logging.getLogger(basename(__name__))
 
@@ -27,6 +32,7 @@ class AiAssistant:
         *,
         ai_config: AiConfig,
         ai_llms: AiLlms = AiLlms(),
+        agent_cache: Optional[AgentCache] = None,
     ) -> "AiAssistant":
         """
         Asynchronously creates an instance of AiAssistant.
@@ -34,28 +40,38 @@ class AiAssistant:
         Args:
             ai_config: Configuration settings for the AI assistant.
             ai_llms: Instance of AiLlms for creating language models. Defaults to AiLlms().
+            agent_cache: Cache of compiled agents to reuse. The agent is always created if None.
 
         Returns:
             An instance of AiAssistant.
         """
         llm = ai_llms.create_llm(llm_config=ai_config.chat_llm)
-        # AiTool to BaseTool
-        base_tools = [ai_tool.tool for ai_tool in ai_config.tools]
-        agent = create_react_agent(llm, base_tools)
 
-        return AiAssistant(agent, ai_config)
+        def create_agent() -> CompiledGraph:
+            # AiTool to BaseTool
+            base_tools = [ai_tool.tool for ai_tool in ai_config.tools]
+            return create_react_agent(llm, base_tools)
 
-    def __init__(self, agent: CompiledGraph, ai_config: AiConfig) -> None:
+        agent = agent_cache.get_or_create(ai_config, create_agent) if agent_cache else create_agent()
+        return AiAssistant(agent, ai_config, summary_llm=llm)
+
+    def __init__(self, agent: CompiledGraph, ai_config: AiConfig, summary_llm: Optional[BaseChatModel] = None) -> None:
         """
         Initializes the AiAssistant instance.
 
         Args:
             agent: The AI agent used for processing messages.
             ai_config: Configuration settings for the AI assistant.
+            summary_llm: The language model which summarizes older turns of the history.
+                Older turns are dropped without a summary if None.
         """
         self._agent = agent
         self._ai_config = ai_config
-        self._history: list[BaseMessage] = []
+        self._summary_llm = summary_llm
+        self._system: Optional[SystemMessage] = None
+        self._history: deque[BaseMessage] = deque()
+        self._history_window = HistoryWindow(ai_config.history, summary_llm)
+        self._retrieval_context = RetrievalContext()
 
     @property
     def ai_config(self) -> AiConfig:
@@ -67,6 +83,53 @@ class AiAssistant:
         """
         return self._ai_config
 
+    @property
+    def agent(self) -> CompiledGraph:
+        """
+        Gets the AI agent.
+
+        Returns:
+            The AI agent used for processing messages.
+        """
+        return self._agent
+
+    @property
+    def retrieval_context(self) -> RetrievalContext:
+        """
+        Gets the retrieval context of the conversation.
+
+        Returns:
+            The chunks returned by retriever tools so far, and the tokens saved by compressing them.
+        """
+        return self._retrieval_context
+
+    @property
+    def summary_llm(self) -> Optional[BaseChatModel]:
+        """
+        Gets the language model which summarizes older turns of the history.
+
+        Returns:
+            The language model, or None if older turns are dropped without a summary.
+        """
+        return self._summary_llm
+
+    def update_agent(
+        self, agent: CompiledGraph, ai_config: AiConfig, summary_llm: Optional[BaseChatModel] = None
+    ) -> None:
+        """
+        Replaces the AI agent, keeping the message history and its summary.
+
+        Args:
+            agent: The new AI agent.
+            ai_config: Configuration settings of the new AI agent.
+            summary_llm: The language model which summarizes older turns of the history.
+        """
+        self._agent = agent
+        self._ai_config = ai_config
+        self._summary_llm = summary_llm
+        summary = self._history_window.summary
+        self._history_window = HistoryWindow(ai_config.history, summary_llm, summary=summary)
+
     @property
     def system(self) -> Optional[SystemMessage]:
         """
@@ -75,32 +138,39 @@ class AiAssistant:
         Returns:
             The current system message if it exists, otherwise None.
         """
-        filtered = [msg for msg in self._history if isinstance(msg, SystemMessage)]
-        return filtered[-1] if filtered else None
+        return self._system
 
     @system.setter
     def system(self, system: SystemMessage) -> None:
         """
-        Gets the current system message.
+        Sets the system message. Setting the same content again does nothing.
 
-        Returns:
-            The current system message if it exists, otherwise None.
+        Args:
+            system: The new system message.
         """
+        if self._system is not None and self._system.content == system.content:
+            return
         logger.info(f"Setting system message: {system}")
-        # remove old system messages
-        self._history = [msg for msg in self._history if not isinstance(msg, SystemMessage)]
-        # add new system message to head
-        self._history.insert(0, system)
+        self._system = system
+
+    @property
+    def history(self) -> list[BaseMessage]:
+        """
+        Gets the message history, without the system message.
+
+        Returns:
+            A copy of the message history, oldest first.
+        """
+        return list(self._history)
 
     def clear_history(self) -> None:
         """
         Clears the message history, retaining the current system message if it exists.
         """
         logger.info("clear_history()")
-        tmp_system = self.system
         self._history.clear()
-        if tmp_system:
-            self.system = tmp_system
+        self._history_window.clear()
+        self._retrieval_context.forget()
 
     async def ask_async(self, message: HumanMessage) -> AsyncIterator[str]:
         """
@@ -114,8 +184,17 @@ class AiAssistant:
         """
         logger.info(f"ask(): message={message}")
         self._history.append(message)
-        logger.info(f"ask(): history={self._history}")
-        stream_response = self._agent.astream_events({"messages": self._history}, version="v2", stream_mode="updates")
+        history = list(self._history)
+        fitted = await self._history_window.fit_async(history, self._system)
+        if fitted is not history:
+            self._history = deque(fitted)
+            # retrieved chunks may have been trimmed or summarized away, so they may be returned again
+            self._retrieval_context.forget()
+        # The retriever tools run in copies of this context, so they see the retrieval context of this conversation.
+        use_retrieval_context(self._retrieval_context)
+        messages = self._history_window.prompt(fitted, self._system)
+        logger.debug(f"ask(): messages={messages}")
+        stream_response = self._agent.astream_events({"messages": messages}, version="v2", stream_mode="updates")
 
         async for event in stream_response:
             logger.debug(f"ask(): event kind={event['event']}, name={event['name']}")
@@ -0,0 +1,187 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import json
+import logging
+from os.path import basename
+from typing import Iterable, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from ai_code_assistant.assistant.interfaces import HistorySettings
+
+logger = logging.getLogger(basename(__name__))
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TRUNCATED_MARK = "\n... [truncated]"
+
+_SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and a coding assistant.
+Update the current summary with the new part of the conversation.
+Keep the facts, file names, code identifiers, decisions and open questions. Omit greetings and repetition.
+Answer with the updated summary only."""
+
+
+def estimate_tokens(messages: Iterable[BaseMessage]) -> int:
+    """
+    Estimates the number of tokens of messages.
+
+    This is a model-independent approximation (about four characters per token),
+    which is good enough to keep the prompt within a budget.
+
+    Args:
+        messages: The messages.
+
+    Returns:
+        The estimated number of tokens.
+    """
+    return sum(_estimate_message_tokens(message) for message in messages)
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> list[list[BaseMessage]]:
+    """
+    Splits a conversation into turns. Each turn starts with a human message,
+    followed by the AI and tool messages answering it.
+
+    Args:
+        messages: The conversation without system messages.
+
+    Returns:
+        The turns, oldest first.
+    """
+    turns: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class HistoryWindow:
+    """
+    Keeps the conversation history sent to the agent within a token budget.
+
+    When the history exceeds ``max_tokens``, tool outputs of older turns are truncated first.
+    If that is not enough, the oldest turns are folded into a rolling summary, which is sent as part
+    of the system message. The latest ``keep_turns`` turns are always sent as they are.
+    """
+
+    def __init__(
+        self, settings: HistorySettings, summary_llm: Optional[BaseChatModel] = None, summary: str = ""
+    ) -> None:
+        """
+        Initializes the history window.
+
+        Args:
+            settings: The history settings.
+            summary_llm: The language model which summarizes older turns. Older turns are dropped if None.
+            summary: The initial rolling summary.
+        """
+        super().__init__()
+        self._settings = settings
+        self._summary_llm = summary_llm
+        self._summary = summary
+
+    @property
+    def summary(self) -> str:
+        """
+        Gets the rolling summary of the turns which are no longer in the history.
+
+        Returns:
+            The summary, or an empty string if nothing has been summarized.
+        """
+        return self._summary
+
+    def clear(self) -> None:
+        """
+        Clears the rolling summary.
+        """
+        self._summary = ""
+
+    async def fit_async(self, history: list[BaseMessage], system: Optional[SystemMessage]) -> list[BaseMessage]:
+        """
+        Fits the history into the token budget.
+
+        Args:
+            history: The conversation without system messages, oldest first.
+            system: The system message, which always counts against the budget.
+
+        Returns:
+            The history to keep. Older tool outputs may be truncated and older turns removed;
+            the removed turns are folded into the summary.
+        """
+        reserved = estimate_tokens([system]) if system else 0
+        turns = split_turns(history)
+        old_count = max(len(turns) - self._settings.keep_turns, 0)
+        if self.__total_tokens(reserved, turns) <= self._settings.max_tokens or old_count == 0:
+            return history
+
+        max_chars = self._settings.tool_output_tokens * CHARS_PER_TOKEN
+        for turn in turns[:old_count]:
+            for index, message in enumerate(turn):
+                if isinstance(message, ToolMessage) and isinstance(message.content, str):
+                    if len(message.content) > max_chars:
+                        content = message.content[:max_chars] + _TRUNCATED_MARK
+                        turn[index] = message.model_copy(update={"content": content})
+            if self.__total_tokens(reserved, turns) <= self._settings.max_tokens:
+                return [message for turn in turns for message in turn]
+
+        budget = self._settings.max_tokens - reserved - self._settings.summary_tokens
+        dropped: list[BaseMessage] = []
+        while old_count > 0 and self.__total_tokens(0, turns) > budget:
+            dropped.extend(turns.pop(0))
+            old_count -= 1
+        logger.info(f"fit_async(): summarize {len(dropped)} messages")
+        await self.__summarize_async(dropped)
+        return [message for turn in turns for message in turn]
+
+    def prompt(self, history: list[BaseMessage], system: Optional[SystemMessage]) -> list[BaseMessage]:
+        """
+        Builds the messages sent to the agent.
+
+        Args:
+            history: The history returned by fit_async().
+            system: The system message.
+
+        Returns:
+            The system message (with the rolling summary, if any) followed by the history.
+        """
+        if self._summary:
+            summary = f"Summary of the earlier conversation:\n{self._summary}"
+            content = f"{system.content}\n\n{summary}" if system else summary
+            system = SystemMessage(content)
+        return ([system] if system else []) + history
+
+    def __total_tokens(self, reserved: int, turns: list[list[BaseMessage]]) -> int:
+        summary = len(self._summary) // CHARS_PER_TOKEN
+        return reserved + summary + sum(estimate_tokens(turn) for turn in turns)
+
+    async def __summarize_async(self, messages: list[BaseMessage]) -> None:
+        if not messages or self._summary_llm is None or self._settings.summary_tokens == 0:
+            return
+        conversation = "\n".join(f"{message.type}: {_content_text(message)}" for message in messages)
+        request = [
+            SystemMessage(_SUMMARY_PROMPT),
+            HumanMessage(f"Current summary:\n{self._summary}\n\nNew part of the conversation:\n{conversation}"),
+        ]
+        try:
+            response = await self._summary_llm.ainvoke(request)
+        except Exception as error:
+            logger.warning(f"Failed to summarize the history: {error}")
+            return
+        max_chars = self._settings.summary_tokens * CHARS_PER_TOKEN
+        self._summary = _content_text(response)[:max_chars]
+
+
+def _content_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+
+
+def _estimate_message_tokens(message: BaseMessage) -> int:
+    chars = len(_content_text(message))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        chars += len(json.dumps(message.tool_calls, ensure_ascii=False))
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
@@ -4,7 +4,7 @@
 #  http://opensource.org/licenses/mit-license.php
 
 from langchain_core.tools import BaseTool
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from ai_code_assistant.llm.interfaces import LlmConfig
 from ai_code_assistant.tools.interfaces import ToolSettings
@@ -23,6 +23,23 @@ class AiTool(BaseModel):
     tool_settings: ToolSettings
 
 
+class HistorySettings(BaseModel):
+    """
+    Settings of the conversation history sent to the agent on each turn.
+
+    Attributes:
+        max_tokens: The token budget of the prompt history, including the system message and the summary.
+        tool_output_tokens: Tool outputs of older turns are truncated to this many tokens first.
+        summary_tokens: The token budget of the rolling summary of older turns.
+        keep_turns: The number of most recent turns that are never trimmed or summarized.
+    """
+
+    max_tokens: int = Field(default=8000, gt=0)
+    tool_output_tokens: int = Field(default=200, ge=0)
+    summary_tokens: int = Field(default=500, ge=0)
+    keep_turns: int = Field(default=2, ge=1)
+
+
 class AiConfig(BaseModel):
     """
     Configuration for the AI, including language model and tools.
@@ -30,7 +47,9 @@ class AiConfig(BaseModel):
     Attributes:
         chat_llm: The configuration for the chat language model.
         tools: A list of AI tools with their settings.
+        history: The settings of the conversation history.
     """
 
     chat_llm: LlmConfig
     tools: list[AiTool]
+    history: HistorySettings = HistorySettings()
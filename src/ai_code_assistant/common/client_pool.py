@@ -0,0 +1,95 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import logging
+import os
+import threading
+from os.path import basename
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(basename(__name__))
+
+T = TypeVar("T")
+
+
+def endpoint_from_env(*names: str) -> Optional[str]:
+    """
+    Gets the endpoint a model client connects to, as configured by environment variables.
+
+    Args:
+        names: The names of the environment variables, in order of precedence.
+
+    Returns:
+        The value of the first variable which is set, or None if the client uses its default endpoint.
+    """
+    return next((os.environ[name] for name in names if os.environ.get(name)), None)
+
+
+class ClientPool(Generic[T]):
+    """
+    A registry of model clients which reuses one client per key.
+
+    Model clients own an HTTP client with a keep-alive connection pool,
+    so sharing them across tools and assistant rebuilds avoids setting up new connections per instance.
+
+    The connections of async HTTP clients are bound to the event loop they were opened on,
+    so there is one client per key and running event loop (or none, for calls outside of an event loop).
+    Clients of event loops which have been closed are dropped.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Initializes the pool.
+
+        Args:
+            name: The name of the pool, used in log messages.
+        """
+        super().__init__()
+        self._name = name
+        self._clients: dict[tuple[Hashable, Optional[asyncio.AbstractEventLoop]], T] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Hashable, create_client: Callable[[], T]) -> T:
+        """
+        Gets the client for the key and the running event loop, creating it on first use.
+
+        Args:
+            key: Identifies the client, e.g. the service, the model and the endpoint.
+            create_client: Creates the client if there is none for the key.
+
+        Returns:
+            The shared client.
+        """
+        loop_key = (key, _running_loop())
+        with self._lock:
+            self.__drop_closed_loops()
+            client = self._clients.get(loop_key)
+            if client is None:
+                logger.info(f"{self._name}: create client key={key} loop={id(loop_key[1]):x}")
+                client = create_client()
+                self._clients[loop_key] = client
+            return client
+
+    def clear(self) -> None:
+        """
+        Removes all clients, so that the next request creates new ones.
+        """
+        with self._lock:
+            self._clients.clear()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def __drop_closed_loops(self) -> None:
+        for key, loop in [key for key in self._clients if key[1] is not None and key[1].is_closed()]:
+            logger.info(f"{self._name}: drop client key={key} of a closed event loop")
+            del self._clients[(key, loop)]
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
@@ -35,6 +35,7 @@ class ChatState:
         system_prompt_tab: Indicates if the system prompt tab is active.
         chat_history: The history of chat messages.
         in_progress: Indicates if a chat operation is in progress.
+        session_id: Identifies the conversation of this browser session on the server.
     """
 
     user_input: str
@@ -42,3 +43,4 @@ class ChatState:
     system_prompt_tab: bool = False
     chat_history: list[ChatUiMessage]
     in_progress: bool = False
+    session_id: str = ""
@@ -62,11 +62,14 @@ def tool_settings_page() -> None:
     tool_settings_ui(ai_assistant)
 
 
-def transform(sentence: str, system_prompt: str, history: list[ChatUiMessage]) -> Generator[str, None, None]:
+def transform(
+    session_id: str, sentence: str, system_prompt: str, history: list[ChatUiMessage]
+) -> Generator[str, None, None]:
     """
     Transforms the user input into a response from the AI Assistant.
 
     Args:
+        session_id: The ID of the chat session.
         sentence: The user input sentence.
         system_prompt: The system prompt to guide the AI Assistant.
         history: The history of chat messages.
@@ -75,9 +78,9 @@ def transform(sentence: str, system_prompt: str, history: list[ChatUiMessage]) -
         The response from the AI Assistant.
     """
     if not history:
-        ai_assistant_model.clear_history()
-    ai_assistant_model.system = system_prompt
+        ai_assistant_model.clear_history(session_id)
+    ai_assistant_model.set_system(session_id, system_prompt)
     try:
-        yield from ai_assistant_model.ask(sentence)
+        yield from ai_assistant_model.ask(session_id, sentence)
     except StopIteration as error:
         logger.info(f"transform(): StopIteration={error.value}")
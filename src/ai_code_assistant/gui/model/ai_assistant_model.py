@@ -2,21 +2,30 @@
 #
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
-import asyncio
 import logging
-import os
-import tempfile
+import asyncio
 from os.path import basename
-from typing import Generator, AsyncGenerator
+from typing import Generator, AsyncGenerator, BinaryIO
 
 from langchain_core.messages import SystemMessage, HumanMessage
 
+from ai_code_assistant.assistant.agent_cache import AgentCache
 from ai_code_assistant.assistant.assistant import AiAssistant
 from ai_code_assistant.assistant.interfaces import AiConfig
 from ai_code_assistant.common.app_context import AppContext
+from ai_code_assistant.gui.model.session_manager import SessionManager
 from ai_code_assistant.llm.interfaces import LlmConfig
 from ai_code_assistant.tools.ai_tools import AiTools
-from ai_code_assistant.tools.interfaces import ToolSettings, RetrieverToolSettings, ToolType
+from ai_code_assistant.tools.indexing_jobs import IndexingJobQueue, IndexingJob, INDEXING_JOBS_FILE_NAME
+from ai_code_assistant.tools.interfaces import (
+    ToolSettings,
+    RetrieverToolSettings,
+    ToolType,
+    RetrieverSearchSettings,
+    ProgressCallback,
+)
+from ai_code_assistant.tools.pdf_source import pdf_upload_path, save_pdf_upload
+from ai_code_assistant.utils.async_bridge import BackgroundEventLoop
 
 logger = logging.getLogger(basename(__name__))
 
@@ -29,16 +38,18 @@ class AiAssistantModel:
     _ai_assistant: AiAssistant
     _ai_tools: AiTools
     _llm_config: LlmConfig
-    _loop: asyncio.AbstractEventLoop
+    _event_loop: BackgroundEventLoop
     _app_context: AppContext
+    _agent_cache: AgentCache
 
     def __init__(
         self,
         ai_assistant: AiAssistant,
         ai_tools: AiTools,
         llm_config: LlmConfig,
-        loop: asyncio.AbstractEventLoop,
+        event_loop: BackgroundEventLoop,
         app_context: AppContext,
+        agent_cache: AgentCache,
     ) -> None:
         """
         Initializes the AiAssistantModel.
@@ -47,15 +58,19 @@ class AiAssistantModel:
             ai_assistant: The AI assistant instance.
             ai_tools: The AI tools instance.
             llm_config: The LLM configuration.
-            loop: The event loop.
+            event_loop: The event loop the AI assistant is run on.
             app_context: The application context.
+            agent_cache: The cache of compiled agents.
         """
         super().__init__()
         self._ai_assistant = ai_assistant
         self._ai_tools = ai_tools
         self._llm_config = llm_config
-        self._loop = loop
+        self._event_loop = event_loop
         self._app_context = app_context
+        self._agent_cache = agent_cache
+        self._sessions = SessionManager(self.__create_session)
+        self._indexing_jobs = IndexingJobQueue(event_loop.loop, app_context.data_dir / INDEXING_JOBS_FILE_NAME)
 
     @classmethod
     async def create(cls, app_context: AppContext) -> "AiAssistantModel":
@@ -70,12 +85,17 @@ class AiAssistantModel:
         """
         llm_config = LlmConfig.load_from_file(app_context.data_dir)
         ai_tools = AiTools(app_context)
-        assistant = await cls.__create_ai_assistant(ai_tools, llm_config)
-        loop = asyncio.new_event_loop()
-        return AiAssistantModel(assistant, ai_tools, llm_config, loop, app_context)
+        agent_cache = AgentCache()
+        event_loop = BackgroundEventLoop("ai-assistant-loop")
+        # the pooled model clients are bound to the event loop they are created and warmed up on,
+        # so the assistant is created on the loop it is run on rather than on the caller's loop
+        assistant = await event_loop.run_async(cls.__create_ai_assistant(ai_tools, llm_config, agent_cache))
+        return AiAssistantModel(assistant, ai_tools, llm_config, event_loop, app_context, agent_cache)
 
     @classmethod
-    async def __create_ai_assistant(cls, ai_tools: AiTools, llm_config: LlmConfig) -> AiAssistant:
+    async def __create_ai_assistant(
+        cls, ai_tools: AiTools, llm_config: LlmConfig, agent_cache: AgentCache
+    ) -> AiAssistant:
         logger.info("__create_ai_assistant() start")
 
         tools = await ai_tools.load_tools_async()
@@ -87,7 +107,7 @@ class AiAssistantModel:
             chat_llm=llm_config,
             tools=tools,
         )
-        return await AiAssistant.create_async(ai_config=ai_config)
+        return await AiAssistant.create_async(ai_config=ai_config, agent_cache=agent_cache)
 
     @property
     def tools(self) -> list[ToolSettings]:
@@ -123,6 +143,59 @@ class AiAssistantModel:
         await self.update_assistant(self._llm_config)
         return removed
 
+    @property
+    def indexing_jobs(self) -> list[IndexingJob]:
+        """
+        Gets the indexing jobs.
+
+        Returns:
+            Snapshots of the queued, running and recently finished jobs, newest first.
+        """
+        return self._indexing_jobs.jobs
+
+    def cancel_indexing_job(self, job_id: str) -> bool:
+        """
+        Cancels an indexing job.
+
+        Args:
+            job_id: The ID of the job.
+
+        Returns:
+            True if the job was active and is being cancelled.
+        """
+        return self._indexing_jobs.cancel(job_id)
+
+    def refresh_tool(self, tool_name: str) -> IndexingJob:
+        """
+        Starts refreshing the index of a retriever tool in the background.
+
+        Args:
+            tool_name: The name of the tool to refresh.
+
+        Returns:
+            The indexing job.
+
+        Raises:
+            ValueError: If an indexing job for the tool is already active.
+        """
+
+        async def refresh_async(progress: ProgressCallback) -> None:
+            await self._ai_tools.refresh_tool_async(tool_name, progress)
+            await self.update_assistant(self._llm_config)
+
+        return self._indexing_jobs.submit(tool_name, f"Refresh {tool_name}", refresh_async)
+
+    async def update_search_settings(self, tool_name: str, search: RetrieverSearchSettings) -> None:
+        """
+        Updates the search settings of a retriever tool.
+
+        Args:
+            tool_name: The name of the tool.
+            search: The new search settings.
+        """
+        await self._ai_tools.update_search_settings_async(tool_name, search)
+        await self.update_assistant(self._llm_config)
+
     async def add_google_search(self) -> None:
         """
         Adds the Google Search tool.
@@ -130,42 +203,59 @@ class AiAssistantModel:
         await self._ai_tools.create_tool_async(ToolSettings(type=ToolType.BUILTIN, name="google-search", enabled=True))
         await self.update_assistant(self._llm_config)
 
-    async def add_pdf_source(self, source_name: str, content: bytes) -> None:
+    def add_pdf_source(self, source_name: str, upload: BinaryIO) -> IndexingJob:
         """
-        Adds a PDF source tool.
+        Starts adding a PDF source tool in the background.
+
+        The upload is written in chunks to a file under the data directory, which is kept for re-indexing.
 
         Args:
             source_name: The name of the PDF source.
-            content: The content of the PDF file.
-        """
-        file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        file.write(content)
-        file.close()
-        file_path = file.name
-        logger.info(f"add_pdf_source() : {source_name} : {file_path}")
-        await self._ai_tools.create_tool_async(
-            RetrieverToolSettings.of_pdf_source(source_name=source_name, file_path=file_path)
-        )
-        await self.update_assistant(self._llm_config)
-        os.unlink(file_path)
+            upload: The uploaded PDF file.
+
+        Returns:
+            The indexing job.
 
-    async def add_git_source(self, source_name: str, clone_url: str, branch: str) -> None:
+        Raises:
+            ValueError: If the source name is not a valid tool name,
+                or an indexing job for the source is already active.
         """
-        Adds a Git source tool.
+        file_path = pdf_upload_path(self._app_context, source_name)
+
+        async def add_async(progress: ProgressCallback) -> None:
+            size = await asyncio.to_thread(save_pdf_upload, upload, file_path)
+            logger.info(f"add_pdf_source() : {source_name} : {file_path} ({size} bytes)")
+            tool_settings = RetrieverToolSettings.of_pdf_source(source_name=source_name, file_path=str(file_path))
+            await self.__create_tool_async(tool_settings, progress)
+
+        return self._indexing_jobs.submit(source_name, f"Add PDF source {source_name}", add_async)
+
+    def add_git_source(self, source_name: str, clone_url: str, branch: str) -> IndexingJob:
+        """
+        Starts adding a Git source tool in the background.
 
         Args:
             source_name: The name of the Git source.
             clone_url: The URL to clone the repository from.
             branch: The branch to clone.
+
+        Returns:
+            The indexing job.
+
+        Raises:
+            ValueError: If the source name is not a valid tool name,
+                or an indexing job for the source is already active.
         """
-        await self._ai_tools.create_tool_async(
-            RetrieverToolSettings.of_git_source(
-                source_name=source_name,
-                clone_url=clone_url,
-                branch=branch,
-            )
+        tool_settings = RetrieverToolSettings.of_git_source(
+            source_name=source_name,
+            clone_url=clone_url,
+            branch=branch,
+        )
+        return self._indexing_jobs.submit(
+            source_name,
+            f"Add Git source {source_name} ({clone_url} {branch})",
+            lambda progress: self.__create_tool_async(tool_settings, progress),
         )
-        await self.update_assistant(self._llm_config)
 
     async def update_assistant(self, llm_config: LlmConfig) -> None:
         """
@@ -177,70 +267,81 @@ class AiAssistantModel:
         logger.info(f"update_assistant() : {llm_config}")
         self._llm_config = llm_config
         llm_config.save_to_file(self._app_context.data_dir)
-        self._ai_assistant = await self.__create_ai_assistant(self._ai_tools, llm_config)
+        self._ai_assistant = await self._event_loop.run_async(
+            self.__create_ai_assistant(self._ai_tools, llm_config, self._agent_cache)
+        )
+        for session in self._sessions.assistants():
+            session.update_agent(self._ai_assistant.agent, self._ai_assistant.ai_config, self._ai_assistant.summary_llm)
 
-    @property
-    def system(self) -> str:
+    def get_system(self, session_id: str) -> str:
         """
-        Gets the system message.
+        Gets the system message of a session.
+
+        Args:
+            session_id: The GUI session ID.
 
         Returns:
             str: The system message content.
         """
-        system_message = self._ai_assistant.system
+        system_message = self._sessions.get(session_id).system
         return str(system_message.content) if system_message else ""
 
-    @system.setter
-    def system(self, system_prompt: str) -> None:
+    def set_system(self, session_id: str, system_prompt: str) -> None:
         """
-        Sets the system message.
+        Sets the system message of a session.
 
         Args:
-            system_prompt: The new system message content.
+            session_id: The GUI session ID.
+            system_prompt: The new system message content. Nothing is done if it is unchanged.
         """
-        new_message = SystemMessage(system_prompt)
-        logger.info(f"Setting system message: {new_message}")
-        self._ai_assistant.system = new_message
+        self._sessions.get(session_id).system = SystemMessage(system_prompt)
 
-    def clear_history(self) -> None:
+    def clear_history(self, session_id: str) -> None:
         """
-        Clears the message history.
+        Clears the message history of a session.
+
+        Args:
+            session_id: The GUI session ID.
         """
-        self._ai_assistant.clear_history()
+        self._sessions.get(session_id).clear_history()
 
-    def ask(self, sentence: str) -> Generator[str, None, None]:
+    def ask(self, session_id: str, sentence: str) -> Generator[str, None, None]:
         """
-        Asks a question to the AI assistant.
+        Asks a question to the AI assistant in a session.
 
         Args:
+            session_id: The GUI session ID.
             sentence: The question to ask.
 
         Returns:
             The response from the AI assistant.
         """
         new_message = HumanMessage(sentence)
-        ask_gen = self.__sync_ask(new_message)
+        ask_gen = self.__sync_ask(self._sessions.get(session_id), new_message)
         try:
             yield from ask_gen
         except StopIteration:
             # nothing to do
             pass
 
-    def __sync_ask(self, message: HumanMessage) -> Generator[str, None, str]:
-        gen = self.__ask_async(message)
+    async def __create_tool_async(self, tool_settings: ToolSettings, progress: ProgressCallback) -> None:
+        await self._ai_tools.create_tool_async(tool_settings, progress)
+        await self.update_assistant(self._llm_config)
+
+    def __create_session(self) -> AiAssistant:
+        return AiAssistant(
+            self._ai_assistant.agent, self._ai_assistant.ai_config, summary_llm=self._ai_assistant.summary_llm
+        )
+
+    def __sync_ask(self, session: AiAssistant, message: HumanMessage) -> Generator[str, None, str]:
         all_str = ""
-        while True:
-            try:
-                assert self._loop
-                str_value: str = self._loop.run_until_complete(gen.__anext__())
-                yield str_value
-                all_str += str_value
-            except StopAsyncIteration:
-                break
+        for str_value in self._event_loop.iterate(self.__ask_async(session, message)):
+            yield str_value
+            all_str += str_value
         return all_str
 
-    async def __ask_async(self, message: HumanMessage) -> AsyncGenerator[str, None]:
-        assert self._ai_assistant
-        a_result = self._ai_assistant.ask_async(message)
+    @staticmethod
+    async def __ask_async(session: AiAssistant, message: HumanMessage) -> AsyncGenerator[str, None]:
+        a_result = session.ask_async(message)
         async for result in a_result:
             yield result
@@ -0,0 +1,100 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import logging
+import threading
+import time
+from collections import OrderedDict
+from os.path import basename
+from typing import Callable
+
+from ai_code_assistant.assistant.assistant import AiAssistant
+
+logger = logging.getLogger(basename(__name__))
+
+
+class SessionManager:
+    """
+    Maps GUI session IDs to per-session AiAssistant instances.
+
+    Session assistants only hold the conversation; the agent (LLM client, tools and compiled graph)
+    is shared by all sessions. The least recently used sessions are evicted when there are more than
+    ``max_sessions``, and sessions idle for longer than ``idle_timeout_seconds`` are evicted too.
+    """
+
+    def __init__(
+        self,
+        create_session: Callable[[], AiAssistant],
+        max_sessions: int = 64,
+        idle_timeout_seconds: float = 60 * 60,
+    ) -> None:
+        """
+        Initializes the session manager.
+
+        Args:
+            create_session: Creates the assistant of a new session.
+            max_sessions: The maximum number of sessions to keep.
+            idle_timeout_seconds: Sessions not used for this many seconds are evicted.
+        """
+        super().__init__()
+        self._create_session = create_session
+        self._max_sessions = max_sessions
+        self._idle_timeout_seconds = idle_timeout_seconds
+        self._sessions: OrderedDict[str, tuple[AiAssistant, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> AiAssistant:
+        """
+        Gets the assistant of a session, creating it if the session is new or has been evicted.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The assistant of the session.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if session_id in self._sessions:
+                assistant, _ = self._sessions.pop(session_id)
+            else:
+                logger.info(f"Create session {session_id}")
+                assistant = self._create_session()
+            self._sessions[session_id] = (assistant, now)
+            self.__evict(now)
+            return assistant
+
+    def remove(self, session_id: str) -> None:
+        """
+        Removes a session.
+
+        Args:
+            session_id: The session ID.
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def assistants(self) -> list[AiAssistant]:
+        """
+        Gets the assistants of all sessions.
+
+        Returns:
+            The assistants of all sessions.
+        """
+        with self._lock:
+            return [assistant for assistant, _ in self._sessions.values()]
+
+    def __evict(self, now: float) -> None:
+        while len(self._sessions) > self._max_sessions:
+            session_id, _ = self._sessions.popitem(last=False)
+            logger.info(f"Evict session {session_id}")
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self._idle_timeout_seconds:
+                break
+            self._sessions.popitem(last=False)
+            logger.info(f"Evict idle session {session_id}")
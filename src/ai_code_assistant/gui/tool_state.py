@@ -17,8 +17,17 @@ class ToolState:
         git_branch: The branch of the Git repository to use.
         git_source_name: The name of the source for the Git repository.
         pdf_source_name: The name of the source for PDF files.
+        indexing_error: Why the last indexing job could not be submitted, empty if it was submitted.
         llm_provider: The provider of the large language model (LLM).
         llm_model: The specific model of the LLM to use.
+        search_tool_name: The name of the retriever tool whose search settings are edited.
+        search_type: The search type of the retriever tool.
+        search_k: The number of chunks to return, as entered.
+        search_fetch_k: The number of chunks to fetch before re-ranking or filtering, as entered.
+        search_score_threshold: The minimum relevance score, as entered.
+        search_extensions: Comma separated file extensions to search.
+        search_path_patterns: Comma separated glob patterns of file paths to search.
+        search_error: Why the last search settings could not be applied, empty if they were applied.
     """
 
     initialized: bool = False
@@ -26,5 +35,14 @@ class ToolState:
     git_branch: str = "develop"
     git_source_name: str = "ai_code_assistant"
     pdf_source_name: str = ""
+    indexing_error: str = ""
     llm_provider: str = ""
     llm_model: str = ""
+    search_tool_name: str = ""
+    search_type: str = "similarity"
+    search_k: str = "4"
+    search_fetch_k: str = "20"
+    search_score_threshold: str = ""
+    search_extensions: str = ""
+    search_path_patterns: str = ""
+    search_error: str = ""
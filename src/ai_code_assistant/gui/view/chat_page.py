@@ -3,6 +3,7 @@
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
 import time
+import uuid
 from typing import Callable, Generator, Any
 
 import mesop as me
@@ -110,7 +111,7 @@ def on_system_prompt_blur(e: me.InputBlurEvent) -> None:
 
 
 def chat_ui(
-    transform: Callable[[str, str, list[ChatUiMessage]], Generator[str, None, None] | str],
+    transform: Callable[[str, str, str, list[ChatUiMessage]], Generator[str, None, None] | str],
     *,
     title: str,
     bot_user: str,
@@ -120,6 +121,7 @@ def chat_ui(
 
     Args:
         transform: A function that processes the user input and returns the assistant's response.
+            It receives the session ID, the user input, the system prompt and the chat history.
         title: The title of the chat UI.
         bot_user: The name of the bot user.
     """
@@ -130,6 +132,8 @@ def chat_ui(
             return
         chat_input = chat_state.user_input
         chat_system_prompt = chat_state.system_prompt
+        if not chat_state.session_id:
+            chat_state.session_id = uuid.uuid4().hex
         chat_state.user_input = ""
         yield
 
@@ -147,7 +151,7 @@ def chat_ui(
         yield
 
         start_time = time.time()
-        output_message = transform(chat_input, chat_system_prompt, current_history)
+        output_message = transform(chat_state.session_id, chat_input, chat_system_prompt, current_history)
         assistant_message = ChatUiMessage(role="assistant")
         output.append(assistant_message)
         chat_state.chat_history = output
@@ -7,10 +7,13 @@ from os.path import basename
 from typing import Callable
 
 import mesop as me
+from pydantic import ValidationError
 
 from ai_code_assistant.gui.model.ai_assistant_model import AiAssistantModel
 from ai_code_assistant.gui.tool_state import ToolState
 from ai_code_assistant.llm.interfaces import LlmConfig
+from ai_code_assistant.tools.indexing_jobs import IndexingJob, StageProgress
+from ai_code_assistant.tools.interfaces import ToolType, RetrieverToolSettings, RetrieverSearchSettings
 
 logger = logging.getLogger(basename(__name__))
 
@@ -146,6 +149,91 @@ def tool_settings_ui(ai_assistant: Callable[[], AiAssistantModel]) -> None:
                     on_click=lambda event: on_add_google_search(event, ai_assistant()),
                 )
 
+            with me.box(style=_CONTENT_GROUP):
+                me.text("Indexing Jobs")
+                if state.indexing_error:
+                    me.text(state.indexing_error, style=me.Style(color="red"))
+                for job in ai_assistant().indexing_jobs:
+                    with me.box():
+                        me.text(f"{job.description}: [{job.status.value}]")
+                        for stage, stage_progress in job.stages.items():
+                            me.text(f"{stage.value}: {_format_stage_progress(stage_progress)}")
+                        if job.error:
+                            me.text(job.error)
+                        if job.active:
+                            me.button(
+                                "Cancel",
+                                key=f"cancel-{job.id}",
+                                on_click=lambda event: on_cancel_indexing_job(event, ai_assistant()),
+                            )
+                me.button("Update Progress", on_click=on_update_indexing_jobs)
+
+            retriever_tools = [tool for tool in ai_assistant().tools if isinstance(tool, RetrieverToolSettings)]
+            if retriever_tools:
+                with me.box(style=_CONTENT_GROUP):
+                    me.text("Retriever Search Settings")
+                    me.select(
+                        label="Retriever",
+                        appearance="outline",
+                        style=_STYLE_INPUT_WIDTH,
+                        options=[me.SelectOption(label=tool.name, value=tool.name) for tool in retriever_tools],
+                        value=state.search_tool_name,
+                        on_selection_change=lambda event: on_search_tool_changed(event, ai_assistant()),
+                    )
+                    me.radio(
+                        on_change=on_search_type_changed,
+                        options=[
+                            me.RadioOption(label="Similarity", value="similarity"),
+                            me.RadioOption(label="MMR", value="mmr"),
+                            me.RadioOption(label="Similarity Score Threshold", value="similarity_score_threshold"),
+                        ],
+                        value=state.search_type,
+                    )
+                    me.input(
+                        label="Top K",
+                        appearance="outline",
+                        style=_STYLE_INPUT_WIDTH,
+                        value=state.search_k,
+                        on_blur=on_search_k_blur,
+                    )
+                    me.input(
+                        label="Fetch K (MMR candidates, or candidates before path filtering)",
+                        appearance="outline",
+                        style=_STYLE_INPUT_WIDTH,
+                        value=state.search_fetch_k,
+                        on_blur=on_search_fetch_k_blur,
+                    )
+                    me.input(
+                        label="Score Threshold (0-1)",
+                        appearance="outline",
+                        style=_STYLE_INPUT_WIDTH,
+                        value=state.search_score_threshold,
+                        on_blur=on_search_score_threshold_blur,
+                    )
+                    me.input(
+                        label="File Extensions (comma separated, e.g. .py, .md)",
+                        appearance="outline",
+                        style=_STYLE_INPUT_WIDTH,
+                        value=state.search_extensions,
+                        on_blur=on_search_extensions_blur,
+                    )
+                    me.input(
+                        label="Path Patterns (comma separated, e.g. src/*)",
+                        appearance="outline",
+                        style=_STYLE_INPUT_WIDTH,
+                        value=state.search_path_patterns,
+                        on_blur=on_search_path_patterns_blur,
+                    )
+                    me.button(
+                        "Apply Search Settings",
+                        color="primary",
+                        type="flat",
+                        disabled=not state.search_tool_name,
+                        on_click=lambda event: on_apply_search_settings(event, ai_assistant()),
+                    )
+                    if state.search_error:
+                        me.text(state.search_error, style=me.Style(color="red"))
+
             with me.box(style=_CONTENT_GROUP):
                 me.text(f"Enabled Tools: {len(ai_assistant().tools)}")
 
@@ -157,6 +245,12 @@ def tool_settings_ui(ai_assistant: Callable[[], AiAssistantModel]) -> None:
                             key=tool.name,
                             on_click=lambda event: ai_assistant().remove_tool(event.key),
                         )
+                        if tool.type == ToolType.RETRIEVER:
+                            me.button(
+                                f"Refresh {tool.name}",
+                                key=f"refresh-{tool.name}",
+                                on_click=lambda event: on_refresh_tool(event, ai_assistant()),
+                            )
 
             me.button(
                 "Exit Setting page",
@@ -164,10 +258,9 @@ def tool_settings_ui(ai_assistant: Callable[[], AiAssistantModel]) -> None:
             )
 
 
-async def handle_upload(event: me.UploadEvent, assistant: AiAssistantModel) -> None:
+def handle_upload(event: me.UploadEvent, assistant: AiAssistantModel) -> None:
     state = me.state(ToolState)
-    all_data = event.file.read(event.file.size)
-    await assistant.add_pdf_source(state.pdf_source_name, all_data)
+    _submit_indexing_job(lambda: assistant.add_pdf_source(state.pdf_source_name, event.file))
 
 
 def on_clone_url_blur(e: me.InputBlurEvent) -> None:
@@ -194,14 +287,126 @@ async def on_add_google_search(_: me.ClickEvent, assistant: AiAssistantModel) ->
     await assistant.add_google_search()
 
 
-async def on_add_git_source(_: me.ClickEvent, assistant: AiAssistantModel) -> None:
+def on_add_git_source(_: me.ClickEvent, assistant: AiAssistantModel) -> None:
     state: ToolState = me.state(ToolState)
-    await assistant.add_git_source(state.git_source_name, state.git_clone_url, state.git_branch)
+    _submit_indexing_job(lambda: assistant.add_git_source(state.git_source_name, state.git_clone_url, state.git_branch))
     # state.git_source_name = ""
     # state.git_clone_url = ""
     # state.git_branch = ""
 
 
+def on_refresh_tool(event: me.ClickEvent, assistant: AiAssistantModel) -> None:
+    _submit_indexing_job(lambda: assistant.refresh_tool(event.key.removeprefix("refresh-")))
+
+
+def on_cancel_indexing_job(event: me.ClickEvent, assistant: AiAssistantModel) -> None:
+    assistant.cancel_indexing_job(event.key.removeprefix("cancel-"))
+
+
+def on_update_indexing_jobs(_: me.ClickEvent) -> None:
+    # the page is rendered with the latest progress after every event
+    pass
+
+
+def _submit_indexing_job(submit: Callable[[], IndexingJob]) -> None:
+    state = me.state(ToolState)
+    try:
+        submit()
+        state.indexing_error = ""
+    except ValueError as error:
+        state.indexing_error = str(error)
+
+
+def _format_stage_progress(stage_progress: StageProgress) -> str:
+    if stage_progress.total:
+        return f"{stage_progress.processed} / {stage_progress.total}"
+    return str(stage_progress.processed)
+
+
+def on_search_tool_changed(event: me.SelectSelectionChangeEvent, assistant: AiAssistantModel) -> None:
+    state = me.state(ToolState)
+    state.search_tool_name = event.value
+    state.search_error = ""
+    for tool in assistant.tools:
+        if isinstance(tool, RetrieverToolSettings) and tool.name == event.value:
+            search = tool.search
+            state.search_type = search.search_type
+            state.search_k = str(search.k)
+            state.search_fetch_k = str(search.fetch_k)
+            state.search_score_threshold = "" if search.score_threshold is None else str(search.score_threshold)
+            state.search_extensions = ", ".join(search.include_extensions)
+            state.search_path_patterns = ", ".join(search.path_patterns)
+
+
+def on_search_type_changed(event: me.RadioChangeEvent) -> None:
+    state = me.state(ToolState)
+    state.search_type = event.value
+
+
+def on_search_k_blur(e: me.InputBlurEvent) -> None:
+    state = me.state(ToolState)
+    state.search_k = e.value
+
+
+def on_search_fetch_k_blur(e: me.InputBlurEvent) -> None:
+    state = me.state(ToolState)
+    state.search_fetch_k = e.value
+
+
+def on_search_score_threshold_blur(e: me.InputBlurEvent) -> None:
+    state = me.state(ToolState)
+    state.search_score_threshold = e.value
+
+
+def on_search_extensions_blur(e: me.InputBlurEvent) -> None:
+    state = me.state(ToolState)
+    state.search_extensions = e.value
+
+
+def on_search_path_patterns_blur(e: me.InputBlurEvent) -> None:
+    state = me.state(ToolState)
+    state.search_path_patterns = e.value
+
+
+async def on_apply_search_settings(_: me.ClickEvent, assistant: AiAssistantModel) -> None:
+    state: ToolState = me.state(ToolState)
+    tool = next(
+        (
+            tool
+            for tool in assistant.tools
+            if isinstance(tool, RetrieverToolSettings) and tool.name == state.search_tool_name
+        ),
+        None,
+    )
+    if tool is None:
+        state.search_error = f"{state.search_tool_name} is not a retriever tool."
+        return
+    # settings which are not edited here (e.g. lambda_mult, lexical_weight) are kept,
+    # and the entered values are converted and checked by the validation of the settings
+    update = {
+        "search_type": state.search_type,
+        "k": state.search_k.strip(),
+        "fetch_k": state.search_fetch_k.strip(),
+        "score_threshold": state.search_score_threshold.strip() or None,
+        "include_extensions": _split_comma_separated(state.search_extensions),
+        "path_patterns": _split_comma_separated(state.search_path_patterns),
+    }
+    try:
+        search = RetrieverSearchSettings.model_validate({**tool.search.model_dump(), **update})
+    except ValidationError as error:
+        state.search_error = "; ".join(
+            f"{'.'.join(str(location) for location in detail['loc']) or 'settings'}: {detail['msg']}"
+            for detail in error.errors()
+        )
+        return
+    state.search_error = ""
+    await assistant.update_search_settings(state.search_tool_name, search)
+
+
+def _split_comma_separated(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
 async def on_apply_llm_config(_: me.ClickEvent, assistant: AiAssistantModel) -> None:
     state: ToolState = me.state(ToolState)
     await assistant.update_assistant(
@@ -2,13 +2,19 @@
 #
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
+from functools import partial
+from typing import Callable
+
 from langchain_aws import ChatBedrock
 from langchain_core.language_models import BaseChatModel
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
 
+from ai_code_assistant.common.client_pool import ClientPool, endpoint_from_env
 from ai_code_assistant.llm.interfaces import LlmConfig
 
+_chat_models: ClientPool[BaseChatModel] = ClientPool("chat models")
+
 
 class AiLlms:
     """
@@ -19,6 +25,9 @@ class AiLlms:
         """
         Creates an instance of a language model based on the provided configuration.
 
+        Models are shared across assistant rebuilds, one per provider, model and endpoint,
+        so that their HTTP connections are reused.
+
         Args:
             llm_config: The configuration for the language model.
 
@@ -28,14 +37,17 @@ class AiLlms:
         Raises:
             NotImplementedError: If the provided LLM provider is not supported.
         """
-        model: BaseChatModel
+        create_model: Callable[[], BaseChatModel]
         match llm_config.llm_provider:
             case "openai":
-                model = ChatOpenAI(model=llm_config.llm_model)
+                endpoint = endpoint_from_env("OPENAI_BASE_URL", "OPENAI_API_BASE")
+                create_model = partial(ChatOpenAI, model=llm_config.llm_model)
             case "amazon_bedrock":
-                model = ChatBedrock(model=llm_config.llm_model)
+                endpoint = endpoint_from_env("AWS_REGION", "AWS_DEFAULT_REGION")
+                create_model = partial(ChatBedrock, model=llm_config.llm_model)
             case "ollama":
-                model = ChatOllama(model=llm_config.llm_model)
+                endpoint = endpoint_from_env("OLLAMA_HOST")
+                create_model = partial(ChatOllama, model=llm_config.llm_model)
             case _:
                 raise NotImplementedError(f"{llm_config.llm_provider} is not supported.")
-        return model
+        return _chat_models.get_or_create((llm_config.llm_provider, llm_config.llm_model, endpoint), create_model)
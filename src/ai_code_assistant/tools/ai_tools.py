@@ -2,9 +2,11 @@
 #
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
+import asyncio
 import logging
+import time
 from os.path import basename
-from typing import cast
+from typing import cast, Optional
 
 from langchain_community.agent_toolkits.load_tools import load_tools
 from langchain_core.tools import BaseTool
@@ -14,7 +16,13 @@ from ai_code_assistant.common.app_context import AppContext
 from ai_code_assistant.tools.interfaces import (
     ToolSettings,
     RetrieverToolSettings,
+    RetrieverSearchSettings,
+    ModelServiceType,
+    ProgressCallback,
+    IndexingStage,
 )
+from ai_code_assistant.tools.embeddings import warm_up_embedding_async
+from ai_code_assistant.tools.pdf_source import remove_pdf_upload
 from ai_code_assistant.tools.retriever_tool import RetrieverTool
 from ai_code_assistant.tools.tool_settings_manager import ToolSettingsManager
 
@@ -38,14 +46,21 @@ class AiTools:
         """
         super().__init__()
         self._app_context = app_context
-        self._setting_manager = ToolSettingsManager(AppContext())
-
-    async def create_tool_async(self, tool_settings: ToolSettings) -> BaseTool:
+        self._setting_manager = ToolSettingsManager(app_context)
+        # loaded tools by tool name, reused by load_tools_async() while their settings are unchanged
+        self._loaded_tools: dict[str, AiTool] = {}
+        # embedding models warmed up by load_tools_async()
+        self._warmed_up_models: set[tuple[ModelServiceType, str]] = set()
+
+    async def create_tool_async(
+        self, tool_settings: ToolSettings, progress: Optional[ProgressCallback] = None
+    ) -> BaseTool:
         """
         Asynchronously creates a tool based on the provided settings.
 
         Args:
             tool_settings: The settings for the tool to be created.
+            progress: Reports the progress of each stage of indexing the documents of retriever tools.
 
         Returns:
             The created tool.
@@ -56,30 +71,105 @@ class AiTools:
         logger.info(f"create_tool_async() tool_settings={tool_settings}")
         match tool_settings.type:
             case "retriever":
-                tool = await RetrieverTool.create_tool_async(
-                    cast(RetrieverToolSettings, tool_settings), self._app_context
+                tool, index_state = await RetrieverTool.create_tool_async(
+                    cast(RetrieverToolSettings, tool_settings), self._app_context, progress
                 )
+                if progress:
+                    progress(IndexingStage.PERSIST, 0, 1)
+                await self._setting_manager.save_index_state(tool_settings.name, index_state)
             case "builtin":
                 tool = await self._load_builtin_tool_async(tool_settings)
             case _:
                 raise NotImplementedError(f"Tool type {tool_settings.type} is not supported.")
         await self._setting_manager.save_tool_setting(tool_settings)
+        if progress:
+            progress(IndexingStage.PERSIST, 1, 1)
+        self._loaded_tools[tool_settings.name] = AiTool(tool=tool, tool_settings=tool_settings)
         return tool
 
     async def load_tools_async(self) -> list[AiTool]:
         """
         Asynchronously loads all tools based on the saved settings.
 
+        Tools which have already been loaded or created with the same settings are reused.
+        Ollama embedding models of retriever tools are warmed up concurrently, once per model.
+
         Returns:
             A list of loaded tools.
         """
         logger.info("load_tools_async()")
+        start = time.perf_counter()
         tool_settings = await self._setting_manager.load_tool_settings()
-        return [await self._load_tool_async(self._app_context, tool_settings) for tool_settings in tool_settings]
+        tools, _ = await asyncio.gather(
+            asyncio.gather(*[self.__get_or_load_tool_async(settings) for settings in tool_settings]),
+            self.__warm_up_embeddings_async(tool_settings),
+        )
+        self._loaded_tools = {tool.tool_settings.name: tool for tool in tools}
+        logger.info(f"load_tools_async() loaded {len(tools)} tools in {time.perf_counter() - start:.3f}s")
+        return list(tools)
+
+    async def refresh_tool_async(self, tool_name: str, progress: Optional[ProgressCallback] = None) -> BaseTool:
+        """
+        Asynchronously refreshes the index of a retriever tool.
+
+        Git sources are re-indexed incrementally from the last indexed commit when it is known.
+
+        Args:
+            tool_name: The name of the tool to refresh.
+            progress: Reports the progress of each indexing stage.
+
+        Returns:
+            The refreshed tool.
+
+        Raises:
+            ValueError: If the tool is not a retriever tool.
+        """
+        logger.info(f"refresh_tool_async() tool_name={tool_name}")
+        tool_settings = await self._setting_manager.load_tool_setting(tool_name)
+        if not isinstance(tool_settings, RetrieverToolSettings):
+            raise ValueError(f"Tool {tool_name} is not a retriever tool.")
+        index_state = await self._setting_manager.load_index_state(tool_name)
+        tool, new_index_state = await RetrieverTool.refresh_tool_async(
+            tool_settings, self._app_context, index_state, progress
+        )
+        if progress:
+            progress(IndexingStage.PERSIST, 0, 1)
+        await self._setting_manager.save_index_state(tool_name, new_index_state)
+        if progress:
+            progress(IndexingStage.PERSIST, 1, 1)
+        self._loaded_tools[tool_name] = AiTool(tool=tool, tool_settings=tool_settings)
+        return tool
+
+    async def update_search_settings_async(
+        self, tool_name: str, search: RetrieverSearchSettings
+    ) -> RetrieverToolSettings:
+        """
+        Asynchronously updates the search settings of a retriever tool.
+
+        The tool is reloaded with the new settings by the next load_tools_async(); the index is kept.
+
+        Args:
+            tool_name: The name of the tool.
+            search: The new search settings.
+
+        Returns:
+            The updated settings of the tool.
+
+        Raises:
+            ValueError: If the tool is not a retriever tool.
+        """
+        logger.info(f"update_search_settings_async() tool_name={tool_name}, search={search}")
+        tool_settings = await self._setting_manager.load_tool_setting(tool_name)
+        if not isinstance(tool_settings, RetrieverToolSettings):
+            raise ValueError(f"Tool {tool_name} is not a retriever tool.")
+        updated = tool_settings.model_copy(update={"search": search})
+        await self._setting_manager.save_tool_setting(updated)
+        return updated
 
     async def remove_tool_setting(self, tool_name: str) -> ToolSettings:
         """
-        Asynchronously removes the settings for a tool with the given name.
+        Asynchronously removes the settings for a tool with the given name,
+        and the managed copy of the uploaded PDF file of a PDF source.
 
         Args:
             tool_name: The name of the tool to remove.
@@ -89,13 +179,43 @@ class AiTools:
         """
         logger.info(f"remove_tool_setting() tool_name={tool_name}")
         removed = await self._setting_manager.remove_tool_setting(tool_name)
+        self._loaded_tools.pop(tool_name, None)
+        if isinstance(removed, RetrieverToolSettings):
+            await asyncio.to_thread(remove_pdf_upload, self._app_context, removed)
         return removed
 
+    async def __warm_up_embeddings_async(self, tool_settings: list[ToolSettings]) -> None:
+        models = {
+            (settings.model_service, settings.embedding_model)
+            for settings in tool_settings
+            if isinstance(settings, RetrieverToolSettings)
+            and settings.warm_up
+            and settings.model_service == ModelServiceType.OLLAMA
+        } - self._warmed_up_models
+        self._warmed_up_models |= models
+        await asyncio.gather(*[warm_up_embedding_async(model, service) for service, model in models])
+
+    async def __get_or_load_tool_async(self, tool_settings: ToolSettings) -> AiTool:
+        loaded = self._loaded_tools.get(tool_settings.name)
+        if loaded is not None and loaded.tool_settings.fingerprint() == tool_settings.fingerprint():
+            return loaded
+        return await self._load_tool_async(self._app_context, tool_settings)
+
     @classmethod
     async def _load_tool_async(cls, app_context: AppContext, tool_settings: ToolSettings) -> AiTool:
+        start = time.perf_counter()
+        ai_tool = await cls.__load_tool_async(app_context, tool_settings)
+        logger.info(f"_load_tool_async() {tool_settings.name} loaded in {time.perf_counter() - start:.3f}s")
+        return ai_tool
+
+    @classmethod
+    async def __load_tool_async(cls, app_context: AppContext, tool_settings: ToolSettings) -> AiTool:
         match tool_settings.type:
             case "retriever":
-                base_tool = await RetrieverTool.load_tool_async(cast(RetrieverToolSettings, tool_settings), app_context)
+                index_state = await ToolSettingsManager(app_context).load_index_state(tool_settings.name)
+                base_tool = await RetrieverTool.load_tool_async(
+                    cast(RetrieverToolSettings, tool_settings), app_context, index_state
+                )
                 return AiTool(tool=base_tool, tool_settings=tool_settings)
             case "builtin":
                 base_tool = await cls._load_builtin_tool_async(tool_settings)
@@ -105,4 +225,5 @@ class AiTools:
 
     @classmethod
     async def _load_builtin_tool_async(cls, tool_settings: ToolSettings) -> BaseTool:
-        return load_tools([tool_settings.name])[0]
+        tools = await asyncio.to_thread(load_tools, [tool_settings.name])
+        return tools[0]
@@ -0,0 +1,270 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import hashlib
+import logging
+import re
+import threading
+from contextvars import ContextVar
+from os.path import basename
+from typing import Optional, Sequence
+
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+
+from ai_code_assistant.tools.interfaces import ContextCompressionSettings
+
+logger = logging.getLogger(basename(__name__))
+
+_CHARS_PER_TOKEN = 4
+# Whitespace between two chunks is stripped by the splitter, so chunks this close are treated as adjacent.
+_MAX_MERGE_GAP = 16
+_OMITTED_LINES = "..."
+_ALREADY_PROVIDED = "All matching chunks have already been provided earlier in this conversation."
+
+_retrieval_context: ContextVar[Optional["RetrievalContext"]] = ContextVar("retrieval_context", default=None)
+
+
+class RetrievalContext:
+    """
+    Tracks the chunks returned by retriever tools in one conversation, and the tokens saved by compressing them.
+
+    The context of the current conversation is set by use_retrieval_context(). It is propagated to the tools
+    through context variables, so each conversation deduplicates only against its own history.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty retrieval context.
+        """
+        super().__init__()
+        self._seen: set[str] = set()
+        self._tokens_retrieved = 0
+        self._tokens_returned = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tokens_retrieved(self) -> int:
+        """
+        Gets the estimated number of tokens retrieved from the vector stores.
+
+        Returns:
+            The number of tokens before compression.
+        """
+        return self._tokens_retrieved
+
+    @property
+    def tokens_returned(self) -> int:
+        """
+        Gets the estimated number of tokens returned to the agent.
+
+        Returns:
+            The number of tokens after compression.
+        """
+        return self._tokens_returned
+
+    @property
+    def tokens_saved(self) -> int:
+        """
+        Gets the estimated number of tokens saved by compression.
+
+        Returns:
+            The number of tokens saved.
+        """
+        return self._tokens_retrieved - self._tokens_returned
+
+    def forget(self) -> None:
+        """
+        Forgets the chunks returned so far, e.g. after they were removed from the conversation history.
+        """
+        with self._lock:
+            self._seen.clear()
+
+    def claim(self, keys: list[str]) -> list[bool]:
+        """
+        Marks chunks as returned.
+
+        Args:
+            keys: The keys of the chunks.
+
+        Returns:
+            For each chunk, whether it had not been returned before.
+        """
+        with self._lock:
+            claimed = []
+            for key in keys:
+                claimed.append(key not in self._seen)
+                self._seen.add(key)
+            return claimed
+
+    def record(self, tokens_retrieved: int, tokens_returned: int) -> None:
+        """
+        Adds to the token counters.
+
+        Args:
+            tokens_retrieved: The number of tokens before compression.
+            tokens_returned: The number of tokens after compression.
+        """
+        with self._lock:
+            self._tokens_retrieved += tokens_retrieved
+            self._tokens_returned += tokens_returned
+
+
+def use_retrieval_context(context: RetrievalContext) -> None:
+    """
+    Sets the retrieval context of the current conversation.
+
+    Args:
+        context: The retrieval context.
+    """
+    _retrieval_context.set(context)
+
+
+def get_retrieval_context() -> Optional[RetrievalContext]:
+    """
+    Gets the retrieval context of the current conversation.
+
+    Returns:
+        The retrieval context, or None if no conversation has set one.
+    """
+    return _retrieval_context.get()
+
+
+class RetrievedContextCompressor(BaseDocumentCompressor):
+    """
+    Compresses retrieved chunks before they are returned to the agent.
+
+    Chunks already returned in the current conversation are dropped, overlapping or adjacent chunks
+    of the same file are merged, and chunks are optionally trimmed to the lines containing query terms.
+
+    Attributes:
+        settings: The compression settings.
+    """
+
+    settings: ContextCompressionSettings = ContextCompressionSettings()
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        """
+        Compresses retrieved chunks.
+
+        Args:
+            documents: The retrieved chunks, most relevant first.
+            query: The query of the retrieval.
+            callbacks: Callbacks to run during the compression.
+
+        Returns:
+            The compressed chunks, most relevant first.
+        """
+        context = get_retrieval_context() or RetrievalContext()
+        tokens_retrieved = _estimate_tokens(documents)
+
+        compressed = list(documents)
+        if self.settings.deduplicate:
+            compressed = [
+                document
+                for document, is_new in zip(compressed, context.claim([_chunk_key(doc) for doc in compressed]))
+                if is_new
+            ]
+            if documents and not compressed:
+                compressed = [Document(page_content=_ALREADY_PROVIDED)]
+        if self.settings.merge_adjacent:
+            compressed = _merge_adjacent(compressed)
+        if self.settings.trim_to_query:
+            compressed = [_trim_to_query(document, query, self.settings.context_lines) for document in compressed]
+
+        tokens_returned = _estimate_tokens(compressed)
+        context.record(tokens_retrieved, tokens_returned)
+        logger.info(
+            f"compress_documents(): {len(documents)} -> {len(compressed)} chunks, "
+            f"tokens {tokens_retrieved} -> {tokens_returned} (saved in conversation: {context.tokens_saved})"
+        )
+        return compressed
+
+    async def acompress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        """
+        Compresses retrieved chunks. The compression is cheap, so it runs on the calling event loop.
+
+        Args:
+            documents: The retrieved chunks, most relevant first.
+            query: The query of the retrieval.
+            callbacks: Callbacks to run during the compression.
+
+        Returns:
+            The compressed chunks, most relevant first.
+        """
+        return self.compress_documents(documents, query, callbacks)
+
+
+def _estimate_tokens(documents: Sequence[Document]) -> int:
+    return sum(len(document.page_content) for document in documents) // _CHARS_PER_TOKEN
+
+
+def _chunk_key(document: Document) -> str:
+    digest = hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+    return f"{document.metadata.get('source', '')}\0{digest}"
+
+
+def _merge_adjacent(documents: list[Document]) -> list[Document]:
+    groups: dict[tuple[str, str], list[int]] = {}
+    for index, document in enumerate(documents):
+        if isinstance(document.metadata.get("start_index"), int) and "source" in document.metadata:
+            key = (str(document.metadata["source"]), str(document.metadata.get("page", "")))
+            groups.setdefault(key, []).append(index)
+
+    merged: dict[int, Document] = {}
+    absorbed: set[int] = set()
+    for indexes in groups.values():
+        indexes.sort(key=lambda i: documents[i].metadata["start_index"])
+        head = indexes[0]
+        current = documents[head]
+        for index in indexes[1:]:
+            following = documents[index]
+            start = current.metadata["start_index"]
+            end = start + len(current.page_content)
+            next_start = following.metadata["start_index"]
+            if next_start - end > _MAX_MERGE_GAP:
+                merged[head] = current
+                head, current = index, following
+                continue
+            if next_start < end:
+                content = current.page_content + following.page_content[end - next_start :]
+            else:
+                content = current.page_content + "\n" + following.page_content
+            current = Document(page_content=content, metadata=current.metadata)
+            # keep the merged chunk at the rank of its most relevant part
+            absorbed.add(max(head, index))
+            head = min(head, index)
+        merged[head] = current
+
+    return [merged.get(index, document) for index, document in enumerate(documents) if index not in absorbed]
+
+
+def _trim_to_query(document: Document, query: str, context_lines: int) -> Document:
+    terms = {term for term in re.findall(r"\w+", query.lower()) if len(term) >= 3}
+    lines = document.page_content.splitlines()
+    matches = [i for i, line in enumerate(lines) if any(term in line.lower() for term in terms)]
+    if not matches:
+        return document
+
+    keep = [False] * len(lines)
+    for i in matches:
+        for j in range(max(i - context_lines, 0), min(i + context_lines + 1, len(lines))):
+            keep[j] = True
+    trimmed: list[str] = []
+    for line, kept in zip(lines, keep):
+        if kept:
+            trimmed.append(line)
+        elif not trimmed or trimmed[-1] != _OMITTED_LINES:
+            trimmed.append(_OMITTED_LINES)
+    return Document(page_content="\n".join(trimmed), metadata=document.metadata)
@@ -0,0 +1,279 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from os.path import basename
+from pathlib import Path
+from typing import Iterable, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(basename(__name__))
+
+DEFAULT_MAX_ENTRIES = 1_000_000
+DEFAULT_MAX_QUERY_ENTRIES = 1024
+
+
+class EmbeddingCache:
+    """
+    A persistent, size-bounded store of embedding vectors keyed by content hash.
+
+    Entries are kept in a SQLite database and the least recently used entries are evicted
+    once the number of entries exceeds ``max_entries``.
+    """
+
+    def __init__(self, db_path: Path, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """
+        Initializes the cache, creating the database if needed.
+
+        Args:
+            db_path: The path of the SQLite database file.
+            max_entries: The maximum number of vectors to keep.
+        """
+        super().__init__()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access INTEGER)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._connection.commit()
+        self._size: int = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # A logical clock is used for recency so that the order does not depend on the timer resolution.
+        self._clock: int = self._connection.execute("SELECT MAX(last_access) FROM embeddings").fetchone()[0] or 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(namespace: str, text: str) -> str:
+        """
+        Makes the cache key of a text.
+
+        Args:
+            namespace: The namespace of the embedding model (e.g. "ollama:bge-m3").
+            text: The embedded text.
+
+        Returns:
+            The cache key.
+        """
+        return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    @property
+    def size(self) -> int:
+        """
+        Gets the number of cached vectors.
+
+        Returns:
+            The number of cached vectors.
+        """
+        return self._size
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, list[float]]:
+        """
+        Looks up vectors and marks the found entries as recently used.
+
+        Args:
+            keys: The cache keys.
+
+        Returns:
+            The cached vectors by key. Missing keys are not included.
+        """
+        unique_keys = list(dict.fromkeys(keys))
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            # SQLite limits the number of host parameters per statement.
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            self._clock += 1
+            self._connection.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?", [(self._clock, key) for key in found]
+            )
+            self._connection.commit()
+            self.hits += len(found)
+            self.misses += len(unique_keys) - len(found)
+        return found
+
+    def put_many(self, vectors: dict[str, list[float]]) -> None:
+        """
+        Stores vectors, evicting the least recently used entries if the cache is full.
+
+        Args:
+            vectors: The vectors by key.
+        """
+        with self._lock:
+            self._clock += 1
+            # Keys are content hashes, so an existing entry already holds the same vector.
+            cursor = self._connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), self._clock) for key, vector in vectors.items()],
+            )
+            self._size += cursor.rowcount
+            excess = self._size - self._max_entries
+            if excess > 0:
+                self._connection.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (excess,),
+                )
+                self._size -= excess
+                logger.debug(f"Evicted {excess} embeddings from cache")
+            self._connection.commit()
+
+
+class QueryEmbeddingCache:
+    """
+    An in-memory LRU cache of query vectors.
+
+    Queries are short-lived and vary more than documents, so they are not stored on disk.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_QUERY_ENTRIES) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            max_entries: The maximum number of vectors to keep.
+        """
+        super().__init__()
+        self._max_entries = max_entries
+        self._vectors: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[list[float]]:
+        """
+        Looks up a vector and marks it as recently used.
+
+        Args:
+            key: The cache key (see EmbeddingCache.make_key()).
+
+        Returns:
+            The cached vector, or None if it is not cached.
+        """
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._vectors.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: list[float]) -> None:
+        """
+        Stores a vector, evicting the least recently used vector if the cache is full.
+
+        Args:
+            key: The cache key.
+            vector: The vector.
+        """
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            if len(self._vectors) > self._max_entries:
+                self._vectors.popitem(last=False)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings which look up document vectors in an EmbeddingCache, and query vectors in a QueryEmbeddingCache,
+    before calling the wrapped embeddings.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        namespace: str,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+    ) -> None:
+        """
+        Initializes the cached embeddings.
+
+        Args:
+            embeddings: The embeddings used for cache misses.
+            cache: The cache shared by all embeddings.
+            namespace: The namespace of the embedding model, e.g. "ollama:bge-m3".
+            query_cache: The query vector cache shared by all embeddings. Queries are not cached if None.
+        """
+        super().__init__()
+        self._embeddings = embeddings
+        self._cache = cache
+        self._namespace = namespace
+        self._query_cache = query_cache
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """
+        Gets the wrapped embeddings.
+
+        Returns:
+            The wrapped embeddings.
+        """
+        return self._embeddings
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self.__lookup(texts)
+        if missing:
+            vectors = self._embeddings.embed_documents(missing)
+            found.update(self.__store(missing, vectors))
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        # the SQLite cache is read and written off the event loop, so ingestion does not block other tasks
+        keys, found, missing = await asyncio.to_thread(self.__lookup, texts)
+        if missing:
+            vectors = await self._embeddings.aembed_documents(missing)
+            found.update(await asyncio.to_thread(self.__store, missing, vectors))
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        if self._query_cache is None:
+            return self._embeddings.embed_query(text)
+        key = EmbeddingCache.make_key(self._namespace, text)
+        vector = self._query_cache.get(key)
+        if vector is None:
+            vector = self._embeddings.embed_query(text)
+            self._query_cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        if self._query_cache is None:
+            return await self._embeddings.aembed_query(text)
+        key = EmbeddingCache.make_key(self._namespace, text)
+        vector = self._query_cache.get(key)
+        if vector is None:
+            vector = await self._embeddings.aembed_query(text)
+            self._query_cache.put(key, vector)
+        return vector
+
+    def __lookup(self, texts: list[str]) -> tuple[list[str], dict[str, list[float]], list[str]]:
+        keys = [EmbeddingCache.make_key(self._namespace, text) for text in texts]
+        found = self._cache.get_many(keys)
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.values())
+        logger.debug(
+            f"embedding cache {self._namespace}: {len(texts) - len(missing)}/{len(texts)} hits "
+            f"(total hits={self._cache.hits} misses={self._cache.misses})"
+        )
+        return keys, found, missing
+
+    def __store(self, texts: list[str], vectors: list[list[float]]) -> dict[str, list[float]]:
+        new_vectors = {EmbeddingCache.make_key(self._namespace, text): vector for text, vector in zip(texts, vectors)}
+        self._cache.put_many(new_vectors)
+        return new_vectors
@@ -2,20 +2,88 @@
 #
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
+import logging
+import threading
+import time
+from functools import partial
+from os.path import basename
+from pathlib import Path
+from typing import Callable, Hashable, Optional
+
 from langchain_core.embeddings import Embeddings
 from langchain_ollama import OllamaEmbeddings
 from langchain_openai import OpenAIEmbeddings
 
+from ai_code_assistant.common.client_pool import ClientPool, endpoint_from_env
+from ai_code_assistant.tools.embedding_cache import EmbeddingCache, CachedEmbeddings, QueryEmbeddingCache
 from ai_code_assistant.tools.interfaces import ModelServiceType
 
+logger = logging.getLogger(basename(__name__))
+
+EMBEDDING_CACHE_FILE_NAME = "embedding_cache.sqlite3"
+
+_embedding_caches: dict[Path, EmbeddingCache] = {}
+_embedding_caches_lock = threading.Lock()
+_query_embedding_cache = QueryEmbeddingCache()
+_embedding_clients: ClientPool[Embeddings] = ClientPool("embeddings")
+_pooled_embeddings: dict[Hashable, "PooledEmbeddings"] = {}
+_pooled_embeddings_lock = threading.Lock()
+
+
+class PooledEmbeddings(Embeddings):
+    """
+    Embeddings which delegate each call to the pooled client of the calling event loop.
+
+    The async HTTP client of a model client is bound to the event loop it was first used on,
+    so the client is looked up when the embeddings are called rather than when they are created.
+    Tools are loaded and called on different event loops, e.g. the startup loop and the background loop.
+    """
+
+    def __init__(self, key: Hashable, create_client: Callable[[], Embeddings]) -> None:
+        """
+        Initializes the embeddings.
+
+        Args:
+            key: Identifies the client in the pool, e.g. the service, the model and the endpoint.
+            create_client: Creates a client for an event loop which has none yet.
+        """
+        super().__init__()
+        self._key = key
+        self._create_client = create_client
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.__client().embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.__client().aembed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.__client().embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.__client().aembed_query(text)
+
+    def __client(self) -> Embeddings:
+        return _embedding_clients.get_or_create(self._key, self._create_client)
+
 
-def create_embedding(embedding_model: str, model_service: ModelServiceType) -> Embeddings:
+def create_embedding(
+    embedding_model: str,
+    model_service: ModelServiceType,
+    cache_dir: Optional[Path] = None,
+) -> Embeddings:
     """
     Creates an embedding instance based on the provided model and service type.
 
+    The model clients are shared by all tools, one per service, model, endpoint and event loop
+    (see PooledEmbeddings).
+
     Args:
         embedding_model: The name of the embedding model to use.
         model_service: The type of model service (e.g., OPENAI, OLLAMA).
+        cache_dir: The directory of the persistent embedding cache.
+            If given, document embeddings are looked up in the cache shared by all tools before calling the model,
+            and query embeddings in an in-memory cache shared by all tools.
 
     Returns:
         An instance of the Embeddings class.
@@ -23,9 +91,61 @@ def create_embedding(embedding_model: str, model_service: ModelServiceType) -> E
     Raises:
         NotImplementedError: If the model service type is not supported.
     """
+    create_client: Callable[[], Embeddings]
     if model_service == ModelServiceType.OPENAI:
-        return OpenAIEmbeddings(model=embedding_model)
+        endpoint = endpoint_from_env("OPENAI_BASE_URL", "OPENAI_API_BASE")
+        create_client = partial(OpenAIEmbeddings, model=embedding_model)
     elif model_service == ModelServiceType.OLLAMA:
-        return OllamaEmbeddings(model=embedding_model)
+        endpoint = endpoint_from_env("OLLAMA_HOST")
+        create_client = partial(OllamaEmbeddings, model=embedding_model)
     else:
         raise NotImplementedError(f"{model_service} is not supported.")
+    key = (model_service, embedding_model, endpoint)
+    with _pooled_embeddings_lock:
+        if key not in _pooled_embeddings:
+            _pooled_embeddings[key] = PooledEmbeddings(key, create_client)
+        embeddings: Embeddings = _pooled_embeddings[key]
+    if cache_dir is None:
+        return embeddings
+    return CachedEmbeddings(
+        embeddings,
+        get_embedding_cache(cache_dir),
+        f"{model_service.value}:{embedding_model}",
+        _query_embedding_cache,
+    )
+
+
+def get_embedding_cache(cache_dir: Path) -> EmbeddingCache:
+    """
+    Gets the embedding cache stored in the given directory, opening it on first use.
+
+    Args:
+        cache_dir: The directory of the cache.
+
+    Returns:
+        The embedding cache shared by all tools.
+    """
+    db_path = (cache_dir / EMBEDDING_CACHE_FILE_NAME).resolve()
+    with _embedding_caches_lock:
+        if db_path not in _embedding_caches:
+            _embedding_caches[db_path] = EmbeddingCache(db_path)
+        return _embedding_caches[db_path]
+
+
+async def warm_up_embedding_async(embedding_model: str, model_service: ModelServiceType) -> None:
+    """
+    Loads an embedding model by embedding a short text, so that the first query does not wait for the model to load.
+
+    Failures are logged and ignored, because the model is loaded by the first query anyway.
+
+    Args:
+        embedding_model: The name of the embedding model.
+        model_service: The type of model service.
+    """
+    start = time.perf_counter()
+    try:
+        await create_embedding(embedding_model, model_service).aembed_query("warm-up")
+    except Exception as error:
+        logger.warning(f"Failed to warm up {model_service.value}:{embedding_model}: {error}")
+        return
+    logger.info(f"Warmed up {model_service.value}:{embedding_model} in {time.perf_counter() - start:.3f}s")
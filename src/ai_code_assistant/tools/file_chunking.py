@@ -0,0 +1,98 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import logging
+from contextlib import aclosing
+from os.path import basename
+from pathlib import Path
+from typing import AsyncIterator, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from ai_code_assistant.tools.git_source import load_file_document, matches_file_filter
+from ai_code_assistant.tools.interfaces import (
+    ChunkingSettings,
+    GitDocumentSourceSettings,
+    IndexingStage,
+    ProgressCallback,
+)
+from ai_code_assistant.tools.text_splitters import ChunkRecord, get_document_splitter
+from ai_code_assistant.utils.process_pool import map_in_processes_async
+
+logger = logging.getLogger(basename(__name__))
+
+
+def split_files(
+    repo_path: str,
+    file_paths: Sequence[str],
+    max_file_size: Optional[int],
+    chunking: ChunkingSettings,
+) -> list[ChunkRecord]:
+    """
+    Reads files of a checkout and splits them into chunks.
+
+    This is run in worker processes. Files which are missing, too large or not UTF-8 text are skipped.
+
+    Args:
+        repo_path: The local path of the checkout.
+        file_paths: The repository relative paths of the files.
+        max_file_size: Files larger than this number of bytes are skipped. No limit if None.
+        chunking: The chunking settings.
+
+    Returns:
+        The chunks of the files, in file order.
+    """
+    splitter = get_document_splitter(chunking)
+    records: list[ChunkRecord] = []
+    for file_path in file_paths:
+        document = load_file_document(Path(repo_path), file_path, max_file_size)
+        if document is not None:
+            records.extend((chunk.page_content, chunk.metadata) for chunk in splitter.split_document(document))
+    return records
+
+
+async def iter_file_chunks_async(
+    repo_path: Path,
+    file_paths: Sequence[str],
+    source: GitDocumentSourceSettings,
+    chunking: ChunkingSettings,
+    progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[Document]:
+    """
+    Lazily reads and splits the files of a checkout which are selected by the filters of the source.
+
+    The files are divided into shards of ``chunking.files_per_task`` files which are read and split
+    in parallel by a process pool (see map_in_processes_async()), so chunking scales with the number of cores
+    and does not block the event loop.
+
+    Args:
+        repo_path: The local path of the checkout.
+        file_paths: The repository relative paths of the files.
+        source: The Git document source settings.
+        chunking: The chunking settings.
+        progress: Reports the number of read files as the LOAD stage and the number of chunks as the SPLIT stage.
+
+    Yields:
+        The chunks of the files, in file order.
+    """
+    selected = [file_path for file_path in file_paths if matches_file_filter(source, file_path)]
+    shard_size = chunking.files_per_task
+    tasks = [
+        (str(repo_path), selected[start : start + shard_size], source.max_file_size, chunking)
+        for start in range(0, len(selected), shard_size)
+    ]
+    logger.info(f"Splitting {len(selected)} files in {len(tasks)} shards from {repo_path}")
+    if progress:
+        progress(IndexingStage.LOAD, 0, len(selected))
+    shard_file_counts = iter([len(task[1]) for task in tasks])
+    read_files = chunk_count = 0
+    async with aclosing(map_in_processes_async(split_files, tasks, chunking.workers)) as shards:
+        async for records in shards:
+            for page_content, metadata in records:
+                yield Document(page_content=page_content, metadata=metadata)
+            read_files += next(shard_file_counts)
+            chunk_count += len(records)
+            if progress:
+                progress(IndexingStage.LOAD, read_files, len(selected))
+                progress(IndexingStage.SPLIT, chunk_count, 0)
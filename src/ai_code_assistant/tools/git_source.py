@@ -0,0 +1,216 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import logging
+from fnmatch import fnmatch
+from os.path import basename
+from pathlib import Path, PurePosixPath
+from typing import Optional, Sequence, Any
+
+from git import Blob, Repo, GitCommandError
+from langchain_core.documents import Document
+from pydantic import BaseModel
+
+from ai_code_assistant.tools.interfaces import GitDocumentSourceSettings
+
+logger = logging.getLogger(basename(__name__))
+
+_BINARY_CHECK_SIZE = 8000
+
+
+class GitFileChanges(BaseModel):
+    """
+    Files changed between two commits of a Git repository.
+
+    Attributes:
+        upserted: Paths of added, modified or renamed (new path) files.
+        removed: Paths of deleted, modified or renamed (old path) files whose chunks must be dropped.
+    """
+
+    upserted: list[str] = []
+    removed: list[str] = []
+
+
+def open_repository(
+    clone_url: str,
+    repo_path: Path,
+    branch: str,
+    depth: Optional[int] = None,
+    sparse_paths: Sequence[str] = (),
+) -> Repo:
+    """
+    Clones the branch of the repository, or updates an existing checkout to the latest commit of the branch.
+
+    An existing checkout is updated by fetching the branch and resetting to it, so only new objects are downloaded.
+
+    Args:
+        clone_url: The URL to clone the Git repository from. Shallow clones need a URL, not a local path.
+        repo_path: The local path of the checkout.
+        branch: The branch of the Git repository to use.
+        depth: The number of commits to fetch. The full history is fetched if None.
+        sparse_paths: The directories to check out (sparse checkout in cone mode). Everything is checked out if empty.
+
+    Returns:
+        The repository checked out at the head of the branch.
+
+    Raises:
+        ValueError: If a different repository is already cloned at the path.
+    """
+    depth_options: dict[str, Any] = {"depth": depth} if depth is not None else {}
+    if (repo_path / ".git").is_dir():
+        repo = Repo(repo_path)
+        if repo.remotes.origin.url != clone_url:
+            raise ValueError(f"A different repository is already cloned at {repo_path}.")
+        repo.remotes.origin.fetch(branch, **depth_options)
+        _set_sparse_paths(repo, sparse_paths)
+        repo.git.checkout(branch)
+        repo.git.reset("--hard", f"origin/{branch}")
+    else:
+        repo = Repo.clone_from(
+            clone_url, repo_path, branch=branch, single_branch=True, no_checkout=True, **depth_options
+        )
+        _set_sparse_paths(repo, sparse_paths)
+        repo.git.checkout(branch)
+    return repo
+
+
+def has_commit(repo: Repo, commit: str) -> bool:
+    """
+    Checks whether a commit is available locally, e.g. whether it was fetched by a shallow clone.
+
+    Args:
+        repo: The repository.
+        commit: The commit hash.
+
+    Returns:
+        True if the commit exists in the repository.
+    """
+    try:
+        repo.git.cat_file("-e", f"{commit}^{{commit}}")
+    except GitCommandError:
+        return False
+    return True
+
+
+def head_commit(repo: Repo) -> str:
+    """
+    Gets the commit hash the working tree is checked out at.
+
+    Args:
+        repo: The repository.
+
+    Returns:
+        The hex sha of HEAD.
+    """
+    return repo.head.commit.hexsha
+
+
+def list_files(repo: Repo) -> list[str]:
+    """
+    Lists the files tracked at HEAD.
+
+    Args:
+        repo: The repository.
+
+    Returns:
+        Repository relative paths (posix style) of all tracked files.
+    """
+    return [str(item.path) for item in repo.head.commit.tree.traverse() if isinstance(item, Blob)]
+
+
+def diff_files(repo: Repo, old_commit: str, new_commit: str) -> GitFileChanges:
+    """
+    Computes the files to re-index between two commits.
+
+    Args:
+        repo: The repository.
+        old_commit: The commit the index was built from.
+        new_commit: The commit to update the index to.
+
+    Returns:
+        The changed files.
+    """
+    changes = GitFileChanges()
+    for diff in repo.commit(old_commit).diff(new_commit):
+        match diff.change_type:
+            case "A":
+                changes.upserted.append(str(diff.b_path))
+            case "D":
+                changes.removed.append(str(diff.a_path))
+            case _:
+                # modified, renamed or type changed
+                changes.removed.append(str(diff.a_path))
+                changes.upserted.append(str(diff.b_path))
+    return changes
+
+
+def matches_file_filter(source: GitDocumentSourceSettings, file_path: str) -> bool:
+    """
+    Checks whether a file is selected for indexing by the path based filters of the source.
+
+    Args:
+        source: The Git document source settings.
+        file_path: The repository relative path of the file.
+
+    Returns:
+        True if the file should be indexed.
+    """
+    if source.include_extensions and PurePosixPath(file_path).suffix not in source.include_extensions:
+        return False
+    if source.sparse_paths and "/" in file_path and not _is_in_sparse_paths(file_path, source.sparse_paths):
+        return False
+    return not any(fnmatch(file_path, pattern) for pattern in source.ignore_patterns)
+
+
+def _is_in_sparse_paths(file_path: str, sparse_paths: Sequence[str]) -> bool:
+    return any(file_path.startswith(f"{sparse_path.strip('/')}/") for sparse_path in sparse_paths)
+
+
+def _set_sparse_paths(repo: Repo, sparse_paths: Sequence[str]) -> None:
+    if sparse_paths:
+        repo.git.sparse_checkout("set", "--cone", *sparse_paths)
+    elif repo.git.config("--get", "core.sparseCheckout", with_exceptions=False) == "true":
+        # git config reads config.worktree as well, where sparse-checkout stores the setting
+        repo.git.sparse_checkout("disable")
+
+
+def load_file_document(repo_path: Path, file_path: str, max_file_size: Optional[int] = None) -> Optional[Document]:
+    """
+    Loads a single file of the checkout as a document.
+
+    The metadata layout is the same as langchain's GitLoader, except that paths are always posix style
+    so that they match the paths reported by git diffs.
+
+    Args:
+        repo_path: The local path of the checkout.
+        file_path: The repository relative path of the file.
+        max_file_size: Files larger than this number of bytes are skipped. No limit if None.
+
+    Returns:
+        The document, or None if the file does not exist, is too large or is not a UTF-8 text file.
+    """
+    path = repo_path / file_path
+    try:
+        if max_file_size is not None and path.stat().st_size > max_file_size:
+            logger.debug(f"Skip large file {path}")
+            return None
+        content = path.read_bytes()
+    except OSError as e:
+        logger.warning(f"Error reading file {path}: {e}")
+        return None
+    # Same heuristic as git: a NUL byte near the start means a binary file.
+    if b"\0" in content[:_BINARY_CHECK_SIZE]:
+        return None
+    try:
+        text_content = content.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    posix_path = PurePosixPath(file_path)
+    metadata = {
+        "source": file_path,
+        "file_path": file_path,
+        "file_name": posix_path.name,
+        "file_type": posix_path.suffix,
+    }
+    return Document(page_content=text_content, metadata=metadata)
@@ -0,0 +1,153 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import logging
+import shutil
+from os.path import basename
+from pathlib import Path
+from typing import Optional, Sequence
+
+logger = logging.getLogger(basename(__name__))
+
+CURRENT_VERSION_FILE_NAME = "CURRENT"
+VERSIONS_DIR_NAME = "versions"
+BUILDING_MARKER_FILE_NAME = ".building"
+
+
+class IndexVersions:
+    """
+    Versioned index directories of a tool, with a pointer file to the version which is served.
+
+    Each version is built in its own directory under ``<tool_dir>/versions`` and published by atomically
+    replacing the ``CURRENT`` pointer file, so readers see either the old or the new index but never
+    a partially built one. Publishing removes all other versions except the replaced one, which may
+    still be in use by tools loaded before the switch, and the versions which are still being built
+    (marked by a ``.building`` file until they are published or discarded).
+
+    Indexes written by older releases directly into the tool directory are served as a legacy version
+    until the first version is published.
+    """
+
+    def __init__(self, tool_dir: Path, shared_names: Sequence[str] = ()) -> None:
+        """
+        Initializes the versions of a tool.
+
+        Args:
+            tool_dir: The directory of the tool under the database directory.
+            shared_names: Names of files in the tool directory which are shared by all versions.
+        """
+        super().__init__()
+        self._tool_dir = tool_dir
+        self._versions_dir = tool_dir / VERSIONS_DIR_NAME
+        self._pointer_file = tool_dir / CURRENT_VERSION_FILE_NAME
+        self._shared_names = {VERSIONS_DIR_NAME, CURRENT_VERSION_FILE_NAME, *shared_names}
+
+    @property
+    def current(self) -> Optional[str]:
+        """
+        Gets the published version.
+
+        Returns:
+            The published version, or None if no version has been published.
+        """
+        try:
+            return self._pointer_file.read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current_dir(self) -> Path:
+        """
+        Gets the directory of the published version.
+
+        Returns:
+            The directory of the published version, or the tool directory itself for the legacy layout.
+        """
+        current = self.current
+        return self.version_dir(current) if current else self._tool_dir
+
+    def version_dir(self, version: str) -> Path:
+        """
+        Gets the directory of a version.
+
+        Args:
+            version: The version.
+
+        Returns:
+            The directory of the version.
+        """
+        return self._versions_dir / version
+
+    def prepare(self, version: str, copy_current: bool = False) -> Path:
+        """
+        Creates the directory for building a new version.
+
+        Args:
+            version: The new version.
+            copy_current: Whether to start from a copy of the published version, e.g. for an incremental update.
+
+        Returns:
+            The directory of the new version.
+        """
+        version_dir = self.version_dir(version)
+        self.discard(version)
+        if copy_current and self.current_dir().exists():
+            shutil.copytree(
+                self.current_dir(),
+                version_dir,
+                ignore=lambda directory, names: (
+                    [name for name in names if name in self._shared_names] if Path(directory) == self._tool_dir else []
+                ),
+            )
+        else:
+            version_dir.mkdir(parents=True)
+        (version_dir / BUILDING_MARKER_FILE_NAME).touch()
+        logger.info(f"prepare() {version_dir} copy_current={copy_current}")
+        return version_dir
+
+    def publish(self, version: str) -> None:
+        """
+        Atomically switches the pointer file to a built version and removes old versions.
+
+        Args:
+            version: The version to publish.
+        """
+        previous = self.current
+        (self.version_dir(version) / BUILDING_MARKER_FILE_NAME).unlink(missing_ok=True)
+        partial_path = self._pointer_file.with_name(f"{CURRENT_VERSION_FILE_NAME}.part")
+        partial_path.write_text(version, encoding="utf-8")
+        partial_path.replace(self._pointer_file)
+        logger.info(f"publish() {self._tool_dir}: {previous} -> {version}")
+        self.__collect_garbage(keep={version, previous} if previous else {version}, remove_legacy=previous is not None)
+
+    def discard(self, version: str) -> None:
+        """
+        Removes the directory of a version which has not been published, e.g. after a failed build.
+
+        Args:
+            version: The version to remove.
+        """
+        self.__remove(self.version_dir(version))
+
+    def __collect_garbage(self, keep: set[str], remove_legacy: bool) -> None:
+        if self._versions_dir.exists():
+            for version_dir in self._versions_dir.iterdir():
+                # another build may be in progress, it publishes or discards its version itself
+                if version_dir.name not in keep and not (version_dir / BUILDING_MARKER_FILE_NAME).exists():
+                    self.__remove(version_dir)
+        # like a replaced version, the legacy layout is kept until the version replacing it is replaced too
+        if remove_legacy:
+            for path in self._tool_dir.iterdir():
+                if path.name not in self._shared_names and not path.name.startswith(CURRENT_VERSION_FILE_NAME):
+                    self.__remove(path)
+
+    @staticmethod
+    def __remove(path: Path) -> None:
+        try:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink(missing_ok=True)
+        except OSError as error:
+            # e.g. files still opened by a client on Windows, they are removed by a later publish()
+            logger.warning(f"Could not remove {path}: {error}")
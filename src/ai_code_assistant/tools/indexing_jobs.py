@@ -0,0 +1,285 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from enum import Enum
+from os.path import basename
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from ai_code_assistant.tools.interfaces import IndexingStage, ProgressCallback
+
+logger = logging.getLogger(basename(__name__))
+
+INDEXING_JOBS_FILE_NAME = "indexing_jobs.json"
+
+IndexingJobRunner = Callable[[ProgressCallback], Awaitable[None]]
+"""Runs the work of an indexing job, reporting its progress to the given callback."""
+
+
+class IndexingJobStatus(str, Enum):
+    """
+    Enum representing the status of an indexing job.
+
+    Attributes:
+        QUEUED: The job waits for a free worker.
+        RUNNING: The job is running.
+        SUCCEEDED: The job has finished successfully.
+        FAILED: The job has raised an error, or was interrupted by a restart.
+        CANCELLED: The job was cancelled.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class StageProgress(BaseModel):
+    """
+    The progress of an indexing stage.
+
+    Attributes:
+        processed: The number of items processed so far.
+        total: The total number of items, 0 if unknown.
+    """
+
+    processed: int = 0
+    total: int = 0
+
+
+class IndexingJob(BaseModel):
+    """
+    The state of a job which creates or refreshes the index of a tool.
+
+    Attributes:
+        id: The ID of the job.
+        tool_name: The name of the indexed tool.
+        description: A short description of the job for the user.
+        status: The status of the job.
+        stages: The progress of the stages the job has reached, in the order they were reached.
+        error: The error message if the job has failed.
+        created_at: When the job was submitted, in seconds since the epoch.
+        finished_at: When the job has finished, in seconds since the epoch.
+    """
+
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    tool_name: str
+    description: str
+    status: IndexingJobStatus = IndexingJobStatus.QUEUED
+    stages: dict[IndexingStage, StageProgress] = Field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: float = Field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        """
+        Whether the job is queued or running.
+
+        Returns:
+            True if the job has not finished yet.
+        """
+        return self.status in (IndexingJobStatus.QUEUED, IndexingJobStatus.RUNNING)
+
+
+_jobs_adapter = TypeAdapter(list[IndexingJob])
+
+
+class IndexingJobQueue:
+    """
+    Runs indexing jobs in the background on an event loop, so that event handlers only submit them.
+
+    At most ``workers`` jobs run at the same time and at most one job per tool is active.
+    The jobs are saved to a JSON file whenever their status changes, so finished jobs are still listed
+    after a restart, and jobs which were active when the application stopped are marked as failed.
+    All methods may be called from any thread.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        state_file: Path,
+        workers: int = 1,
+        max_finished_jobs: int = 20,
+    ) -> None:
+        """
+        Initializes the queue and loads the jobs saved by a previous run.
+
+        Args:
+            loop: The event loop the jobs are run on.
+            state_file: The JSON file the jobs are saved to.
+            workers: The maximum number of jobs running at the same time.
+            max_finished_jobs: The number of finished jobs to keep.
+        """
+        super().__init__()
+        self._loop = loop
+        self._state_file = state_file
+        self._max_finished_jobs = max_finished_jobs
+        self._lock = threading.Lock()
+        self._jobs: dict[str, IndexingJob] = {}
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._workers = workers
+        self.__load()
+
+    @property
+    def jobs(self) -> list[IndexingJob]:
+        """
+        Gets snapshots of the jobs.
+
+        Returns:
+            Copies of the jobs, newest first.
+        """
+        with self._lock:
+            jobs = [job.model_copy(deep=True) for job in self._jobs.values()]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def submit(self, tool_name: str, description: str, runner: IndexingJobRunner) -> IndexingJob:
+        """
+        Submits a job.
+
+        Args:
+            tool_name: The name of the indexed tool.
+            description: A short description of the job for the user.
+            runner: Runs the work of the job.
+
+        Returns:
+            A snapshot of the queued job.
+
+        Raises:
+            ValueError: If a job for the tool is already queued or running.
+        """
+        with self._lock:
+            if any(job.active and job.tool_name == tool_name for job in self._jobs.values()):
+                raise ValueError(f"An indexing job for {tool_name} is already active.")
+            job = IndexingJob(tool_name=tool_name, description=description)
+            self._jobs[job.id] = job
+            snapshot = job.model_copy(deep=True)
+        logger.info(f"submit() job={snapshot}")
+        self.__save()
+        self._loop.call_soon_threadsafe(self.__start, job.id, runner)
+        return snapshot
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a queued or running job.
+
+        Args:
+            job_id: The ID of the job.
+
+        Returns:
+            True if the job was active and is being cancelled.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.active:
+                return False
+        logger.info(f"cancel() job_id={job_id}")
+        self._loop.call_soon_threadsafe(self.__cancel, job_id)
+        return True
+
+    async def wait_async(self, job_id: str) -> IndexingJob:
+        """
+        Waits until a job has finished. This must be awaited on the event loop of the queue.
+
+        Args:
+            job_id: The ID of the job.
+
+        Returns:
+            A snapshot of the finished job.
+        """
+        while True:
+            task = self._tasks.get(job_id)
+            if task is not None:
+                await asyncio.wait([task])
+            with self._lock:
+                job = self._jobs[job_id].model_copy(deep=True)
+            if not job.active:
+                return job
+            # the job has been submitted from another thread and is not started yet
+            await asyncio.sleep(0)
+
+    def __start(self, job_id: str, runner: IndexingJobRunner) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._workers)
+        task = self._loop.create_task(self.__run_async(job_id, runner, self._semaphore))
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        self._tasks[job_id] = task
+
+    def __cancel(self, job_id: str) -> None:
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        with self._lock:
+            queued = self._jobs[job_id].status == IndexingJobStatus.QUEUED
+        if queued:
+            # a task cancelled before it has started never runs __run_async()
+            self.__update(job_id, IndexingJobStatus.CANCELLED)
+
+    async def __run_async(self, job_id: str, runner: IndexingJobRunner, semaphore: asyncio.Semaphore) -> None:
+        try:
+            async with semaphore:
+                self.__update(job_id, IndexingJobStatus.RUNNING)
+                await runner(lambda stage, processed, total: self.__report(job_id, stage, processed, total))
+            self.__update(job_id, IndexingJobStatus.SUCCEEDED)
+        except asyncio.CancelledError:
+            self.__update(job_id, IndexingJobStatus.CANCELLED)
+        except Exception as error:
+            logger.exception(f"indexing job {job_id} failed")
+            self.__update(job_id, IndexingJobStatus.FAILED, str(error))
+
+    def __report(self, job_id: str, stage: IndexingStage, processed: int, total: int) -> None:
+        with self._lock:
+            self._jobs[job_id].stages[stage] = StageProgress(processed=processed, total=total)
+
+    def __update(self, job_id: str, status: IndexingJobStatus, error: Optional[str] = None) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.status = status
+            job.error = error
+            if not job.active:
+                job.finished_at = time.time()
+                self.__drop_old_jobs()
+        logger.info(f"indexing job {job_id}: {status.value}")
+        self.__save()
+
+    def __drop_old_jobs(self) -> None:
+        finished = sorted(
+            (job for job in self._jobs.values() if not job.active), key=lambda job: job.finished_at or 0.0
+        )
+        for job in finished[: max(len(finished) - self._max_finished_jobs, 0)]:
+            del self._jobs[job.id]
+
+    def __load(self) -> None:
+        if not self._state_file.exists():
+            return
+        try:
+            jobs = _jobs_adapter.validate_json(self._state_file.read_bytes())
+        except ValueError as error:
+            logger.warning(f"Ignoring invalid {self._state_file}: {error}")
+            return
+        for job in jobs:
+            if job.active:
+                job.status = IndexingJobStatus.FAILED
+                job.error = "Interrupted by a restart."
+                job.finished_at = time.time()
+            self._jobs[job.id] = job
+
+    def __save(self) -> None:
+        with self._lock:
+            content = _jobs_adapter.dump_json(list(self._jobs.values()), indent=2)
+            self._state_file.parent.mkdir(parents=True, exist_ok=True)
+            partial_path = self._state_file.with_name(f"{self._state_file.name}.part")
+            partial_path.write_bytes(content)
+            partial_path.replace(self._state_file)
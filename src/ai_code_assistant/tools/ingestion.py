@@ -0,0 +1,81 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import logging
+from os.path import basename
+from typing import AsyncIterable, Iterable, Optional, Union
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from ai_code_assistant.tools.interfaces import IngestionSettings, ProgressCallback, IndexingStage
+from ai_code_assistant.tools.lexical_index import LexicalIndex
+
+logger = logging.getLogger(basename(__name__))
+
+
+async def ingest_documents_async(
+    vector_store: VectorStore,
+    documents: Union[Iterable[Document], AsyncIterable[Document]],
+    settings: IngestionSettings = IngestionSettings(),
+    lexical_index: Optional[LexicalIndex] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """
+    Embeds documents and adds them to the vector store (and the lexical index) in batches.
+
+    Documents are grouped into batches of ``settings.batch_size`` which are embedded and stored
+    by ``settings.concurrency`` workers. The queue between the documents and the workers is bounded,
+    so at most ``2 * concurrency`` batches are held in memory, however many documents there are.
+
+    Args:
+        vector_store: The vector store to add the documents to.
+        documents: The documents to add.
+        settings: The batch size and concurrency.
+        lexical_index: The lexical index to add the documents to as well, if any.
+        progress: Reports the number of added documents as the EMBED stage after each batch.
+
+    Returns:
+        The number of documents added.
+    """
+    queue: asyncio.Queue[Optional[list[Document]]] = asyncio.Queue(maxsize=settings.concurrency)
+    added_counts: list[int] = []
+
+    async def produce() -> None:
+        batch: list[Document] = []
+        async for document in _aiter(documents):
+            batch.append(document)
+            if len(batch) >= settings.batch_size:
+                await queue.put(batch)
+                batch = []
+        if batch:
+            await queue.put(batch)
+        for _ in range(settings.concurrency):
+            await queue.put(None)
+
+    async def consume(worker_id: int) -> None:
+        while (batch := await queue.get()) is not None:
+            await vector_store.aadd_documents(batch)
+            if lexical_index is not None:
+                await asyncio.to_thread(lexical_index.add_documents, batch)
+            added_counts.append(len(batch))
+            if progress:
+                progress(IndexingStage.EMBED, sum(added_counts), 0)
+            logger.info(f"ingest worker {worker_id}: added {len(batch)} documents (total {sum(added_counts)})")
+
+    async with asyncio.TaskGroup() as task_group:
+        task_group.create_task(produce())
+        for worker_id in range(settings.concurrency):
+            task_group.create_task(consume(worker_id))
+    return sum(added_counts)
+
+
+async def _aiter(documents: Union[Iterable[Document], AsyncIterable[Document]]) -> AsyncIterable[Document]:
+    if isinstance(documents, AsyncIterable):
+        async for document in documents:
+            yield document
+    else:
+        for document in documents:
+            yield document
@@ -2,10 +2,12 @@
 #
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
+import hashlib
+import uuid
 from enum import Enum
-from typing import Union, Literal
+from typing import Union, Literal, Optional, Callable
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator, field_validator
 
 
 class ToolType(str, Enum):
@@ -21,6 +23,29 @@ class ToolType(str, Enum):
     BUILTIN = "builtin"
 
 
+class IndexingStage(str, Enum):
+    """
+    Enum representing the stages of indexing the documents of a retriever tool.
+
+    Attributes:
+        CLONE: Cloning or updating the Git repository.
+        LOAD: Loading files or parsing PDF pages.
+        SPLIT: Splitting documents into chunks.
+        EMBED: Embedding chunks and adding them to the indexes.
+        PERSIST: Saving the tool settings and the index state.
+    """
+
+    CLONE = "clone"
+    LOAD = "load"
+    SPLIT = "split"
+    EMBED = "embed"
+    PERSIST = "persist"
+
+
+ProgressCallback = Callable[[IndexingStage, int, int], None]
+"""Called with an indexing stage, the number of items it processed and its total number of items (0 if unknown)."""
+
+
 class GitDocumentSourceSettings(BaseModel):
     """
     Settings for a Git document source.
@@ -29,11 +54,22 @@ class GitDocumentSourceSettings(BaseModel):
         type: The type of the document source, always "git".
         clone_url: The URL to clone the Git repository from.
         branch: The branch of the Git repository to use.
+        include_extensions: File extensions (e.g. ".py") to index. All files are indexed if empty.
+        ignore_patterns: Glob patterns of repository relative paths (e.g. "vendor/*") not to index.
+        max_file_size: Files larger than this number of bytes are not indexed. No limit if None.
+        clone_depth: The number of commits to fetch from the branch. The full history is fetched if None.
+        sparse_paths: Repository relative directories (e.g. "src") to check out and index.
+            The whole repository is checked out if empty, and files in the root directory are always checked out.
     """
 
     type: Literal["git"] = "git"
     clone_url: str
     branch: str
+    include_extensions: list[str] = []
+    ignore_patterns: list[str] = []
+    max_file_size: Optional[int] = 1_000_000
+    clone_depth: Optional[int] = Field(default=1, gt=0)
+    sparse_paths: list[str] = []
 
 
 class PdfDocumentSourceSettings(BaseModel):
@@ -43,10 +79,32 @@ class PdfDocumentSourceSettings(BaseModel):
     Attributes:
         type: The type of the document source, always "pdf".
         file_path: The file path to the PDF document.
+        pages_per_task: The number of pages parsed by a worker process at a time.
+        max_workers: The number of worker processes parsing pages. Defaults to the number of CPUs if None.
     """
 
     type: Literal["pdf"] = "pdf"
     file_path: str
+    pages_per_task: int = Field(default=32, gt=0)
+    max_workers: Optional[int] = Field(default=None, gt=0)
+
+
+def check_tool_name(name: str) -> str:
+    """
+    Checks that a tool name can be used as a file name, since the data of a tool is stored under its name.
+
+    Args:
+        name: The name of the tool.
+
+    Returns:
+        The name.
+
+    Raises:
+        ValueError: If the name is empty, "." or "..", or contains a path separator.
+    """
+    if name in ("", ".", "..") or "/" in name or "\\" in name:
+        raise ValueError(f"Invalid tool name {name!r}: it must not be empty or contain path separators.")
+    return name
 
 
 class ToolSettings(BaseModel):
@@ -63,6 +121,20 @@ class ToolSettings(BaseModel):
     type: ToolType
     enabled: bool
 
+    @field_validator("name")
+    @classmethod
+    def __check_name(cls, name: str) -> str:
+        return check_tool_name(name)
+
+    def fingerprint(self) -> str:
+        """
+        Gets a hash of the settings, which changes whenever any setting changes.
+
+        Returns:
+            The hex digest of the settings.
+        """
+        return hashlib.sha256(self.model_dump_json().encode("utf-8")).hexdigest()
+
 
 class ModelServiceType(str, Enum):
     """
@@ -77,6 +149,143 @@ class ModelServiceType(str, Enum):
     OLLAMA = "ollama"
 
 
+class IngestionSettings(BaseModel):
+    """
+    Settings for embedding documents into the vector store.
+
+    Attributes:
+        batch_size: The number of documents embedded and stored per batch.
+        concurrency: The number of batches embedded concurrently.
+    """
+
+    batch_size: int = Field(default=64, gt=0)
+    concurrency: int = Field(default=4, gt=0)
+
+
+class ChunkingSettings(BaseModel):
+    """
+    Settings for splitting documents into chunks before embedding.
+
+    Source code is split along the syntax of its language (classes, functions, ...) where it is known.
+
+    Attributes:
+        chunk_size: The maximum number of characters per chunk.
+        chunk_overlap: The number of characters shared by adjacent chunks.
+        workers: The number of worker processes reading and splitting the files of Git sources.
+            Defaults to the number of CPUs if None.
+        files_per_task: The number of files read and split by a worker process at a time.
+    """
+
+    chunk_size: int = Field(default=2000, gt=0)
+    chunk_overlap: int = Field(default=200, ge=0)
+    workers: Optional[int] = Field(default=None, gt=0)
+    files_per_task: int = Field(default=64, gt=0)
+
+
+class VectorStoreType(str, Enum):
+    """
+    Enum representing the vector store backend of a retriever tool.
+
+    Attributes:
+        CHROMA: A persistent Chroma collection.
+        NUMPY: An in-process store of float32 vectors in a memory-mapped numpy array, searched by brute force
+            or by an HNSW index.
+    """
+
+    CHROMA = "chroma"
+    NUMPY = "numpy"
+
+
+class VectorStoreSettings(BaseModel):
+    """
+    Settings for the vector store backend of a retriever tool. Changing the backend re-creates the index.
+
+    Attributes:
+        type: The vector store backend.
+        hnsw_min_vectors: The numpy backend searches an HNSW index instead of all vectors
+            when it stores at least this number of vectors. Never if None.
+        hnsw_m: The number of links per vector of the HNSW index.
+        hnsw_ef_construction: The size of the candidate list while building the HNSW index.
+        hnsw_ef_search: The size of the candidate list while searching the HNSW index.
+    """
+
+    type: VectorStoreType = VectorStoreType.CHROMA
+    hnsw_min_vectors: Optional[int] = Field(default=50_000, gt=0)
+    hnsw_m: int = Field(default=16, gt=0)
+    hnsw_ef_construction: int = Field(default=200, gt=0)
+    hnsw_ef_search: int = Field(default=64, gt=0)
+
+
+SearchType = Literal["similarity", "mmr", "similarity_score_threshold"]
+
+
+class RetrieverSearchSettings(BaseModel):
+    """
+    Settings for searching the vector store of a retriever tool.
+
+    Attributes:
+        search_type: The type of search: plain similarity, maximal marginal relevance (MMR),
+            or similarity with a minimum relevance score.
+        k: The number of chunks to return.
+        fetch_k: The number of chunks fetched before MMR re-ranking or path filtering.
+        lambda_mult: The diversity of MMR results, from 0 (maximum diversity) to 1 (minimum diversity).
+        score_threshold: The minimum relevance score of similarity_score_threshold searches.
+        include_extensions: Only chunks of files with these extensions (e.g. ".py") are returned. All if empty.
+        path_patterns: Only chunks of files whose path matches one of these glob patterns are returned. All if empty.
+        lexical_weight: The weight of the lexical (BM25) search results when they are fused with the vector search
+            results by reciprocal rank fusion. Only the vector search is used if 0.
+    """
+
+    search_type: SearchType = "similarity"
+    k: int = Field(default=4, gt=0)
+    fetch_k: int = Field(default=20, gt=0)
+    lambda_mult: float = Field(default=0.5, ge=0, le=1)
+    score_threshold: Optional[float] = Field(default=None, ge=0, le=1)
+    include_extensions: list[str] = []
+    path_patterns: list[str] = []
+    lexical_weight: float = Field(default=0.5, ge=0, le=1)
+
+    @model_validator(mode="after")
+    def __check_score_threshold(self) -> "RetrieverSearchSettings":
+        if self.search_type == "similarity_score_threshold" and self.score_threshold is None:
+            raise ValueError("score_threshold is required for similarity_score_threshold searches.")
+        return self
+
+
+class ContextCompressionSettings(BaseModel):
+    """
+    Settings for compressing retrieved chunks before they are returned to the agent.
+
+    Attributes:
+        deduplicate: Whether chunks already returned earlier in the conversation are left out.
+        merge_adjacent: Whether overlapping or adjacent chunks of the same file are merged.
+        trim_to_query: Whether chunks are trimmed to the lines containing query terms.
+        context_lines: The number of lines kept around each matching line when trimming.
+    """
+
+    deduplicate: bool = True
+    merge_adjacent: bool = True
+    trim_to_query: bool = False
+    context_lines: int = Field(default=3, ge=0)
+
+
+class QueryCacheSettings(BaseModel):
+    """
+    Settings for caching the search results of a retriever tool by query.
+
+    Attributes:
+        enabled: Whether search results are cached.
+        max_entries: The maximum number of cached queries. The least recently used queries are evicted first.
+        ttl_seconds: Seconds after which a cached result expires. Never expires if None.
+        persistent: Whether cached results are also stored on disk and survive restarts.
+    """
+
+    enabled: bool = True
+    max_entries: int = Field(default=256, gt=0)
+    ttl_seconds: Optional[float] = Field(default=60 * 60, gt=0)
+    persistent: bool = False
+
+
 class RetrieverToolSettings(ToolSettings):
     """
     Settings for a retriever tool.
@@ -86,6 +295,17 @@ class RetrieverToolSettings(ToolSettings):
         embedding_model: The name of the embedding model to use.
         model_service: The type of model service.
         source: The document source settings.
+        chunking: The settings for splitting documents into chunks.
+        ingestion: The settings for embedding documents.
+        vector_store: The settings for the vector store backend.
+        search: The settings for searching the vector store.
+        compression: The settings for compressing retrieved chunks.
+        query_cache: The settings for caching search results by query.
+        lazy_load: Whether the vector store is opened on the first retrieval instead of when the tool is loaded.
+        idle_unload_seconds: Seconds of inactivity after which a lazily loaded vector store is released.
+            Never released if None.
+        warm_up: Whether a locally served (Ollama) embedding model is loaded when the tools are loaded,
+            so that the first question does not wait for the model to load.
         model_config: Configuration for the model.
     """
 
@@ -93,6 +313,15 @@ class RetrieverToolSettings(ToolSettings):
     embedding_model: str
     model_service: ModelServiceType
     source: Union[GitDocumentSourceSettings, PdfDocumentSourceSettings] = Field(..., discriminator="type")
+    chunking: ChunkingSettings = ChunkingSettings()
+    ingestion: IngestionSettings = IngestionSettings()
+    vector_store: VectorStoreSettings = VectorStoreSettings()
+    search: RetrieverSearchSettings = RetrieverSearchSettings()
+    compression: ContextCompressionSettings = ContextCompressionSettings()
+    query_cache: QueryCacheSettings = QueryCacheSettings()
+    lazy_load: bool = True
+    idle_unload_seconds: Optional[float] = None
+    warm_up: bool = True
 
     model_config = ConfigDict(protected_namespaces=())
 
@@ -166,3 +395,18 @@ class RetrieverToolSettings(ToolSettings):
                 branch=branch,
             ),
         )
+
+
+class ToolIndexState(BaseModel):
+    """
+    State of the index built for a tool, saved alongside the tool settings.
+
+    Attributes:
+        indexed_commit: The commit a Git source was last indexed at, or None if unknown.
+        version: Identifies the content of the index. A new version is made whenever the index changes.
+        vector_store: The vector store backend the index was built with.
+    """
+
+    indexed_commit: Optional[str] = None
+    version: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    vector_store: VectorStoreType = VectorStoreType.CHROMA
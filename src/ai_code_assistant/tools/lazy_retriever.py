@@ -0,0 +1,84 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import logging
+import threading
+from os.path import basename
+from typing import Callable, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from pydantic import PrivateAttr
+
+logger = logging.getLogger(basename(__name__))
+
+
+class LazyVectorStoreRetriever(BaseRetriever):
+    """
+    A retriever which opens its vector store on the first retrieval.
+
+    If ``idle_timeout`` is set, the vector store (and its embedding client) is released again
+    once it has not been used for that many seconds, and reopened by the next retrieval.
+
+    Attributes:
+        open_vector_store: Opens the vector store. May be called from a worker thread.
+        create_retriever: Creates the retriever which searches the open vector store.
+        idle_timeout: Seconds of inactivity after which the vector store is released. Never released if None.
+    """
+
+    open_vector_store: Callable[[], VectorStore]
+    create_retriever: Callable[[VectorStore], BaseRetriever] = VectorStore.as_retriever
+    idle_timeout: Optional[float] = None
+
+    _vector_store: Optional[VectorStore] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _idle_timer: Optional[threading.Timer] = PrivateAttr(default=None)
+
+    @property
+    def is_loaded(self) -> bool:
+        """
+        Gets whether the vector store is currently open.
+
+        Returns:
+            True if the vector store is open.
+        """
+        return self._vector_store is not None
+
+    def unload(self) -> None:
+        """
+        Releases the vector store. It is reopened by the next retrieval.
+        """
+        with self._lock:
+            if self._vector_store is not None:
+                logger.info(f"Unload vector store of {self.name}")
+            self._vector_store = None
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        vector_store = self.__acquire_vector_store()
+        return self.create_retriever(vector_store).invoke(query, config={"callbacks": run_manager.get_child()})
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        vector_store = await asyncio.to_thread(self.__acquire_vector_store)
+        return await self.create_retriever(vector_store).ainvoke(query, config={"callbacks": run_manager.get_child()})
+
+    def __acquire_vector_store(self) -> VectorStore:
+        with self._lock:
+            if self._vector_store is None:
+                logger.info(f"Load vector store of {self.name}")
+                self._vector_store = self.open_vector_store()
+            if self.idle_timeout is not None:
+                if self._idle_timer is not None:
+                    self._idle_timer.cancel()
+                self._idle_timer = threading.Timer(self.idle_timeout, self.unload)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+            return self._vector_store
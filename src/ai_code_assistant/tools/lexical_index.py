@@ -0,0 +1,181 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import json
+import logging
+import re
+import sqlite3
+import threading
+from os.path import basename
+from pathlib import Path
+from typing import Iterable, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(basename(__name__))
+
+LEXICAL_INDEX_FILE_NAME = "lexical_index.sqlite3"
+
+# SQLite maps up to this many bytes of the index file into memory instead of reading it into its page cache.
+_MMAP_SIZE = 256 * 1024 * 1024
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_SUBWORD = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+_MAX_QUERY_TERMS = 64
+
+
+class LexicalIndex:
+    """
+    A persistent BM25 index of chunks, stored in an SQLite FTS5 table.
+
+    Identifiers are indexed as a whole (``get_user_name``) and split into their subwords (``get user name``),
+    so both exact identifiers and words of natural language queries match. The index is updated incrementally
+    by adding chunks and deleting the chunks of files, and the database file is memory-mapped.
+    The database is opened on the first access.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        """
+        Initializes the index.
+
+        Args:
+            db_path: The path of the SQLite database file.
+        """
+        super().__init__()
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def add_documents(self, documents: Iterable[Document]) -> None:
+        """
+        Adds chunks to the index.
+
+        Args:
+            documents: The chunks to add.
+        """
+        rows = [
+            (
+                str(document.metadata.get("source", "")),
+                str(document.metadata.get("file_type", "")),
+                json.dumps(document.metadata, ensure_ascii=False),
+                document.page_content,
+                _subwords(document.page_content),
+            )
+            for document in documents
+        ]
+        with self._lock:
+            connection = self.__connect()
+            connection.executemany(
+                "INSERT INTO chunks (source, file_type, metadata, content, subwords) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            connection.commit()
+
+    def delete_sources(self, sources: Iterable[str]) -> None:
+        """
+        Deletes the chunks of files from the index.
+
+        Args:
+            sources: The ``source`` metadata of the files.
+        """
+        with self._lock:
+            connection = self.__connect()
+            connection.executemany("DELETE FROM chunks WHERE source = ?", [(source,) for source in sources])
+            connection.commit()
+
+    def clear(self) -> None:
+        """
+        Deletes all chunks from the index.
+        """
+        with self._lock:
+            connection = self.__connect()
+            connection.execute("DELETE FROM chunks")
+            connection.commit()
+
+    def search(self, query: str, k: int, file_types: Optional[list[str]] = None) -> list[Document]:
+        """
+        Searches chunks by BM25 relevance to the terms of a query.
+
+        Args:
+            query: The query. Any chunk containing at least one of its terms matches.
+            k: The maximum number of chunks to return.
+            file_types: Only chunks of files with these extensions are returned. All if None or empty.
+
+        Returns:
+            The matching chunks, most relevant first.
+        """
+        match = _match_expression(query)
+        if not match:
+            return []
+        sql = "SELECT metadata, content FROM chunks WHERE chunks MATCH ?"
+        parameters: list[object] = [match]
+        if file_types:
+            sql += f" AND file_type IN ({', '.join('?' * len(file_types))})"
+            parameters.extend(file_types)
+        # column weights: source, file_type, metadata (not indexed), content, subwords
+        sql += " ORDER BY bm25(chunks, 0, 0, 0, 2.0, 1.0) LIMIT ?"
+        parameters.append(k)
+        with self._lock:
+            rows = self.__connect().execute(sql, parameters).fetchall()
+        return [Document(page_content=content, metadata=json.loads(metadata)) for metadata, content in rows]
+
+    def close(self) -> None:
+        """
+        Closes the database. It is reopened by the next access.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._db_path, check_same_thread=False)
+            connection.execute(f"PRAGMA mmap_size = {_MMAP_SIZE}")
+            connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+                "source UNINDEXED, file_type UNINDEXED, metadata UNINDEXED, content, subwords, "
+                "tokenize = \"unicode61 tokenchars '_'\")"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+
+class LexicalRetriever(BaseRetriever):
+    """
+    A retriever which searches a LexicalIndex.
+
+    Attributes:
+        index: The lexical index.
+        k: The maximum number of chunks to return.
+        file_types: Only chunks of files with these extensions are returned. All if empty.
+    """
+
+    index: LexicalIndex
+    k: int = 4
+    file_types: list[str] = []
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return self.index.search(query, self.k, self.file_types)
+
+
+def _subwords(text: str) -> str:
+    words = []
+    for identifier in _IDENTIFIER.findall(text):
+        parts = [part.lower() for part in _SUBWORD.findall(identifier)]
+        if len(parts) > 1 or (parts and parts[0] != identifier.lower()):
+            words.extend(parts)
+    return " ".join(words)
+
+
+def _match_expression(query: str) -> str:
+    terms: dict[str, None] = {}
+    for identifier in _IDENTIFIER.findall(query):
+        terms[identifier.lower()] = None
+        for part in _SUBWORD.findall(identifier):
+            terms[part.lower()] = None
+    # the terms consist of word characters only, so they can be quoted as they are
+    return " OR ".join(f'"{term}"' for term in list(terms)[:_MAX_QUERY_TERMS])
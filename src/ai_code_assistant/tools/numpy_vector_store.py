@@ -0,0 +1,645 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from os.path import basename
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+import hnswlib
+import numpy as np
+import numpy.typing as npt
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from ai_code_assistant.tools.interfaces import VectorStoreSettings
+
+logger = logging.getLogger(basename(__name__))
+
+VECTORS_FILE_NAME = "vectors.f32"
+RECORDS_FILE_NAME = "records.jsonl"
+HNSW_INDEX_FILE_NAME = "vectors.hnsw"
+META_FILE_NAME = "meta.json"
+
+# metadata keys which are kept as numpy columns, so that filters on them are evaluated as vectorized masks
+FILTERABLE_KEYS = ("source", "file_type")
+
+# the HNSW index is asked for this many times more candidates than requested, since filtered out rows are dropped
+_HNSW_OVERFETCH = 4
+
+Filter = dict[str, Any]
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    An in-process vector store for small and medium collections, without the startup overhead of a database.
+
+    The embeddings are normalized and appended as float32 rows to a file which is memory-mapped as a numpy array,
+    and queries are answered by a vectorized brute-force cosine similarity search. Collections with at least
+    ``hnsw_min_vectors`` vectors are searched by an HNSW index instead, which is built on the first search
+    and saved next to the vectors.
+
+    The texts and metadata of the rows are appended to a JSON Lines file and kept in memory. The dimension of
+    the vectors is saved in a JSON file when the first rows are added. Since the vectors of a row are written
+    before its record, vectors and partially written records left by an interrupted write are dropped on load.
+    Adding a document with an existing ID replaces it. Deleted rows are masked out and the files are compacted
+    when they contain more deleted than live rows.
+
+    Metadata filters support ``{"key": value}`` and the operators ``$eq``, ``$ne``, ``$in`` and ``$nin``,
+    as a subset of the Chroma filter syntax. Filters on ``source`` and ``file_type`` are evaluated on numpy columns,
+    filters on other keys row by row.
+    """
+
+    def __init__(self, directory: Path, embedding: Embeddings, settings: VectorStoreSettings) -> None:
+        """
+        Initializes the store and loads the rows stored in a directory.
+
+        Args:
+            directory: The directory the vectors and records are stored in.
+            embedding: The embedding model.
+            settings: The vector store settings.
+        """
+        super().__init__()
+        self._directory = directory
+        self._embedding = embedding
+        self._settings = settings
+        self._lock = threading.RLock()
+        self._ids: list[str] = []
+        self._texts: list[str] = []
+        self._metadatas: list[dict[str, Any]] = []
+        self._alive: npt.NDArray[np.bool_] = np.zeros(0, dtype=np.bool_)
+        self._columns: dict[str, npt.NDArray[np.object_]] = {key: _column([], key) for key in FILTERABLE_KEYS}
+        self._rows: dict[str, int] = {}
+        self._dimension: Optional[int] = None
+        self._vectors: Optional[npt.NDArray[np.float32]] = None
+        # hnswlib.Index, which has no type hints
+        self._hnsw: Any = None
+        directory.mkdir(parents=True, exist_ok=True)
+        self.__load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """
+        Gets the embedding model.
+
+        Returns:
+            The embedding model.
+        """
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """
+        Embeds texts and adds them to the store.
+
+        Args:
+            texts: The texts to add.
+            metadatas: The metadata of the texts.
+            ids: The IDs of the texts. Random IDs are generated if None.
+            kwargs: Not used.
+
+        Returns:
+            The IDs of the added texts.
+        """
+        texts = list(texts)
+        return self.__add(texts, self._embedding.embed_documents(texts), metadatas, ids)
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """
+        Asynchronously embeds texts and adds them to the store.
+
+        Args:
+            texts: The texts to add.
+            metadatas: The metadata of the texts.
+            ids: The IDs of the texts. Random IDs are generated if None.
+            kwargs: Not used.
+
+        Returns:
+            The IDs of the added texts.
+        """
+        texts = list(texts)
+        embeddings = await self._embedding.aembed_documents(texts)
+        return await asyncio.to_thread(self.__add, texts, embeddings, metadatas, ids)
+
+    def add_documents(self, documents: list[Document], **kwargs: Any) -> list[str]:
+        """
+        Embeds documents and adds them to the store.
+
+        Args:
+            documents: The documents to add. Their IDs are kept if they have one.
+            kwargs: Not used.
+
+        Returns:
+            The IDs of the added documents.
+        """
+        return self.add_texts(
+            [document.page_content for document in documents],
+            [document.metadata for document in documents],
+            ids=self.__document_ids(documents),
+        )
+
+    async def aadd_documents(self, documents: list[Document], **kwargs: Any) -> list[str]:
+        """
+        Asynchronously embeds documents and adds them to the store.
+
+        Args:
+            documents: The documents to add. Their IDs are kept if they have one.
+            kwargs: Not used.
+
+        Returns:
+            The IDs of the added documents.
+        """
+        return await self.aadd_texts(
+            [document.page_content for document in documents],
+            [document.metadata for document in documents],
+            ids=self.__document_ids(documents),
+        )
+
+    def delete(self, ids: Optional[list[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        Deletes documents by ID.
+
+        Args:
+            ids: The IDs of the documents. Nothing is deleted if None.
+            kwargs: Not used.
+
+        Returns:
+            True if any document was deleted.
+        """
+        with self._lock:
+            deleted_ids = list(dict.fromkeys(id_ for id_ in ids or [] if id_ in self._rows))
+            if not deleted_ids:
+                return False
+            with (self._directory / RECORDS_FILE_NAME).open("a", encoding="utf-8") as file:
+                file.write(json.dumps({"deleted": deleted_ids}, ensure_ascii=False) + "\n")
+            self.__mark_deleted(deleted_ids)
+            if len(self._ids) - len(self._rows) > len(self._rows):
+                self.__compact()
+            return True
+
+    def delete_sources(self, sources: Iterable[str]) -> int:
+        """
+        Deletes the chunks of files.
+
+        Args:
+            sources: The ``source`` metadata of the files.
+
+        Returns:
+            The number of deleted chunks.
+        """
+        source_set = set(sources)
+        with self._lock:
+            rows = np.flatnonzero(self._alive & np.isin(self._columns["source"], list(source_set)))
+            ids = [self._ids[row] for row in rows]
+            self.delete(ids)
+        return len(ids)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        """
+        Gets documents by ID.
+
+        Args:
+            ids: The IDs of the documents.
+
+        Returns:
+            The found documents. Unknown IDs are skipped.
+        """
+        with self._lock:
+            return [self.__document(self._rows[id_]) for id_ in ids if id_ in self._rows]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Filter] = None, **kwargs: Any
+    ) -> list[Document]:
+        """
+        Searches the documents most similar to a query.
+
+        Args:
+            query: The query.
+            k: The number of documents to return.
+            filter: A metadata filter.
+            kwargs: Not used.
+
+        Returns:
+            The most similar documents, most similar first.
+        """
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, filter: Optional[Filter] = None, **kwargs: Any
+    ) -> list[Document]:
+        """
+        Searches the documents most similar to an embedding.
+
+        Args:
+            embedding: The embedding of the query.
+            k: The number of documents to return.
+            filter: A metadata filter.
+            kwargs: Not used.
+
+        Returns:
+            The most similar documents, most similar first.
+        """
+        return [document for document, _ in self.__search(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Filter] = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        """
+        Searches the documents most similar to a query.
+
+        Args:
+            query: The query.
+            k: The number of documents to return.
+            filter: A metadata filter.
+            kwargs: Not used.
+
+        Returns:
+            The most similar documents with their cosine distance to the query, most similar first.
+        """
+        return self.__search(self._embedding.embed_query(query), k, filter)
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Filter] = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """
+        Searches documents similar to a query and diverse among each other by maximal marginal relevance.
+
+        Args:
+            query: The query.
+            k: The number of documents to return.
+            fetch_k: The number of most similar documents to select from.
+            lambda_mult: The diversity of the results, from 0 (maximum diversity) to 1 (minimum diversity).
+            filter: A metadata filter.
+            kwargs: Not used.
+
+        Returns:
+            The selected documents.
+        """
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k, fetch_k, lambda_mult, filter
+        )
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Filter] = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """
+        Searches documents similar to an embedding and diverse among each other by maximal marginal relevance.
+
+        Args:
+            embedding: The embedding of the query.
+            k: The number of documents to return.
+            fetch_k: The number of most similar documents to select from.
+            lambda_mult: The diversity of the results, from 0 (maximum diversity) to 1 (minimum diversity).
+            filter: A metadata filter.
+            kwargs: Not used.
+
+        Returns:
+            The selected documents.
+        """
+        with self._lock:
+            rows = [row for row, _ in self.__search_rows(_normalize(embedding), fetch_k, filter)]
+            if not rows or self._vectors is None:
+                return []
+            candidates = np.asarray(self._vectors[rows])
+            documents = [self.__document(row) for row in rows]
+        selected = maximal_marginal_relevance(np.asarray(embedding), list(candidates), lambda_mult, k)
+        return [documents[index] for index in selected]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        directory: Optional[Path] = None,
+        settings: Optional[VectorStoreSettings] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        """
+        Creates a store in a directory and adds texts to it.
+
+        Args:
+            texts: The texts to add.
+            embedding: The embedding model.
+            metadatas: The metadata of the texts.
+            ids: The IDs of the texts. Random IDs are generated if None.
+            directory: The directory the vectors and records are stored in.
+            settings: The vector store settings. Defaults are used if None.
+            kwargs: Not used.
+
+        Returns:
+            The created store.
+
+        Raises:
+            ValueError: If no directory is given.
+        """
+        if directory is None:
+            raise ValueError("directory is required.")
+        store = cls(directory, embedding, settings or VectorStoreSettings())
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._cosine_relevance_score_fn
+
+    def __add(
+        self,
+        texts: list[str],
+        embeddings: list[list[float]],
+        metadatas: Optional[list[dict[str, Any]]],
+        ids: Optional[list[str]],
+    ) -> list[str]:
+        if not texts:
+            return []
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = np.stack([_normalize(embedding) for embedding in embeddings])
+        with self._lock:
+            if self._dimension is None:
+                self.__save_dimension(vectors.shape[1])
+            elif vectors.shape[1] != self._dimension:
+                raise ValueError(f"Expected embeddings of {self._dimension} dimensions, not {vectors.shape[1]}.")
+            # the records refer to rows of the vectors file, so it is written first
+            with (self._directory / VECTORS_FILE_NAME).open("ab") as file:
+                file.write(vectors.tobytes())
+            with (self._directory / RECORDS_FILE_NAME).open("a", encoding="utf-8") as file:
+                for id_, text, metadata in zip(ids, texts, metadatas):
+                    file.write(json.dumps({"id": id_, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+            first_row = len(self._ids)
+            self.__append_rows(ids, texts, metadatas)
+            self.__map_vectors()
+            if self._hnsw is not None:
+                self._hnsw.resize_index(len(self._ids))
+                self._hnsw.add_items(vectors, np.arange(first_row, len(self._ids)))
+            (self._directory / HNSW_INDEX_FILE_NAME).unlink(missing_ok=True)
+        return ids
+
+    def __append_rows(self, ids: list[str], texts: list[str], metadatas: list[dict[str, Any]]) -> None:
+        first_row = len(self._ids)
+        alive = np.concatenate([self._alive, np.ones(len(ids), dtype=np.bool_)])
+        for row, id_ in enumerate(ids, first_row):
+            replaced_row = self._rows.get(id_)
+            if replaced_row is not None:
+                alive[replaced_row] = False
+            self._rows[id_] = row
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas)
+        self._alive = alive
+        for key, column in self._columns.items():
+            self._columns[key] = np.concatenate([column, _column(metadatas, key)])
+
+    def __mark_deleted(self, ids: Iterable[str]) -> None:
+        rows = [row for row in (self._rows.pop(id_, None) for id_ in ids) if row is not None]
+        self._alive[rows] = False
+
+    def __search(self, embedding: list[float], k: int, filter: Optional[Filter]) -> list[tuple[Document, float]]:
+        with self._lock:
+            rows = self.__search_rows(_normalize(embedding), k, filter)
+            return [(self.__document(row), 1.0 - similarity) for row, similarity in rows]
+
+    def __search_rows(
+        self, query: npt.NDArray[np.float32], k: int, filter: Optional[Filter]
+    ) -> list[tuple[int, float]]:
+        vectors = self._vectors
+        if vectors is None or not self._rows:
+            return []
+        mask = self._alive.copy()
+        if filter:
+            mask &= self.__filter_mask(filter)
+        k = min(k, int(mask.sum()))
+        if k == 0:
+            return []
+        hnsw = self.__hnsw_index()
+        if hnsw is not None:
+            hnsw.set_ef(max(self._settings.hnsw_ef_search, k * _HNSW_OVERFETCH))
+            labels, distances = hnsw.knn_query(query, k=min(k * _HNSW_OVERFETCH, len(self._ids)))
+            rows = [(int(row), 1.0 - float(distance)) for row, distance in zip(labels[0], distances[0]) if mask[row]]
+            if len(rows) >= k:
+                return rows[:k]
+            # too many candidates were filtered out, so search all rows
+        similarities = np.asarray(vectors @ query)
+        similarities[~mask] = -np.inf
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(int(row), float(similarities[row])) for row in top]
+
+    def __filter_mask(self, filter: Filter) -> npt.NDArray[np.bool_]:
+        mask = np.ones(len(self._ids), dtype=np.bool_)
+        for key, condition in filter.items():
+            column = self._columns.get(key)
+            if column is None:
+                mask &= np.fromiter(
+                    (_matches(metadata, {key: condition}) for metadata in self._metadatas),
+                    dtype=np.bool_,
+                    count=len(self._metadatas),
+                )
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                match operator:
+                    case "$eq":
+                        mask &= column == operand
+                    case "$ne":
+                        mask &= column != operand
+                    case "$in":
+                        mask &= np.isin(column, list(operand))
+                    case "$nin":
+                        mask &= ~np.isin(column, list(operand))
+                    case _:
+                        raise ValueError(f"Filter operator {operator} is not supported.")
+        return mask
+
+    def __hnsw_index(self) -> Any:
+        min_vectors = self._settings.hnsw_min_vectors
+        if self._hnsw is not None or min_vectors is None or len(self._rows) < min_vectors or self._vectors is None:
+            return self._hnsw
+        index = hnswlib.Index(space="ip", dim=self._dimension)
+        index_path = self._directory / HNSW_INDEX_FILE_NAME
+        if index_path.exists():
+            index.load_index(str(index_path), max_elements=len(self._ids))
+            if index.element_count == len(self._ids):
+                self._hnsw = index
+                return index
+            index = hnswlib.Index(space="ip", dim=self._dimension)
+        logger.info(f"building the HNSW index of {len(self._ids)} vectors in {self._directory}")
+        index.init_index(
+            max_elements=len(self._ids), ef_construction=self._settings.hnsw_ef_construction, M=self._settings.hnsw_m
+        )
+        index.add_items(np.asarray(self._vectors), np.arange(len(self._ids)))
+        index.save_index(str(index_path))
+        self._hnsw = index
+        return index
+
+    def __compact(self) -> None:
+        rows = np.flatnonzero(self._alive)
+        logger.info(f"compacting {self._directory}: {len(rows)} of {len(self._ids)} rows are kept")
+        vectors_path = self._directory / VECTORS_FILE_NAME
+        records_path = self._directory / RECORDS_FILE_NAME
+        partial_vectors_path = vectors_path.with_name(f"{VECTORS_FILE_NAME}.part")
+        partial_records_path = records_path.with_name(f"{RECORDS_FILE_NAME}.part")
+        if self._vectors is not None:
+            partial_vectors_path.write_bytes(np.asarray(self._vectors[rows]).tobytes())
+        else:
+            partial_vectors_path.write_bytes(b"")
+        with partial_records_path.open("w", encoding="utf-8") as file:
+            for row in rows:
+                record = {"id": self._ids[row], "text": self._texts[row], "metadata": self._metadatas[row]}
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._vectors = None
+        partial_vectors_path.replace(vectors_path)
+        partial_records_path.replace(records_path)
+        (self._directory / HNSW_INDEX_FILE_NAME).unlink(missing_ok=True)
+        self._hnsw = None
+        self._ids = [self._ids[row] for row in rows]
+        self._texts = [self._texts[row] for row in rows]
+        self._metadatas = [self._metadatas[row] for row in rows]
+        self._alive = np.ones(len(rows), dtype=np.bool_)
+        self._rows = {id_: row for row, id_ in enumerate(self._ids)}
+        self._columns = {key: column[rows] for key, column in self._columns.items()}
+        self.__map_vectors()
+
+    def __save_dimension(self, dimension: int) -> None:
+        meta_path = self._directory / META_FILE_NAME
+        partial_meta_path = meta_path.with_name(f"{META_FILE_NAME}.part")
+        partial_meta_path.write_text(json.dumps({"dimension": dimension}), encoding="utf-8")
+        partial_meta_path.replace(meta_path)
+        self._dimension = dimension
+
+    def __load(self) -> None:
+        meta_path = self._directory / META_FILE_NAME
+        if not meta_path.exists():
+            return
+        self._dimension = int(json.loads(meta_path.read_text(encoding="utf-8"))["dimension"])
+        vectors_path = self._directory / VECTORS_FILE_NAME
+        records_path = self._directory / RECORDS_FILE_NAME
+        row_size = self._dimension * np.dtype(np.float32).itemsize
+        vector_rows = vectors_path.stat().st_size // row_size if vectors_path.exists() else 0
+        records_size = 0
+        if records_path.exists():
+            # consecutive records are appended at once, since appending to the numpy arrays copies them
+            added: list[dict[str, Any]] = []
+            with records_path.open("rb") as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        # interrupted while being written
+                        break
+                    record = json.loads(line)
+                    if "deleted" in record:
+                        self.__append_records(added)
+                        self.__mark_deleted(record["deleted"])
+                    elif len(self._ids) + len(added) < vector_rows:
+                        added.append(record)
+                    else:
+                        logger.error(f"{records_path} has more records than vectors")
+                        break
+                    records_size += len(line)
+            self.__append_records(added)
+            _truncate(records_path, records_size)
+        if vectors_path.exists():
+            _truncate(vectors_path, len(self._ids) * row_size)
+        self.__map_vectors()
+        logger.info(f"loaded {len(self._rows)} vectors from {self._directory}")
+
+    def __append_records(self, records: list[dict[str, Any]]) -> None:
+        if records:
+            self.__append_rows(
+                [record["id"] for record in records],
+                [record["text"] for record in records],
+                [record["metadata"] for record in records],
+            )
+            records.clear()
+
+    def __map_vectors(self) -> None:
+        if not self._ids or not self._dimension:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(
+            self._directory / VECTORS_FILE_NAME, dtype=np.float32, mode="r", shape=(len(self._ids), self._dimension)
+        )
+
+    def __document(self, row: int) -> Document:
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadatas[row])
+
+    @staticmethod
+    def __document_ids(documents: list[Document]) -> Optional[list[str]]:
+        if any(document.id is None for document in documents):
+            return None
+        return [str(document.id) for document in documents]
+
+
+def _normalize(embedding: Sequence[float]) -> npt.NDArray[np.float32]:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _column(metadatas: Sequence[dict[str, Any]], key: str) -> npt.NDArray[np.object_]:
+    return np.fromiter((metadata.get(key) for metadata in metadatas), dtype=np.object_, count=len(metadatas))
+
+
+def _truncate(path: Path, size: int) -> None:
+    if path.stat().st_size > size:
+        logger.warning(f"dropping {path.stat().st_size - size} bytes of an interrupted write from {path}")
+        with path.open("r+b") as file:
+            file.truncate(size)
+
+
+def _matches(metadata: dict[str, Any], filter: Filter) -> bool:
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            match operator:
+                case "$eq":
+                    matched = value == operand
+                case "$ne":
+                    matched = value != operand
+                case "$in":
+                    matched = value in operand
+                case "$nin":
+                    matched = value not in operand
+                case _:
+                    raise ValueError(f"Filter operator {operator} is not supported.")
+            if not matched:
+                return False
+    return True
@@ -0,0 +1,214 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import logging
+import mmap
+import shutil
+from contextlib import contextmanager, aclosing
+from os.path import basename
+from pathlib import Path
+from typing import AsyncIterator, Optional, BinaryIO, Iterator, IO, cast
+
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from ai_code_assistant.common.app_context import AppContext
+from ai_code_assistant.tools.interfaces import (
+    ChunkingSettings,
+    PdfDocumentSourceSettings,
+    ProgressCallback,
+    IndexingStage,
+    RetrieverToolSettings,
+    check_tool_name,
+)
+from ai_code_assistant.tools.text_splitters import ChunkRecord, get_document_splitter
+from ai_code_assistant.utils.process_pool import map_in_processes_async
+
+logger = logging.getLogger(basename(__name__))
+
+PDF_UPLOAD_DIR_NAME = "uploads"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def pdf_upload_path(app_context: AppContext, source_name: str) -> Path:
+    """
+    Gets the path of the managed copy of an uploaded PDF file.
+
+    The copy is kept while the tool exists, so that the tool can be re-indexed from it.
+
+    Args:
+        app_context: The application context.
+        source_name: The name of the PDF source.
+
+    Returns:
+        The path of the file under the data directory.
+
+    Raises:
+        ValueError: If the name is not a valid tool name (see check_tool_name()), e.g. "../x".
+    """
+    return app_context.data_dir / PDF_UPLOAD_DIR_NAME / f"{check_tool_name(source_name)}.pdf"
+
+
+def remove_pdf_upload(app_context: AppContext, tool_settings: RetrieverToolSettings) -> bool:
+    """
+    Removes the managed copy of the uploaded PDF file of a tool.
+
+    Files which are not managed copies, e.g. the file of a PDF source configured by hand, are kept.
+
+    Args:
+        app_context: The application context.
+        tool_settings: The settings of the removed tool.
+
+    Returns:
+        True if a file was removed.
+    """
+    source = tool_settings.source
+    if not isinstance(source, PdfDocumentSourceSettings):
+        return False
+    pdf_upload = pdf_upload_path(app_context, tool_settings.name)
+    if Path(source.file_path) != pdf_upload or not pdf_upload.exists():
+        return False
+    pdf_upload.unlink()
+    logger.info(f"removed {pdf_upload}")
+    return True
+
+
+def save_pdf_upload(upload: BinaryIO, file_path: Path) -> int:
+    """
+    Writes an uploaded PDF file in chunks, replacing the previous file only when the upload is complete.
+
+    Args:
+        upload: The uploaded file. It is read from its current position.
+        file_path: The path to write to.
+
+    Returns:
+        The number of bytes written.
+    """
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = file_path.with_name(f"{file_path.name}.part")
+    with open(partial_path, "wb") as file:
+        shutil.copyfileobj(upload, file, UPLOAD_CHUNK_SIZE)
+        size = file.tell()
+    partial_path.replace(file_path)
+    return size
+
+
+@contextmanager
+def open_pdf(file_path: str) -> Iterator[PdfReader]:
+    """
+    Opens a PDF file through a memory map.
+
+    PdfReader copies a file given by path into memory, whereas a memory map lets the OS page in
+    only the parts which are parsed.
+
+    Args:
+        file_path: The path of the PDF file.
+
+    Yields:
+        The reader of the file.
+    """
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        # mmap provides the read, seek and tell methods used by PdfReader
+        yield PdfReader(cast(IO[bytes], mapped))
+
+
+def count_pdf_pages(file_path: str) -> int:
+    """
+    Counts the pages of a PDF file.
+
+    Args:
+        file_path: The path of the PDF file.
+
+    Returns:
+        The number of pages.
+    """
+    with open_pdf(file_path) as reader:
+        return len(reader.pages)
+
+
+def load_pdf_pages(file_path: str, start: int, stop: int) -> list[Document]:
+    """
+    Extracts the text of a range of pages of a PDF file.
+
+    The file is opened by the function itself, so that it can be run in worker processes.
+
+    Args:
+        file_path: The path of the PDF file.
+        start: The index of the first page.
+        stop: The index after the last page.
+
+    Returns:
+        One document per page, with the same metadata as PyPDFLoader.
+    """
+    with open_pdf(file_path) as reader:
+        return [
+            Document(page_content=reader.pages[page].extract_text(), metadata={"source": file_path, "page": page})
+            for page in range(start, stop)
+        ]
+
+
+def split_pdf_pages(file_path: str, start: int, stop: int, chunking: ChunkingSettings) -> list[ChunkRecord]:
+    """
+    Extracts the text of a range of pages of a PDF file and splits it into chunks.
+
+    This is run in worker processes.
+
+    Args:
+        file_path: The path of the PDF file.
+        start: The index of the first page.
+        stop: The index after the last page.
+        chunking: The chunking settings.
+
+    Returns:
+        The chunks of the pages, in page order.
+    """
+    splitter = get_document_splitter(chunking)
+    return [
+        (chunk.page_content, chunk.metadata)
+        for document in load_pdf_pages(file_path, start, stop)
+        for chunk in splitter.split_document(document)
+    ]
+
+
+async def iter_pdf_chunks_async(
+    source: PdfDocumentSourceSettings,
+    chunking: ChunkingSettings,
+    progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[Document]:
+    """
+    Lazily extracts and splits the pages of a PDF file, parsing and splitting ranges of pages in a process pool.
+
+    Chunks are yielded in order as soon as their range is split, so neither parsing nor splitting blocks
+    the event loop. Only a few ranges are processed ahead of the consumer (see map_in_processes_async()),
+    so memory is bounded by the range size rather than the document size.
+
+    Args:
+        source: The PDF document source settings.
+        chunking: The chunking settings.
+        progress: Reports the number of parsed pages and the total number of pages as the LOAD stage
+            and the number of chunks as the SPLIT stage after each range.
+
+    Yields:
+        The chunks of the pages.
+    """
+    total = await asyncio.to_thread(count_pdf_pages, source.file_path)
+    tasks = [
+        (source.file_path, start, min(start + source.pages_per_task, total), chunking)
+        for start in range(0, total, source.pages_per_task)
+    ]
+    logger.info(f"Loading {total} pages in {len(tasks)} ranges from {source.file_path}")
+    if progress:
+        progress(IndexingStage.LOAD, 0, total)
+    range_page_counts = iter([stop - start for _, start, stop, _ in tasks])
+    parsed = chunk_count = 0
+    async with aclosing(map_in_processes_async(split_pdf_pages, tasks, source.max_workers)) as ranges:
+        async for records in ranges:
+            for page_content, metadata in records:
+                yield Document(page_content=page_content, metadata=metadata)
+            parsed += next(range_page_counts)
+            chunk_count += len(records)
+            if progress:
+                progress(IndexingStage.LOAD, parsed, total)
+                progress(IndexingStage.SPLIT, chunk_count, 0)
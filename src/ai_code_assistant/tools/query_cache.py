@@ -0,0 +1,191 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from os.path import basename
+from pathlib import Path
+from typing import Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from ai_code_assistant.tools.interfaces import QueryCacheSettings
+
+logger = logging.getLogger(basename(__name__))
+
+QUERY_CACHE_FILE_NAME = "query_cache.sqlite3"
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a query so that queries differing only in case, spacing or trailing punctuation share a cache entry.
+
+    Args:
+        query: The query.
+
+    Returns:
+        The normalized query.
+    """
+    return " ".join(query.casefold().split()).rstrip("?.!")
+
+
+class QueryResultCache:
+    """
+    A size-bounded LRU cache of search results with an optional time to live.
+
+    If a database path is given, entries are also stored in an SQLite database, so they survive restarts.
+    """
+
+    def __init__(self, settings: QueryCacheSettings, db_path: Optional[Path] = None) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            settings: The cache settings.
+            db_path: The path of the SQLite database file. Entries are kept in memory only if None.
+        """
+        super().__init__()
+        self._settings = settings
+        self._entries: OrderedDict[str, tuple[float, list[Document]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(db_path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS query_results (key TEXT PRIMARY KEY, documents TEXT, created_at REAL)"
+            )
+            self._connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(namespace: str, query: str) -> str:
+        """
+        Makes the cache key of a query.
+
+        Args:
+            namespace: Identifies the searched index and the search parameters.
+            query: The query. It is normalized by normalize_query().
+
+        Returns:
+            The cache key.
+        """
+        return hashlib.sha256(f"{namespace}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[list[Document]]:
+        """
+        Gets a cached result and marks it as recently used.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            Copies of the cached documents, or None if the key is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._connection is not None:
+                entry = self.__load(key)
+            if entry is None or self.__is_expired(entry[0]):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [document.model_copy(deep=True) for document in entry[1]]
+
+    def put(self, key: str, documents: list[Document]) -> None:
+        """
+        Caches a result, evicting the least recently used results if the cache is full.
+
+        Args:
+            key: The cache key.
+            documents: The documents to cache.
+        """
+        created_at = time.time()
+        with self._lock:
+            self._entries[key] = (created_at, [document.model_copy(deep=True) for document in documents])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._settings.max_entries:
+                self._entries.popitem(last=False)
+            if self._connection is not None:
+                serialized = json.dumps(
+                    [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents],
+                    ensure_ascii=False,
+                )
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO query_results (key, documents, created_at) VALUES (?, ?, ?)",
+                    (key, serialized, created_at),
+                )
+                self._connection.execute(
+                    "DELETE FROM query_results WHERE key NOT IN "
+                    "(SELECT key FROM query_results ORDER BY created_at DESC LIMIT ?)",
+                    (self._settings.max_entries,),
+                )
+                self._connection.commit()
+
+    def close(self) -> None:
+        """
+        Closes the database, if any.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __is_expired(self, created_at: float) -> bool:
+        return self._settings.ttl_seconds is not None and time.time() - created_at > self._settings.ttl_seconds
+
+    def __load(self, key: str) -> Optional[tuple[float, list[Document]]]:
+        assert self._connection is not None
+        row = self._connection.execute(
+            "SELECT created_at, documents FROM query_results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        created_at, serialized = row
+        return created_at, [Document(**document) for document in json.loads(serialized)]
+
+
+class CachedRetriever(BaseRetriever):
+    """
+    A retriever which caches the results of another retriever by query.
+
+    Attributes:
+        retriever: The retriever whose results are cached.
+        cache: The cache.
+        namespace: Identifies the searched index and the search parameters, so that a re-indexed tool
+            or a change of search settings never hits the results of the old ones.
+    """
+
+    retriever: BaseRetriever
+    cache: QueryResultCache
+    namespace: str
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        key = self.cache.make_key(self.namespace, query)
+        documents = self.cache.get(key)
+        if documents is None:
+            documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+            self.cache.put(key, documents)
+        return documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        key = self.cache.make_key(self.namespace, query)
+        documents = self.cache.get(key)
+        if documents is None:
+            documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+            self.cache.put(key, documents)
+        return documents
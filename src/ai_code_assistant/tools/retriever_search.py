@@ -0,0 +1,150 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import logging
+from fnmatch import fnmatch
+from os.path import basename
+from typing import Any
+
+from langchain.retrievers import EnsembleRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from ai_code_assistant.tools.interfaces import RetrieverSearchSettings
+from ai_code_assistant.tools.lexical_index import LexicalIndex, LexicalRetriever
+
+logger = logging.getLogger(basename(__name__))
+
+
+def create_vector_store_retriever(vector_store: VectorStore, settings: RetrieverSearchSettings) -> BaseRetriever:
+    """
+    Creates a retriever which searches a vector store as configured.
+
+    Extension filters are applied by the vector store. Path patterns cannot be expressed as a vector store filter,
+    so ``fetch_k`` chunks are searched and filtered by path afterwards, and the first ``k`` matching chunks are kept.
+
+    Args:
+        vector_store: The vector store to search.
+        settings: The search settings.
+
+    Returns:
+        The retriever.
+    """
+    retriever = vector_store.as_retriever(search_type=settings.search_type, search_kwargs=search_kwargs(settings))
+    if settings.path_patterns:
+        return PathFilterRetriever(retriever=retriever, path_patterns=settings.path_patterns, k=settings.k)
+    return retriever
+
+
+def create_hybrid_retriever(
+    vector_retriever: BaseRetriever, lexical_index: LexicalIndex, settings: RetrieverSearchSettings
+) -> BaseRetriever:
+    """
+    Creates a retriever which fuses the results of a vector search and a lexical (BM25) search
+    by weighted reciprocal rank fusion, and keeps the ``k`` best fused chunks.
+
+    Args:
+        vector_retriever: The retriever which searches the vector store (see create_vector_store_retriever()).
+        lexical_index: The lexical index of the same chunks.
+        settings: The search settings. The filters are applied to both searches.
+
+    Returns:
+        The fused retriever, or the vector retriever if ``lexical_weight`` is 0.
+    """
+    if settings.lexical_weight == 0:
+        return vector_retriever
+    lexical_retriever: BaseRetriever = LexicalRetriever(
+        index=lexical_index,
+        k=max(settings.k, settings.fetch_k) if settings.path_patterns else settings.k,
+        file_types=settings.include_extensions,
+    )
+    if settings.path_patterns:
+        lexical_retriever = PathFilterRetriever(
+            retriever=lexical_retriever, path_patterns=settings.path_patterns, k=settings.k
+        )
+    ensemble = EnsembleRetriever(
+        retrievers=[vector_retriever, lexical_retriever],
+        weights=[1 - settings.lexical_weight, settings.lexical_weight],
+    )
+    # the fusion returns the union of both result lists, up to twice as many chunks as requested
+    return TopKRetriever(retriever=ensemble, k=settings.k)
+
+
+def search_kwargs(settings: RetrieverSearchSettings) -> dict[str, Any]:
+    """
+    Converts search settings to the search arguments of VectorStore.as_retriever().
+
+    Args:
+        settings: The search settings.
+
+    Returns:
+        The search arguments.
+    """
+    kwargs: dict[str, Any] = {"k": max(settings.k, settings.fetch_k) if settings.path_patterns else settings.k}
+    if settings.search_type == "mmr":
+        kwargs["fetch_k"] = max(settings.fetch_k, kwargs["k"])
+        kwargs["lambda_mult"] = settings.lambda_mult
+    if settings.search_type == "similarity_score_threshold":
+        kwargs["score_threshold"] = settings.score_threshold
+    if settings.include_extensions:
+        kwargs["filter"] = {"file_type": {"$in": settings.include_extensions}}
+    return kwargs
+
+
+class PathFilterRetriever(BaseRetriever):
+    """
+    A retriever which keeps only the chunks of files matching glob patterns.
+
+    Attributes:
+        retriever: The retriever whose results are filtered.
+        path_patterns: Glob patterns matched against the ``source`` metadata of the chunks.
+        k: The maximum number of chunks to return.
+    """
+
+    retriever: BaseRetriever
+    path_patterns: list[str]
+    k: int
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self.__filter(documents)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return self.__filter(documents)
+
+    def __filter(self, documents: list[Document]) -> list[Document]:
+        matched = [
+            document
+            for document in documents
+            if any(fnmatch(str(document.metadata.get("source", "")), pattern) for pattern in self.path_patterns)
+        ]
+        return matched[: self.k]
+
+
+class TopKRetriever(BaseRetriever):
+    """
+    A retriever which keeps only the first chunks of another retriever.
+
+    Attributes:
+        retriever: The retriever whose results are truncated.
+        k: The maximum number of chunks to return.
+    """
+
+    retriever: BaseRetriever
+    k: int
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return documents[: self.k]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return documents[: self.k]
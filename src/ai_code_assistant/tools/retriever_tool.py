@@ -2,25 +2,48 @@
 #
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
+import asyncio
 import logging
+from functools import partial
 from os.path import basename
 from pathlib import Path
+from typing import AsyncIterator, Optional
 
-from langchain_chroma import Chroma
-from langchain_community.document_loaders import GitLoader, PyPDFLoader
+from git import Repo
+from langchain.retrievers import ContextualCompressionRetriever
 from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 from langchain_core.tools import BaseTool, create_retriever_tool
 from langchain_core.vectorstores import VectorStore
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from ai_code_assistant.common.app_context import AppContext
 from ai_code_assistant.common.path import remove_dir_contents
+from ai_code_assistant.tools.context_compression import RetrievedContextCompressor
 from ai_code_assistant.tools.embeddings import create_embedding
+from ai_code_assistant.tools.file_chunking import iter_file_chunks_async
+from ai_code_assistant.tools.git_source import (
+    open_repository,
+    head_commit,
+    has_commit,
+    list_files,
+    diff_files,
+)
+from ai_code_assistant.tools.index_versions import IndexVersions
+from ai_code_assistant.tools.ingestion import ingest_documents_async
 from ai_code_assistant.tools.interfaces import (
     RetrieverToolSettings,
     GitDocumentSourceSettings,
     PdfDocumentSourceSettings,
+    ToolIndexState,
+    ProgressCallback,
+    IndexingStage,
 )
+from ai_code_assistant.tools.lazy_retriever import LazyVectorStoreRetriever
+from ai_code_assistant.tools.lexical_index import LexicalIndex, LEXICAL_INDEX_FILE_NAME
+from ai_code_assistant.tools.pdf_source import iter_pdf_chunks_async, remove_pdf_upload
+from ai_code_assistant.tools.query_cache import CachedRetriever, QueryResultCache, QUERY_CACHE_FILE_NAME
+from ai_code_assistant.tools.retriever_search import create_vector_store_retriever, create_hybrid_retriever
+from ai_code_assistant.tools.vector_stores import open_vector_store, delete_sources_async
 
 logger = logging.getLogger(basename(__name__))
 
@@ -31,56 +54,163 @@ class RetrieverTool:
     """
 
     @classmethod
-    async def create_tool_async(cls, tool_setting: RetrieverToolSettings, app_context: AppContext) -> BaseTool:
+    async def create_tool_async(
+        cls,
+        tool_setting: RetrieverToolSettings,
+        app_context: AppContext,
+        progress: Optional[ProgressCallback] = None,
+    ) -> tuple[BaseTool, ToolIndexState]:
         """
         Asynchronously creates a retriever tool based on the provided settings and application context.
 
         Args:
             tool_setting: The settings for the retriever tool.
             app_context: The application context.
+            progress: Reports the progress of each indexing stage.
 
         Returns:
-            The created retriever tool.
+            The created retriever tool and the state of the built index.
         """
         logger.info(f"creating tool tool_setting={tool_setting}")
         source = tool_setting.source
-        documents: list[Document]
+        chunks: AsyncIterator[Document]
+        index_state = ToolIndexState(vector_store=tool_setting.vector_store.type)
         match source:
             case GitDocumentSourceSettings():
                 # noinspection PyTypeChecker
-                documents = await cls.__load_git_documents_async(tool_setting, source, app_context)
+                chunks, index_state.indexed_commit = await cls.__load_git_chunks_async(
+                    tool_setting, source, app_context, progress
+                )
             case PdfDocumentSourceSettings():
-                documents = await cls.__load_pdf_documents_async(source)
+                chunks = iter_pdf_chunks_async(source, tool_setting.chunking, progress)
             case _:
                 raise NotImplementedError(f"{source} is not supported.")
-        return await cls.__create_tool_async(app_context, documents, tool_setting)
+        tool = await cls.__create_tool_async(app_context, chunks, tool_setting, index_state, progress)
+        return tool, index_state
+
+    @classmethod
+    async def refresh_tool_async(
+        cls,
+        tool_setting: RetrieverToolSettings,
+        app_context: AppContext,
+        index_state: ToolIndexState,
+        progress: Optional[ProgressCallback] = None,
+    ) -> tuple[BaseTool, ToolIndexState]:
+        """
+        Asynchronously refreshes the index of a retriever tool.
+
+        Git sources which were indexed at a known commit are updated incrementally:
+        only the chunks of files changed between that commit and the new head of the branch
+        are deleted and re-embedded in a copy of the published index version, which is published when complete.
+        Other sources, Git sources whose indexed commit is not in the (shallow) checkout any more,
+        and indexes built with another vector store backend than the configured one are re-created from scratch.
+
+        Args:
+            tool_setting: The settings for the retriever tool.
+            app_context: The application context.
+            index_state: The state of the existing index.
+            progress: Reports the progress of each indexing stage.
+
+        Returns:
+            The refreshed retriever tool and the new state of the index.
+        """
+        source = tool_setting.source
+        if (
+            not isinstance(source, GitDocumentSourceSettings)
+            or index_state.indexed_commit is None
+            or index_state.vector_store != tool_setting.vector_store.type
+        ):
+            return await cls.create_tool_async(tool_setting, app_context, progress)
+
+        logger.info(f"refreshing tool tool_setting={tool_setting} index_state={index_state}")
+        repo_path = app_context.repository_dir / tool_setting.name
+        repo = await cls.__open_repository_async(source, repo_path, progress)
+        old_commit, new_commit = index_state.indexed_commit, head_commit(repo)
+        if not await asyncio.to_thread(has_commit, repo, old_commit):
+            # e.g. a shallow checkout whose old commit was pruned, so there is nothing to diff against
+            logger.info(f"refresh: {old_commit} is not available, re-creating the index")
+            return await cls.create_tool_async(tool_setting, app_context, progress)
+        versions = cls.__index_versions(app_context, tool_setting)
+        if new_commit == old_commit:
+            index_dir = versions.current_dir()
+            vector_store = cls.__open_vector_store(app_context, tool_setting, index_dir)
+        else:
+            index_state = ToolIndexState(indexed_commit=new_commit, vector_store=index_state.vector_store)
+            changes = await asyncio.to_thread(diff_files, repo, old_commit, new_commit)
+            logger.info(
+                f"refresh {old_commit}..{new_commit}: "
+                f"upserted={len(changes.upserted)} removed={len(changes.removed)}"
+            )
+            index_dir = await asyncio.to_thread(versions.prepare, index_state.version, copy_current=True)
+            try:
+                vector_store = cls.__open_vector_store(app_context, tool_setting, index_dir)
+                lexical_index = cls.__open_lexical_index(index_dir)
+                if changes.removed:
+                    await delete_sources_async(vector_store, changes.removed)
+                    await asyncio.to_thread(lexical_index.delete_sources, changes.removed)
+                chunks = iter_file_chunks_async(repo_path, changes.upserted, source, tool_setting.chunking, progress)
+                await ingest_documents_async(vector_store, chunks, tool_setting.ingestion, lexical_index, progress)
+            except BaseException:
+                await asyncio.to_thread(versions.discard, index_state.version)
+                raise
+            await asyncio.to_thread(versions.publish, index_state.version)
+        retriever_tool = cls.__create_retriever_tool(
+            app_context,
+            tool_setting,
+            index_state,
+            index_dir,
+            create_vector_store_retriever(vector_store, tool_setting.search),
+        )
+        return retriever_tool, index_state
 
     @classmethod
-    async def load_tool_async(cls, tool_settings: RetrieverToolSettings, app_context: AppContext) -> BaseTool:
+    async def load_tool_async(
+        cls,
+        tool_settings: RetrieverToolSettings,
+        app_context: AppContext,
+        index_state: Optional[ToolIndexState] = None,
+    ) -> BaseTool:
         """
-        Asynchronously loads a retriever tool from persistent storage.
+        Asynchronously loads the published index version of a retriever tool from persistent storage.
 
         Args:
             tool_settings: The settings for the retriever tool.
             app_context: The application context.
+            index_state: The state of the stored index. Persistent query caches are not reused if None.
 
         Returns:
             The loaded retriever tool.
         """
         logger.info(f"Load tool tool_settings={tool_settings}")
-        persistent_directory = app_context.db_dir / tool_settings.name
-        vector_store: VectorStore = Chroma(
-            collection_name=tool_settings.name,
-            persist_directory=str(persistent_directory),
-            embedding_function=create_embedding(tool_settings.embedding_model, tool_settings.model_service),
+        index_state = index_state or ToolIndexState()
+        versions = cls.__index_versions(app_context, tool_settings)
+        index_dir = versions.current_dir()
+        current_version = versions.current
+        if current_version is not None and current_version != index_state.version:
+            # the pointer file is authoritative, e.g. if the application stopped before the index state was saved
+            index_state = index_state.model_copy(update={"version": current_version})
+        if index_state.vector_store != tool_settings.vector_store.type:
+            logger.warning(
+                f"{tool_settings.name} was indexed with {index_state.vector_store.value}, "
+                f"refresh it to use {tool_settings.vector_store.type.value}"
+            )
+        if tool_settings.lazy_load:
+            retriever: BaseRetriever = LazyVectorStoreRetriever(
+                name=tool_settings.name,
+                open_vector_store=partial(cls.__open_vector_store, app_context, tool_settings, index_dir),
+                create_retriever=partial(create_vector_store_retriever, settings=tool_settings.search),
+                idle_timeout=tool_settings.idle_unload_seconds,
+            )
+            return cls.__create_retriever_tool(app_context, tool_settings, index_state, index_dir, retriever)
+        # Opening a persistent Chroma client reads its database, so do it off the event loop.
+        vector_store = await asyncio.to_thread(cls.__open_vector_store, app_context, tool_settings, index_dir)
+        return cls.__create_retriever_tool(
+            app_context,
+            tool_settings,
+            index_state,
+            index_dir,
+            create_vector_store_retriever(vector_store, tool_settings.search),
         )
-        retriever = vector_store.as_retriever()
-        tool = create_retriever_tool(
-            retriever,
-            tool_settings.name,
-            tool_settings.description,
-        )
-        return tool
 
     @classmethod
     async def remove_tool_async(cls, app_context: AppContext, tool_settings: RetrieverToolSettings) -> None:
@@ -96,49 +226,107 @@ class RetrieverTool:
         remove_dir_contents(persistent_directory)
         repository_path = app_context.repository_dir / tool_settings.name
         remove_dir_contents(repository_path)
+        remove_pdf_upload(app_context, tool_settings)
 
     @classmethod
-    async def __load_git_documents_async(
+    async def __load_git_chunks_async(
         cls,
         tool_settings: RetrieverToolSettings,
         source: GitDocumentSourceSettings,
         app_context: AppContext,
-    ) -> list[Document]:
+        progress: Optional[ProgressCallback],
+    ) -> tuple[AsyncIterator[Document], str]:
         repo_path = app_context.repository_dir / tool_settings.name
         # remove_dir_contents(repo_path)
-        loader = GitLoader(
-            clone_url=source.clone_url,
-            repo_path=str(repo_path),
-            branch=source.branch,
-        )
-        return await loader.aload()
+        repo = await cls.__open_repository_async(source, repo_path, progress)
+        file_paths = await asyncio.to_thread(list_files, repo)
+        chunks = iter_file_chunks_async(repo_path, file_paths, source, tool_settings.chunking, progress)
+        return chunks, head_commit(repo)
 
     @classmethod
-    async def __load_pdf_documents_async(
-        cls,
-        source: PdfDocumentSourceSettings,
-    ) -> list[Document]:
-        loader = PyPDFLoader(source.file_path)
-        documents = await loader.aload()
-        logger.info(f"Loading PDF documents from {source.file_path}\n{documents}")
-        return RecursiveCharacterTextSplitter().split_documents(documents)
+    async def __open_repository_async(
+        cls, source: GitDocumentSourceSettings, repo_path: Path, progress: Optional[ProgressCallback]
+    ) -> Repo:
+        if progress:
+            progress(IndexingStage.CLONE, 0, 1)
+        repo = await asyncio.to_thread(
+            open_repository, source.clone_url, repo_path, source.branch, source.clone_depth, source.sparse_paths
+        )
+        if progress:
+            progress(IndexingStage.CLONE, 1, 1)
+        return repo
 
     @classmethod
     async def __create_tool_async(
         cls,
         app_context: AppContext,
-        documents: list[Document],
+        chunks: AsyncIterator[Document],
         tool_settings: RetrieverToolSettings,
+        index_state: ToolIndexState,
+        progress: Optional[ProgressCallback],
     ) -> BaseTool:
-        persistent_directory: Path = app_context.db_dir / tool_settings.name
-        # remove_dir_contents(persistent_directory)
-        vector_store: VectorStore = await Chroma.afrom_documents(
-            documents=documents,
-            embedding=create_embedding(tool_settings.embedding_model, tool_settings.model_service),
-            collection_name=tool_settings.name,
-            persist_directory=str(persistent_directory),
+        # build into a new version, so the published index is served unchanged until the new one is complete
+        versions = cls.__index_versions(app_context, tool_settings)
+        index_dir = await asyncio.to_thread(versions.prepare, index_state.version)
+        try:
+            vector_store = cls.__open_vector_store(app_context, tool_settings, index_dir)
+            lexical_index = cls.__open_lexical_index(index_dir)
+            await ingest_documents_async(vector_store, chunks, tool_settings.ingestion, lexical_index, progress)
+        except BaseException:
+            await asyncio.to_thread(versions.discard, index_state.version)
+            raise
+        await asyncio.to_thread(versions.publish, index_state.version)
+        return cls.__create_retriever_tool(
+            app_context,
+            tool_settings,
+            index_state,
+            index_dir,
+            create_vector_store_retriever(vector_store, tool_settings.search),
         )
-        retriever = vector_store.as_retriever()
+
+    @classmethod
+    def __index_versions(cls, app_context: AppContext, tool_settings: RetrieverToolSettings) -> IndexVersions:
+        # the query cache is keyed by the index version, so it is shared by all versions
+        return IndexVersions(app_context.db_dir / tool_settings.name, shared_names=[QUERY_CACHE_FILE_NAME])
+
+    @classmethod
+    def __open_vector_store(
+        cls, app_context: AppContext, tool_settings: RetrieverToolSettings, index_dir: Path
+    ) -> VectorStore:
+        return open_vector_store(
+            tool_settings.vector_store,
+            tool_settings.name,
+            index_dir,
+            create_embedding(tool_settings.embedding_model, tool_settings.model_service, app_context.data_dir),
+        )
+
+    @classmethod
+    def __open_lexical_index(cls, index_dir: Path) -> LexicalIndex:
+        return LexicalIndex(index_dir / LEXICAL_INDEX_FILE_NAME)
+
+    @classmethod
+    def __create_retriever_tool(
+        cls,
+        app_context: AppContext,
+        tool_settings: RetrieverToolSettings,
+        index_state: ToolIndexState,
+        index_dir: Path,
+        retriever: BaseRetriever,
+    ) -> BaseTool:
+        retriever = create_hybrid_retriever(retriever, cls.__open_lexical_index(index_dir), tool_settings.search)
+        query_cache = tool_settings.query_cache
+        if query_cache.enabled:
+            db_path = app_context.db_dir / tool_settings.name / QUERY_CACHE_FILE_NAME
+            retriever = CachedRetriever(
+                retriever=retriever,
+                cache=QueryResultCache(query_cache, db_path if query_cache.persistent else None),
+                namespace=f"{tool_settings.name}\0{index_state.version}\0{tool_settings.search.model_dump_json()}",
+            )
+        compression = tool_settings.compression
+        if compression.deduplicate or compression.merge_adjacent or compression.trim_to_query:
+            retriever = ContextualCompressionRetriever(
+                base_compressor=RetrievedContextCompressor(settings=compression), base_retriever=retriever
+            )
         tool = create_retriever_tool(
             retriever,
             tool_settings.name,
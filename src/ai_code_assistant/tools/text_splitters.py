@@ -0,0 +1,167 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import logging
+from os.path import basename
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Optional, Union
+
+from langchain_core.documents import Document
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+from ai_code_assistant.tools.interfaces import ChunkingSettings
+
+logger = logging.getLogger(basename(__name__))
+
+ChunkRecord = tuple[str, dict[str, Any]]
+"""The page content and the metadata of a chunk, which are cheaper to send between processes than a Document."""
+
+LANGUAGES_BY_EXTENSION: dict[str, Language] = {
+    ".c": Language.C,
+    ".h": Language.C,
+    ".cc": Language.CPP,
+    ".cpp": Language.CPP,
+    ".cxx": Language.CPP,
+    ".hpp": Language.CPP,
+    ".cs": Language.CSHARP,
+    ".cbl": Language.COBOL,
+    ".cob": Language.COBOL,
+    ".ex": Language.ELIXIR,
+    ".exs": Language.ELIXIR,
+    ".go": Language.GO,
+    ".hs": Language.HASKELL,
+    ".html": Language.HTML,
+    ".htm": Language.HTML,
+    ".java": Language.JAVA,
+    ".js": Language.JS,
+    ".jsx": Language.JS,
+    ".mjs": Language.JS,
+    ".kt": Language.KOTLIN,
+    ".kts": Language.KOTLIN,
+    ".tex": Language.LATEX,
+    ".lua": Language.LUA,
+    ".md": Language.MARKDOWN,
+    ".php": Language.PHP,
+    ".ps1": Language.POWERSHELL,
+    ".proto": Language.PROTO,
+    ".py": Language.PYTHON,
+    ".pyi": Language.PYTHON,
+    ".rb": Language.RUBY,
+    ".rs": Language.RUST,
+    ".rst": Language.RST,
+    ".scala": Language.SCALA,
+    ".sol": Language.SOL,
+    ".swift": Language.SWIFT,
+    ".ts": Language.TS,
+    ".tsx": Language.TS,
+}
+
+
+class DocumentSplitter:
+    """
+    Splits documents into chunks, using language aware separators for source code files.
+
+    The language is selected from the "file_type" metadata (the file extension) of the document.
+    Documents of other types are split with the generic separators (paragraphs, lines, words).
+    """
+
+    def __init__(self, settings: ChunkingSettings = ChunkingSettings()) -> None:
+        """
+        Initializes the splitter.
+
+        Args:
+            settings: The chunk size and overlap.
+        """
+        super().__init__()
+        self._settings = settings
+        self._default_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+            add_start_index=True,
+        )
+        self._language_splitters: dict[Language, RecursiveCharacterTextSplitter] = {}
+
+    def split_document(self, document: Document) -> list[Document]:
+        """
+        Splits a document into chunks.
+
+        Args:
+            document: The document to split.
+
+        Returns:
+            The chunks. Each chunk keeps the metadata of the document, plus its "start_index" in the document.
+        """
+        language = LANGUAGES_BY_EXTENSION.get(str(document.metadata.get("file_type", "")).lower())
+        return self.__splitter_for(language).split_documents([document])
+
+    def split_documents(self, documents: Iterable[Document]) -> list[Document]:
+        """
+        Splits documents into chunks.
+
+        Args:
+            documents: The documents to split.
+
+        Returns:
+            The chunks of all documents.
+        """
+        return [chunk for document in documents for chunk in self.split_document(document)]
+
+    async def split_documents_async(
+        self, documents: Union[Iterable[Document], AsyncIterable[Document]]
+    ) -> AsyncIterator[Document]:
+        """
+        Lazily splits documents into chunks.
+
+        Args:
+            documents: The documents to split.
+
+        Yields:
+            The chunks of each document as soon as the document is available.
+        """
+        if isinstance(documents, AsyncIterable):
+            async for document in documents:
+                for chunk in self.split_document(document):
+                    yield chunk
+        else:
+            for document in documents:
+                for chunk in self.split_document(document):
+                    yield chunk
+
+    def __splitter_for(self, language: Optional[Language]) -> RecursiveCharacterTextSplitter:
+        if language is None:
+            return self._default_splitter
+        if language not in self._language_splitters:
+            try:
+                self._language_splitters[language] = RecursiveCharacterTextSplitter.from_language(
+                    language,
+                    chunk_size=self._settings.chunk_size,
+                    chunk_overlap=self._settings.chunk_overlap,
+                    add_start_index=True,
+                )
+            except ValueError as error:
+                # the language has no separators in the installed langchain_text_splitters
+                logger.warning(f"{error} Falling back to the generic separators.")
+                self._language_splitters[language] = self._default_splitter
+        return self._language_splitters[language]
+
+
+# splitters of the current (worker) process, keyed by the chunking settings
+_splitters: dict[str, DocumentSplitter] = {}
+
+
+def get_document_splitter(settings: ChunkingSettings) -> DocumentSplitter:
+    """
+    Gets the splitter for chunking settings, which is created once per process.
+
+    This lets worker processes reuse the splitters across their tasks.
+
+    Args:
+        settings: The chunking settings.
+
+    Returns:
+        The splitter.
+    """
+    key = settings.model_dump_json()
+    if key not in _splitters:
+        _splitters[key] = DocumentSplitter(settings)
+    return _splitters[key]
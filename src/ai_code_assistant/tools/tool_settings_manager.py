@@ -2,6 +2,7 @@
 #
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
+import asyncio
 import json
 from pathlib import Path
 from typing import Any
@@ -10,7 +11,7 @@ from pydantic import TypeAdapter
 
 from ai_code_assistant.common.app_context import AppContext
 from ai_code_assistant.common.path import remove_dir_contents
-from ai_code_assistant.tools.interfaces import ToolSettings, RetrieverToolSettings
+from ai_code_assistant.tools.interfaces import ToolSettings, RetrieverToolSettings, ToolIndexState
 
 
 class ToolSettingsManager:
@@ -32,16 +33,25 @@ class ToolSettingsManager:
         Returns:
             List of tool settings.
         """
-        results: list[ToolSettings] = []
-        for subdir in self._app_context.tools_dir_path.glob("*/"):
-            if not subdir.is_dir():
-                continue
-            tool = await self.__load_tool(subdir)
-            results.append(tool)
+        subdirs = [subdir for subdir in self._app_context.tools_dir_path.glob("*/") if subdir.is_dir()]
+        results: list[ToolSettings] = list(await asyncio.gather(*[self.__load_tool(subdir) for subdir in subdirs]))
+        for tool in results:
             self._tools[tool.name] = tool
 
         return results
 
+    async def load_tool_setting(self, tool_name: str) -> ToolSettings:
+        """
+        Load the settings of a single tool.
+        Args:
+            tool_name: Tool name.
+        Returns:
+            Tool settings.
+        """
+        tool = await self.__load_tool(self._app_context.tools_dir_path / tool_name)
+        self._tools[tool.name] = tool
+        return tool
+
     async def save_tool_setting(self, tool: ToolSettings) -> None:
         """
         Save tool settings to json file.
@@ -54,6 +64,31 @@ class ToolSettingsManager:
         setting_file.write_text(tool.model_dump_json(indent=2), encoding="utf-8")
         self._tools[tool.name] = tool
 
+    async def load_index_state(self, tool_name: str) -> ToolIndexState:
+        """
+        Load the index state of a tool.
+        Args:
+            tool_name: Tool name.
+        Returns:
+            Index state. An empty state is returned if none has been saved.
+        """
+        state_file = self._app_context.tools_dir_path / tool_name / "index_state.json"
+        if not state_file.exists():
+            return ToolIndexState()
+        return ToolIndexState.model_validate_json(state_file.read_text(encoding="utf-8"))
+
+    async def save_index_state(self, tool_name: str, state: ToolIndexState) -> None:
+        """
+        Save the index state of a tool to json file.
+        Args:
+            tool_name: Tool name.
+            state: Index state.
+        """
+        tool_dir = self._app_context.tools_dir_path / tool_name
+        tool_dir.mkdir(parents=True, exist_ok=True)
+        state_file = tool_dir / "index_state.json"
+        state_file.write_text(state.model_dump_json(indent=2), encoding="utf-8")
+
     async def remove_tool_setting(self, tool_name: str) -> ToolSettings:
         """
         Remove tool settings.
@@ -73,7 +108,7 @@ class ToolSettingsManager:
     @classmethod
     async def __load_tool(cls, tool_dir_path: Path) -> ToolSettings:
         setting_file = tool_dir_path / "setting.json"
-        json_str = setting_file.read_text(encoding="utf-8")
+        json_str = await asyncio.to_thread(setting_file.read_text, encoding="utf-8")
         settings_dict: dict[str, Any] = json.loads(json_str)
 
         settings = TypeAdapter(ToolSettings).validate_python(settings_dict)
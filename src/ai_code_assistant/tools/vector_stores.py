@@ -0,0 +1,72 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import logging
+from os.path import basename
+from pathlib import Path
+from typing import Any, Sequence
+
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ai_code_assistant.tools.interfaces import VectorStoreSettings, VectorStoreType
+from ai_code_assistant.tools.numpy_vector_store import NumpyVectorStore
+
+logger = logging.getLogger(basename(__name__))
+
+
+def open_vector_store(
+    settings: VectorStoreSettings, collection_name: str, index_dir: Path, embedding: Embeddings
+) -> VectorStore:
+    """
+    Opens the vector store of an index version with the configured backend.
+
+    Args:
+        settings: The vector store settings.
+        collection_name: The name of the collection, used by backends which store several collections.
+        index_dir: The directory of the index version.
+        embedding: The embedding model.
+
+    Returns:
+        The vector store.
+
+    Raises:
+        NotImplementedError: If the backend is not supported.
+    """
+    match settings.type:
+        case VectorStoreType.CHROMA:
+            return Chroma(
+                collection_name=collection_name,
+                persist_directory=str(index_dir),
+                embedding_function=embedding,
+            )
+        case VectorStoreType.NUMPY:
+            return NumpyVectorStore(index_dir, embedding, settings)
+        case _:
+            raise NotImplementedError(f"Vector store {settings.type} is not supported.")
+
+
+async def delete_sources_async(vector_store: VectorStore, sources: Sequence[str]) -> None:
+    """
+    Asynchronously deletes the chunks of files from a vector store.
+
+    Args:
+        vector_store: The vector store.
+        sources: The ``source`` metadata of the files.
+
+    Raises:
+        NotImplementedError: If the vector store is not supported.
+    """
+    match vector_store:
+        case Chroma():
+            where: dict[str, Any] = {"source": {"$in": list(sources)}}
+            removed_ids = (await asyncio.to_thread(vector_store.get, where=where))["ids"]
+            if removed_ids:
+                await vector_store.adelete(removed_ids)
+        case NumpyVectorStore():
+            await asyncio.to_thread(vector_store.delete_sources, sources)
+        case _:
+            raise NotImplementedError(f"Deleting from {type(vector_store).__name__} is not supported.")
@@ -0,0 +1,123 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import logging
+import queue
+import threading
+from os.path import basename
+from typing import AsyncIterator, Coroutine, Generator, TypeVar, Any, Union
+
+logger = logging.getLogger(basename(__name__))
+
+T = TypeVar("T")
+
+
+class _Done:
+    pass
+
+
+class _Error:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class BackgroundEventLoop:
+    """
+    Runs an asyncio event loop in a daemon thread, so that synchronous code (e.g. Mesop event handlers)
+    can run coroutines and consume async iterators from any thread.
+
+    Each call gets its own queue, so several threads can stream from the loop at the same time.
+    """
+
+    def __init__(self, name: str = "background-event-loop") -> None:
+        """
+        Initializes and starts the event loop thread.
+
+        Args:
+            name: The name of the thread.
+        """
+        super().__init__()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Gets the event loop.
+
+        Returns:
+            The event loop running in the background thread.
+        """
+        return self._loop
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """
+        Runs a coroutine on the event loop and waits for its result.
+
+        Args:
+            coroutine: The coroutine to run.
+
+        Returns:
+            The result of the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def run_async(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """
+        Runs a coroutine on the event loop and awaits its result from any event loop.
+
+        Args:
+            coroutine: The coroutine to run.
+
+        Returns:
+            The result of the coroutine.
+        """
+        if asyncio.get_running_loop() is self._loop:
+            return await coroutine
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self._loop))
+
+    def iterate(self, async_iterator: AsyncIterator[T]) -> Generator[T, None, None]:
+        """
+        Consumes an async iterator on the event loop and yields its items to the calling thread.
+
+        Items are handed over through a thread-safe queue as soon as they are produced.
+        If the generator is closed early, the async iterator is cancelled.
+
+        Args:
+            async_iterator: The async iterator to consume.
+
+        Yields:
+            The items of the async iterator.
+        """
+        items: queue.Queue[Union[T, _Done, _Error]] = queue.Queue()
+
+        async def pump() -> None:
+            try:
+                async for item in async_iterator:
+                    items.put(item)
+            except BaseException as error:
+                items.put(_Error(error))
+                raise
+            finally:
+                items.put(_Done())
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        try:
+            while not isinstance(item := items.get(), _Done):
+                if isinstance(item, _Error):
+                    raise item.error
+                yield item
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def close(self) -> None:
+        """
+        Stops the event loop and waits for the thread to finish.
+        """
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
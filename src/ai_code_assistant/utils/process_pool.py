@@ -0,0 +1,61 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from os.path import basename
+from typing import Any, AsyncGenerator, Callable, Optional, Sequence, TypeVar
+
+logger = logging.getLogger(basename(__name__))
+
+T = TypeVar("T")
+
+
+async def map_in_processes_async(
+    function: Callable[..., T],
+    tasks: Sequence[tuple[Any, ...]],
+    max_workers: Optional[int] = None,
+) -> AsyncGenerator[T, None]:
+    """
+    Calls a function with the arguments of each task in a process pool and yields the results in task order.
+
+    At most two tasks per worker are submitted ahead of the consumer, so memory is bounded by the size of
+    the results of a task rather than of all tasks. A single task is run in a thread instead of starting a pool.
+    Tasks which have not been started are cancelled if the iteration stops early, without waiting for the running
+    tasks, so the event loop is not blocked. The workers are spawned rather than forked,
+    because the calling process runs other threads (e.g. event loops and database clients).
+
+    Args:
+        function: A picklable (module level) function.
+        tasks: The arguments of each call. They must be picklable.
+        max_workers: The number of worker processes. Defaults to the number of CPUs if None.
+
+    Yields:
+        The result of each task.
+    """
+    if len(tasks) <= 1:
+        for args in tasks:
+            yield await asyncio.to_thread(function, *args)
+        return
+
+    loop = asyncio.get_running_loop()
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    pending: deque[asyncio.Future[T]] = deque()
+    try:
+        for args in tasks:
+            pending.append(loop.run_in_executor(executor, function, *args))
+            if len(pending) >= 2 * max_workers:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+        # running tasks finish in the worker processes, which exit afterwards
+        executor.shutdown(wait=False, cancel_futures=True)
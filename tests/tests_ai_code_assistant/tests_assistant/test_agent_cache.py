@@ -0,0 +1,45 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from unittest.mock import MagicMock
+
+from langchain_core.tools import tool
+from langgraph.graph.graph import CompiledGraph
+
+from ai_code_assistant.assistant.agent_cache import AgentCache
+from ai_code_assistant.assistant.interfaces import AiConfig, AiTool
+from ai_code_assistant.llm.interfaces import LlmConfig
+from ai_code_assistant.tools.interfaces import ToolSettings, ToolType
+
+
+@tool
+def echo(text: str) -> str:
+    """Echo the text."""
+    return text
+
+
+def _ai_tool() -> AiTool:
+    return AiTool(tool=echo.model_copy(), tool_settings=ToolSettings(name="echo", type=ToolType.BUILTIN, enabled=True))
+
+
+def test_get_or_create() -> None:
+    cache = AgentCache(max_size=2)
+    ai_tool = _ai_tool()
+    config = AiConfig(chat_llm=LlmConfig(), tools=[ai_tool])
+    agent = MagicMock(spec=CompiledGraph)
+
+    assert cache.get_or_create(config, lambda: agent) is agent
+    # same LLM config and tool instances
+    same_config = AiConfig(chat_llm=LlmConfig(), tools=[ai_tool])
+    assert cache.get_or_create(same_config, lambda: MagicMock(spec=CompiledGraph)) is agent
+    # different LLM config
+    other_llm = AiConfig(chat_llm=LlmConfig(llm_model="other"), tools=[ai_tool])
+    assert cache.get_or_create(other_llm, lambda: MagicMock(spec=CompiledGraph)) is not agent
+    # reloaded tool instance
+    reloaded_tool = AiConfig(chat_llm=LlmConfig(), tools=[_ai_tool()])
+    assert cache.get_or_create(reloaded_tool, lambda: MagicMock(spec=CompiledGraph)) is not agent
+
+    # the least recently used agent has been evicted
+    new_agent = MagicMock(spec=CompiledGraph)
+    assert cache.get_or_create(config, lambda: new_agent) is new_agent
@@ -0,0 +1,54 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from typing import Any, AsyncIterator
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langgraph.graph.graph import CompiledGraph
+
+from ai_code_assistant.assistant.assistant import AiAssistant
+from ai_code_assistant.assistant.interfaces import AiConfig
+from ai_code_assistant.llm.interfaces import LlmConfig
+
+
+def _create_assistant(agent: Any = None) -> AiAssistant:
+    return AiAssistant(agent or MagicMock(spec=CompiledGraph), AiConfig(chat_llm=LlmConfig(), tools=[]))
+
+
+def test_system() -> None:
+    assistant = _create_assistant()
+    system = SystemMessage("You are a coding assistant.")
+
+    assistant.system = system
+    assistant.system = SystemMessage("You are a coding assistant.")
+
+    assert assistant.system is system
+    assistant.system = SystemMessage("You are a reviewer.")
+    assert assistant.system is not None and assistant.system.content == "You are a reviewer."
+
+
+@pytest.mark.asyncio
+async def test_ask_async() -> None:
+    received: list[list[BaseMessage]] = []
+
+    async def astream_events(agent_input: dict[str, Any], **kwargs: Any) -> AsyncIterator[dict[str, Any]]:
+        received.append(list(agent_input["messages"]))
+        answer = AIMessage("answer")
+        yield {"event": "on_chat_model_stream", "name": "model", "data": {"chunk": answer}}
+        yield {"event": "on_chain_end", "name": "agent", "data": {"output": {"messages": [answer]}}}
+
+    agent = MagicMock(spec=CompiledGraph)
+    agent.astream_events = astream_events
+    assistant = _create_assistant(agent)
+    assistant.system = SystemMessage("system")
+
+    assert [chunk async for chunk in assistant.ask_async(HumanMessage("question"))] == ["answer"]
+
+    assert received == [[SystemMessage("system"), HumanMessage("question")]]
+    assert assistant.history == [HumanMessage("question"), AIMessage("answer")]
+    assistant.clear_history()
+    assert assistant.history == []
+    assert assistant.system == SystemMessage("system")
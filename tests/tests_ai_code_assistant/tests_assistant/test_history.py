@@ -0,0 +1,65 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from ai_code_assistant.assistant.history import HistoryWindow, estimate_tokens, split_turns
+from ai_code_assistant.assistant.interfaces import HistorySettings
+
+
+def _turn(index: int, tool_output: str) -> list[BaseMessage]:
+    return [
+        HumanMessage(f"question {index}"),
+        AIMessage("", tool_calls=[{"name": "search", "args": {"query": f"q{index}"}, "id": f"call-{index}"}]),
+        ToolMessage(tool_output, tool_call_id=f"call-{index}"),
+        AIMessage(f"answer {index}"),
+    ]
+
+
+def test_split_turns() -> None:
+    turns = split_turns(_turn(0, "out") + _turn(1, "out"))
+
+    assert [len(turn) for turn in turns] == [4, 4]
+    assert turns[1][0].content == "question 1"
+
+
+@pytest.mark.asyncio
+async def test_fit_async_truncates_old_tool_outputs() -> None:
+    settings = HistorySettings(max_tokens=1000, tool_output_tokens=10, keep_turns=1)
+    window = HistoryWindow(settings)
+    history = _turn(0, "x" * 2000) + _turn(1, "y" * 2000)
+
+    fitted = await window.fit_async(history, SystemMessage("system"))
+
+    assert len(fitted) == 8
+    assert fitted[2].content == "x" * 40 + "\n... [truncated]"
+    assert isinstance(fitted[2], ToolMessage) and fitted[2].tool_call_id == "call-0"
+    assert fitted[6].content == "y" * 2000
+    assert window.summary == ""
+
+
+@pytest.mark.asyncio
+async def test_fit_async_summarizes_old_turns() -> None:
+    settings = HistorySettings(max_tokens=300, tool_output_tokens=10, summary_tokens=50, keep_turns=1)
+    llm = FakeListChatModel(responses=["summary 1", "summary 2", "summary 3", "summary 4"])
+    window = HistoryWindow(settings, llm)
+    system = SystemMessage("system")
+    history: list[BaseMessage] = []
+    prompt_tokens = []
+
+    for index in range(8):
+        history = await window.fit_async(history + _turn(index, "z" * 400), system)
+        prompt = window.prompt(history, system)
+        prompt_tokens.append(estimate_tokens(prompt))
+
+    assert history[0].content != "question 0"
+    assert history[-4:] == _turn(7, "z" * 400)
+    assert window.summary.startswith("summary")
+    assert prompt[0].content == f"system\n\nSummary of the earlier conversation:\n{window.summary}"
+    assert max(prompt_tokens) <= settings.max_tokens
+
+    window.clear()
+    assert window.prompt([], system) == [system]
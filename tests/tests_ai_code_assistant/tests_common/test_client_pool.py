@@ -0,0 +1,106 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import httpx
+import pytest
+
+from ai_code_assistant.common.client_pool import ClientPool, endpoint_from_env
+from ai_code_assistant.llm.interfaces import LlmConfig
+from ai_code_assistant.llm.llm import AiLlms
+from ai_code_assistant.tools.embeddings import create_embedding
+from ai_code_assistant.tools.interfaces import ModelServiceType
+
+
+def test_get_or_create() -> None:
+    pool: ClientPool[object] = ClientPool("test")
+
+    client = pool.get_or_create(("ollama", "model", None), object)
+
+    assert pool.get_or_create(("ollama", "model", None), object) is client
+    assert pool.get_or_create(("ollama", "other", None), object) is not client
+    assert len(pool) == 2
+    pool.clear()
+    assert pool.get_or_create(("ollama", "model", None), object) is not client
+
+
+class _EmbedHandler(BaseHTTPRequestHandler):
+    # keep-alive connections, which are pooled by async HTTP clients
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"model": "bge-m3", "embeddings": [[0.5, 0.5]]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EmbedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_clients_per_event_loop(server_url: str) -> None:
+    pool: ClientPool[httpx.AsyncClient] = ClientPool("test")
+
+    async def post() -> httpx.AsyncClient:
+        client = pool.get_or_create("key", httpx.AsyncClient)
+        assert pool.get_or_create("key", httpx.AsyncClient) is client
+        (await client.post(f"{server_url}/api/embed", content=b"{}")).raise_for_status()
+        return client
+
+    # a client whose connections were opened on the first loop would fail with "Event loop is closed"
+    first, second = asyncio.run(post()), asyncio.run(post())
+    assert first is not second
+    assert len(pool) == 1
+
+
+def test_pooled_embeddings_across_event_loops(monkeypatch: pytest.MonkeyPatch, server_url: str) -> None:
+    monkeypatch.setenv("OLLAMA_HOST", server_url)
+    embeddings = create_embedding("bge-m3", ModelServiceType.OLLAMA)
+
+    assert asyncio.run(embeddings.aembed_documents(["a"])) == [[0.5, 0.5]]
+    assert asyncio.run(embeddings.aembed_query("b")) == [0.5, 0.5]
+    assert embeddings.embed_query("c") == [0.5, 0.5]
+
+
+def test_endpoint_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("FIRST_ENDPOINT", raising=False)
+    monkeypatch.setenv("SECOND_ENDPOINT", "http://second")
+
+    assert endpoint_from_env("FIRST_ENDPOINT", "SECOND_ENDPOINT") == "http://second"
+    monkeypatch.setenv("FIRST_ENDPOINT", "http://first")
+    assert endpoint_from_env("FIRST_ENDPOINT", "SECOND_ENDPOINT") == "http://first"
+    monkeypatch.delenv("FIRST_ENDPOINT")
+    monkeypatch.delenv("SECOND_ENDPOINT")
+    assert endpoint_from_env("FIRST_ENDPOINT", "SECOND_ENDPOINT") is None
+
+
+def test_shared_ollama_clients(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OLLAMA_HOST", "http://localhost:11434")
+    embeddings = create_embedding("bge-m3", ModelServiceType.OLLAMA)
+    llm = AiLlms().create_llm(LlmConfig(llm_provider="ollama", llm_model="llama3.1"))
+
+    assert create_embedding("bge-m3", ModelServiceType.OLLAMA) is embeddings
+    assert AiLlms().create_llm(LlmConfig(llm_provider="ollama", llm_model="llama3.1")) is llm
+    # another endpoint gets its own client
+    monkeypatch.setenv("OLLAMA_HOST", "http://other-host:11434")
+    assert create_embedding("bge-m3", ModelServiceType.OLLAMA) is not embeddings
+    assert AiLlms().create_llm(LlmConfig(llm_provider="ollama", llm_model="llama3.1")) is not llm
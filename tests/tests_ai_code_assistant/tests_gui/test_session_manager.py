@@ -0,0 +1,59 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.messages import SystemMessage
+from langgraph.graph.graph import CompiledGraph
+
+from ai_code_assistant.assistant.assistant import AiAssistant
+from ai_code_assistant.assistant.interfaces import AiConfig
+from ai_code_assistant.gui.model.session_manager import SessionManager
+from ai_code_assistant.llm.interfaces import LlmConfig
+
+
+def _create_session() -> AiAssistant:
+    return AiAssistant(MagicMock(spec=CompiledGraph), AiConfig(chat_llm=LlmConfig(), tools=[]))
+
+
+def test_get_isolates_sessions() -> None:
+    sessions = SessionManager(_create_session)
+
+    first = sessions.get("first")
+    first.system = SystemMessage("first prompt")
+
+    assert sessions.get("first") is first
+    assert sessions.get("second") is not first
+    assert sessions.get("second").system is None
+    assert len(sessions) == 2
+
+
+def test_get_evicts_least_recently_used() -> None:
+    sessions = SessionManager(_create_session, max_sessions=2)
+    first = sessions.get("first")
+    second = sessions.get("second")
+
+    sessions.get("first")
+    sessions.get("third")
+
+    assert len(sessions) == 2
+    assert sessions.get("first") is first
+    assert sessions.get("second") is not second
+
+
+def test_get_evicts_idle_sessions(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr("ai_code_assistant.gui.model.session_manager.time.monotonic", lambda: now[0])
+    sessions = SessionManager(_create_session, idle_timeout_seconds=10)
+    idle = sessions.get("idle")
+    active = sessions.get("active")
+
+    now[0] = 105.0
+    sessions.get("active")
+    now[0] = 112.0
+    sessions.get("other")
+
+    assert sessions.assistants() == [active, sessions.get("other")]
+    assert sessions.get("idle") is not idle
@@ -2,7 +2,10 @@
 #
 #  This software is released under the MIT License.
 #  http://opensource.org/licenses/mit-license.php
+from pathlib import Path
+
 import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
 
 from ai_code_assistant.common.app_context import AppContext
 from ai_code_assistant.tools.ai_tools import AiTools
@@ -12,6 +15,8 @@ from ai_code_assistant.tools.interfaces import (
     GitDocumentSourceSettings,
     ModelServiceType,
 )
+from ai_code_assistant.tools.pdf_source import pdf_upload_path
+from ai_code_assistant.tools.tool_settings_manager import ToolSettingsManager
 
 
 @pytest.mark.skip(reason="needs ollama server")
@@ -37,3 +42,79 @@ async def test_create_tool_async() -> None:
     assert tool
     removed = await ai_tools.remove_tool_setting(tool.name)
     assert removed.name == tool.name
+
+
+@pytest.mark.asyncio
+async def test_load_tools_async(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def create_fake_embedding(*_: object, **__: object) -> Embeddings:
+        return DeterministicFakeEmbedding(size=8)
+
+    warmed_up: list[tuple[str, ModelServiceType]] = []
+
+    async def warm_up_embedding_async(embedding_model: str, model_service: ModelServiceType) -> None:
+        warmed_up.append((embedding_model, model_service))
+
+    monkeypatch.setattr("ai_code_assistant.tools.retriever_tool.create_embedding", create_fake_embedding)
+    monkeypatch.setattr("ai_code_assistant.tools.ai_tools.warm_up_embedding_async", warm_up_embedding_async)
+    app_context = AppContext(
+        data_dir=tmp_path / "data",
+        db_dir=tmp_path / "db",
+        repository_dir=tmp_path / "repository",
+        tools_dir_path=tmp_path / "tools",
+    )
+    names = [f"tool{i}" for i in range(4)]
+    setting_manager = ToolSettingsManager(app_context)
+    for name in names:
+        await setting_manager.save_tool_setting(
+            RetrieverToolSettings.of_git_source(source_name=name, clone_url="clone_url", branch="branch")
+        )
+
+    ai_tools = AiTools(app_context)
+    tools = await ai_tools.load_tools_async()
+
+    assert sorted(tool.tool.name for tool in tools) == names
+    assert all(tool.tool.name == tool.tool_settings.name for tool in tools)
+
+    # unchanged tools are reused, changed and removed tools are not
+    tool0 = next(tool for tool in tools if tool.tool_settings.name == "tool0")
+    tool1 = next(tool for tool in tools if tool.tool_settings.name == "tool1")
+    await setting_manager.save_tool_setting(tool1.tool_settings.model_copy(update={"description": "changed"}))
+    await ai_tools.remove_tool_setting("tool2")
+    reloaded = {tool.tool_settings.name: tool for tool in await ai_tools.load_tools_async()}
+
+    assert sorted(reloaded) == ["tool0", "tool1", "tool3"]
+    assert reloaded["tool0"] is tool0
+    assert reloaded["tool1"] is not tool1
+    assert reloaded["tool1"].tool.description == "changed"
+    # the embedding model shared by all tools is warmed up once
+    assert warmed_up == [("bge-m3", ModelServiceType.OLLAMA)]
+
+
+@pytest.mark.asyncio
+async def test_remove_tool_setting_removes_pdf_upload(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    async def warm_up_embedding_async(*_: object) -> None:
+        pass
+
+    monkeypatch.setattr("ai_code_assistant.tools.ai_tools.warm_up_embedding_async", warm_up_embedding_async)
+    app_context = AppContext(data_dir=tmp_path / "data", tools_dir_path=tmp_path / "tools")
+    setting_manager = ToolSettingsManager(app_context)
+    uploaded = pdf_upload_path(app_context, "uploaded")
+    uploaded.parent.mkdir(parents=True)
+    uploaded.write_bytes(b"%PDF")
+    external = tmp_path / "external.pdf"
+    external.write_bytes(b"%PDF")
+    await setting_manager.save_tool_setting(
+        RetrieverToolSettings.of_pdf_source(source_name="uploaded", file_path=str(uploaded))
+    )
+    await setting_manager.save_tool_setting(
+        RetrieverToolSettings.of_pdf_source(source_name="external", file_path=str(external))
+    )
+    ai_tools = AiTools(app_context)
+    await ai_tools.load_tools_async()
+
+    await ai_tools.remove_tool_setting("uploaded")
+    await ai_tools.remove_tool_setting("external")
+
+    assert not uploaded.exists()
+    # PDF files which are not managed copies of uploads are kept
+    assert external.exists()
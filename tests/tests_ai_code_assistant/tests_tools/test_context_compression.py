@@ -0,0 +1,59 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import contextvars
+
+from langchain_core.documents import Document
+
+from ai_code_assistant.tools.context_compression import (
+    RetrievalContext,
+    RetrievedContextCompressor,
+    use_retrieval_context,
+)
+from ai_code_assistant.tools.interfaces import ContextCompressionSettings
+
+_SOURCE = "line 1\nline 2\nline 3\nline 4\nline 5\nline 6"
+
+
+def _chunk(start: int, end: int, source: str = "foo.py") -> Document:
+    return Document(page_content=_SOURCE[start:end], metadata={"source": source, "start_index": start})
+
+
+def test_compress_documents_merges_adjacent_chunks() -> None:
+    compressor = RetrievedContextCompressor()
+    documents = [_chunk(21, 41), _chunk(0, 13), _chunk(0, 6, "bar.py"), _chunk(10, 27)]
+
+    compressed = compressor.compress_documents(documents, "line")
+
+    assert [document.page_content for document in compressed] == [_SOURCE, "line 1"]
+    assert compressed[0].metadata == {"source": "foo.py", "start_index": 0}
+
+
+def test_compress_documents_deduplicates_in_conversation() -> None:
+    compressor = RetrievedContextCompressor(settings=ContextCompressionSettings(merge_adjacent=False))
+    context = RetrievalContext()
+
+    def retrieve(documents: list[Document]) -> list[str]:
+        use_retrieval_context(context)
+        return [document.page_content for document in compressor.compress_documents(documents, "line")]
+
+    assert contextvars.copy_context().run(retrieve, [_chunk(0, 6), _chunk(7, 13)]) == ["line 1", "line 2"]
+    assert contextvars.copy_context().run(retrieve, [_chunk(7, 13), _chunk(14, 20)]) == ["line 3"]
+    assert (context.tokens_retrieved, context.tokens_returned) == (6, 4)
+    assert contextvars.copy_context().run(retrieve, [_chunk(7, 13)]) == [
+        "All matching chunks have already been provided earlier in this conversation."
+    ]
+
+    context.forget()
+    assert contextvars.copy_context().run(retrieve, [_chunk(7, 13)]) == ["line 2"]
+
+
+def test_compress_documents_trims_to_query() -> None:
+    settings = ContextCompressionSettings(trim_to_query=True, context_lines=1)
+    compressor = RetrievedContextCompressor(settings=settings)
+    document = Document(page_content="a\nb\nc\ndef foo():\nd\ne\nf\ng\nfoo()\nh")
+
+    compressed = compressor.compress_documents([document], "where is foo called?")
+
+    assert compressed[0].page_content == "...\nc\ndef foo():\nd\n...\ng\nfoo()\nh"
@@ -0,0 +1,81 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from ai_code_assistant.tools.embedding_cache import EmbeddingCache, CachedEmbeddings, QueryEmbeddingCache
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    embedded_texts: list[str] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.embedded_texts.extend(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self.embedded_texts.append(text)
+        return super().embed_query(text)
+
+
+def test_cached_embeddings_hits_and_misses(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3")
+    embedding = CountingEmbedding(size=4, embedded_texts=[])
+    cached = CachedEmbeddings(embedding, cache, "fake:model")
+
+    first = cached.embed_documents(["a", "b", "a"])
+    assert embedding.embedded_texts == ["a", "b"]
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    second = cached.embed_documents(["b", "c"])
+    assert embedding.embedded_texts == ["a", "b", "c"]
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert second[0] == pytest.approx(first[1])
+    assert cache.size == 3
+
+
+def test_cache_is_persistent_and_namespaced(tmp_path: Path) -> None:
+    db_path = tmp_path / "cache.sqlite3"
+    CachedEmbeddings(DeterministicFakeEmbedding(size=4), EmbeddingCache(db_path), "fake:model").embed_documents(["a"])
+
+    cache = EmbeddingCache(db_path)
+    embedding = CountingEmbedding(size=4, embedded_texts=[])
+    CachedEmbeddings(embedding, cache, "fake:model").embed_documents(["a"])
+    assert embedding.embedded_texts == []
+
+    CachedEmbeddings(embedding, cache, "fake:other_model").embed_documents(["a"])
+    assert embedding.embedded_texts == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_entries=2)
+    cached = CachedEmbeddings(DeterministicFakeEmbedding(size=4), cache, "fake:model")
+
+    await cached.aembed_documents(["a"])
+    await cached.aembed_documents(["b"])
+    await cached.aembed_documents(["a"])
+    await cached.aembed_documents(["c"])
+
+    assert cache.size == 2
+    keys = [EmbeddingCache.make_key("fake:model", text) for text in ["a", "b", "c"]]
+    assert set(cache.get_many(keys)) == {keys[0], keys[2]}
+
+
+@pytest.mark.asyncio
+async def test_query_cache(tmp_path: Path) -> None:
+    inner = CountingEmbedding(size=4, embedded_texts=[])
+    query_cache = QueryEmbeddingCache(max_entries=1)
+    embeddings = CachedEmbeddings(inner, EmbeddingCache(tmp_path / "cache.sqlite3"), "fake:4", query_cache)
+
+    vector = embeddings.embed_query("query")
+    assert await embeddings.aembed_query("query") == vector
+    embeddings.embed_query("other")
+    embeddings.embed_query("query")
+
+    assert inner.embedded_texts == ["query", "other", "query"]
+    assert (query_cache.hits, query_cache.misses) == (1, 3)
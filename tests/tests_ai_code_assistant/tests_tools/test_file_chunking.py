@@ -0,0 +1,65 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from pathlib import Path
+
+import pytest
+
+from ai_code_assistant.tools.file_chunking import iter_file_chunks_async
+from ai_code_assistant.tools.interfaces import ChunkingSettings, GitDocumentSourceSettings, IndexingStage
+
+
+@pytest.mark.asyncio
+async def test_iter_file_chunks_async(tmp_path: Path) -> None:
+    files = {f"pkg/module{number}.py": f"def function{number}():\n    return {number}\n" * 3 for number in range(5)}
+    files["vendor/lib.py"] = "x = 1\n"
+    for name, content in files.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(content, encoding="utf-8")
+    (tmp_path / "binary.py").write_bytes(b"\0")
+    source = GitDocumentSourceSettings(clone_url="clone_url", branch="main", ignore_patterns=["vendor/*"])
+    chunking = ChunkingSettings(chunk_size=40, chunk_overlap=0, workers=2, files_per_task=2)
+    progress: dict[IndexingStage, tuple[int, int]] = {}
+
+    def on_progress(stage: IndexingStage, processed: int, total: int) -> None:
+        progress[stage] = (processed, total)
+
+    chunks = [
+        chunk
+        async for chunk in iter_file_chunks_async(
+            tmp_path, [*files, "binary.py", "missing.py"], source, chunking, on_progress
+        )
+    ]
+
+    assert [(chunk.metadata["source"], chunk.metadata["start_index"]) for chunk in chunks] == [
+        (f"pkg/module{number}.py", start_index) for number in range(5) for start_index in (0, 30, 60)
+    ]
+    assert chunks[0].page_content == "def function0():\n    return 0"
+    assert chunks[0].metadata["file_type"] == ".py"
+    assert progress == {IndexingStage.LOAD: (7, 7), IndexingStage.SPLIT: (15, 0)}
+
+
+@pytest.mark.asyncio
+async def test_iter_file_chunks_async_filters(tmp_path: Path) -> None:
+    files = {
+        "a.py": "a = 1\n",
+        "b.txt": "b\n",
+        "vendor/c.py": "c = 1\n",
+        "large.py": "x = 1\n" * 100,
+    }
+    for name, content in files.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(content, encoding="utf-8")
+    (tmp_path / "nul.py").write_bytes(b"a = 1\0\n")
+    source = GitDocumentSourceSettings(
+        clone_url="clone_url",
+        branch="main",
+        include_extensions=[".py"],
+        ignore_patterns=["vendor/*"],
+        max_file_size=100,
+    )
+
+    chunks = [chunk async for chunk in iter_file_chunks_async(tmp_path, [*files, "nul.py"], source, ChunkingSettings())]
+
+    assert [chunk.metadata["source"] for chunk in chunks] == ["a.py"]
@@ -0,0 +1,130 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from pathlib import Path
+
+from git import Repo
+
+from ai_code_assistant.tools.git_source import (
+    open_repository,
+    head_commit,
+    list_files,
+    diff_files,
+    load_file_document,
+    has_commit,
+    matches_file_filter,
+)
+from ai_code_assistant.tools.interfaces import GitDocumentSourceSettings
+
+
+def _commit_files(repo: Repo, files: dict[str, str | None], message: str) -> str:
+    work_dir = Path(str(repo.working_tree_dir))
+    for name, content in files.items():
+        path = work_dir / name
+        if content is None:
+            repo.index.remove([name], working_tree=True)
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+        repo.index.add([name])
+    return repo.index.commit(message).hexsha
+
+
+def _create_remote(tmp_path: Path) -> Repo:
+    remote = Repo.init(tmp_path / "remote", initial_branch="main")
+    _commit_files(remote, {"a.py": "print('a')\n", "pkg/b.py": "print('b')\n", "c.txt": "c\n"}, "initial")
+    return remote
+
+
+def test_open_repository_clones_and_updates(tmp_path: Path) -> None:
+    remote = _create_remote(tmp_path)
+    repo_path = tmp_path / "checkout"
+
+    repo = open_repository(str(remote.working_tree_dir), repo_path, "main")
+    assert sorted(list_files(repo)) == ["a.py", "c.txt", "pkg/b.py"]
+    first_commit = head_commit(repo)
+
+    new_commit = _commit_files(remote, {"d.py": "print('d')\n"}, "add d")
+    repo = open_repository(str(remote.working_tree_dir), repo_path, "main")
+    assert head_commit(repo) == new_commit != first_commit
+    assert (repo_path / "d.py").exists()
+
+
+def test_open_repository_shallow_and_sparse(tmp_path: Path) -> None:
+    work = Repo.init(tmp_path / "work", initial_branch="main")
+    first_commit = _commit_files(work, {"root.py": "r\n", "src/a.py": "a\n", "docs/b.md": "b\n"}, "initial")
+    second_commit = _commit_files(work, {"src/a.py": "a2\n"}, "change a")
+    work.create_head("other")
+    bare = work.clone(tmp_path / "remote.git", bare=True)
+    clone_url = Path(str(bare.git_dir)).as_uri()
+    repo_path = tmp_path / "checkout"
+
+    repo = open_repository(clone_url, repo_path, "main", depth=1, sparse_paths=["src"])
+
+    assert head_commit(repo) == second_commit
+    assert [commit.hexsha for commit in repo.iter_commits()] == [second_commit]
+    assert not has_commit(repo, first_commit)
+    assert "origin/other" not in [ref.name for ref in repo.remotes.origin.refs]
+    assert sorted(str(path.relative_to(repo_path)) for path in repo_path.rglob("*.*") if ".git" not in path.parts) == [
+        "root.py",
+        "src/a.py",
+    ]
+
+    # an existing checkout is updated by fetch and reset, and the old commit is still available for diffs
+    third_commit = _commit_files(work, {"src/c.py": "c\n", "docs/d.md": "d\n"}, "add c and d")
+    work.git.push(str(bare.git_dir), "main")
+    repo = open_repository(clone_url, repo_path, "main", depth=1, sparse_paths=["src"])
+    assert head_commit(repo) == third_commit
+    assert (repo_path / "src" / "c.py").exists() and not (repo_path / "docs").exists()
+    assert has_commit(repo, second_commit)
+    assert sorted(diff_files(repo, second_commit, third_commit).upserted) == ["docs/d.md", "src/c.py"]
+
+    # dropping the sparse paths checks out the whole repository
+    repo = open_repository(clone_url, repo_path, "main", depth=1)
+    assert (repo_path / "docs" / "d.md").exists()
+
+
+def test_matches_sparse_paths() -> None:
+    source = GitDocumentSourceSettings(clone_url="clone_url", branch="main", sparse_paths=["src", "docs/api/"])
+
+    assert matches_file_filter(source, "root.py")
+    assert matches_file_filter(source, "src/a.py")
+    assert matches_file_filter(source, "docs/api/b.md")
+    assert not matches_file_filter(source, "docs/c.md")
+    assert not matches_file_filter(source, "srcs/d.py")
+
+
+def test_diff_files(tmp_path: Path) -> None:
+    remote = _create_remote(tmp_path)
+    old_commit = remote.head.commit.hexsha
+    remote.index.move(["c.txt", "renamed.txt"])
+    new_commit = _commit_files(
+        remote,
+        {"a.py": "print('a2')\n", "pkg/b.py": None, "new.py": "print('new')\n"},
+        "change",
+    )
+
+    changes = diff_files(remote, old_commit, new_commit)
+
+    assert sorted(changes.upserted) == ["a.py", "new.py", "renamed.txt"]
+    assert sorted(changes.removed) == ["a.py", "c.txt", "pkg/b.py"]
+
+
+def test_load_file_document(tmp_path: Path) -> None:
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "b.py").write_text("print('b')\n", encoding="utf-8")
+    (tmp_path / "binary.bin").write_bytes(b"\xff\xfe\x00")
+
+    document = load_file_document(tmp_path, "pkg/b.py")
+    assert document is not None
+    assert document.page_content == "print('b')\n"
+    assert document.metadata == {
+        "source": "pkg/b.py",
+        "file_path": "pkg/b.py",
+        "file_name": "b.py",
+        "file_type": ".py",
+    }
+    assert load_file_document(tmp_path, "binary.bin") is None
+    assert load_file_document(tmp_path, "missing.py") is None
+    assert load_file_document(tmp_path, "pkg/b.py", max_file_size=4) is None
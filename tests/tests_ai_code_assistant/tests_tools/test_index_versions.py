@@ -0,0 +1,68 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from pathlib import Path
+
+from ai_code_assistant.tools.index_versions import IndexVersions, BUILDING_MARKER_FILE_NAME
+
+
+def test_publish_switches_and_collects_garbage(tmp_path: Path) -> None:
+    versions = IndexVersions(tmp_path / "tool")
+    assert versions.current is None
+    assert versions.current_dir() == tmp_path / "tool"
+
+    for version in ["v1", "v2", "v3"]:
+        (versions.prepare(version) / "index.sqlite3").write_text(version)
+        versions.publish(version)
+
+    assert versions.current == "v3"
+    assert (versions.current_dir() / "index.sqlite3").read_text() == "v3"
+    # the replaced version is kept for tools loaded before the switch
+    assert sorted(path.name for path in (tmp_path / "tool" / "versions").iterdir()) == ["v2", "v3"]
+
+
+def test_publish_keeps_versions_being_built(tmp_path: Path) -> None:
+    versions = IndexVersions(tmp_path / "tool")
+    for version in ["v1", "v2"]:
+        versions.prepare(version)
+        versions.publish(version)
+
+    building = versions.prepare("v3")
+    (versions.prepare("v4") / "index.sqlite3").write_text("v4")
+    versions.publish("v4")
+
+    assert building.exists()
+    assert not (versions.current_dir() / BUILDING_MARKER_FILE_NAME).exists()
+    versions.publish("v3")
+    assert sorted(path.name for path in (tmp_path / "tool" / "versions").iterdir()) == ["v3", "v4"]
+
+
+def test_prepare_copies_current_and_discard(tmp_path: Path) -> None:
+    versions = IndexVersions(tmp_path / "tool")
+    (versions.prepare("v1") / "index.sqlite3").write_text("v1")
+    versions.publish("v1")
+
+    copy = versions.prepare("v2", copy_current=True)
+    assert (copy / "index.sqlite3").read_text() == "v1"
+    versions.discard("v2")
+    assert not copy.exists()
+    assert versions.current == "v1"
+
+
+def test_legacy_layout(tmp_path: Path) -> None:
+    tool_dir = tmp_path / "tool"
+    tool_dir.mkdir()
+    (tool_dir / "chroma.sqlite3").write_text("legacy")
+    (tool_dir / "query_cache.sqlite3").write_text("cache")
+    versions = IndexVersions(tool_dir, shared_names=["query_cache.sqlite3"])
+
+    copy = versions.prepare("v1", copy_current=True)
+    assert sorted(path.name for path in copy.iterdir()) == [BUILDING_MARKER_FILE_NAME, "chroma.sqlite3"]
+    versions.publish("v1")
+    # the legacy layout is the replaced version until v1 is replaced too
+    assert (tool_dir / "chroma.sqlite3").exists()
+
+    versions.prepare("v2")
+    versions.publish("v2")
+    assert sorted(path.name for path in tool_dir.iterdir()) == ["CURRENT", "query_cache.sqlite3", "versions"]
@@ -0,0 +1,69 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from ai_code_assistant.tools.indexing_jobs import IndexingJobQueue, IndexingJobStatus, StageProgress
+from ai_code_assistant.tools.interfaces import IndexingStage, ProgressCallback
+
+
+@pytest.mark.asyncio
+async def test_run_jobs(tmp_path: Path) -> None:
+    state_file = tmp_path / "indexing_jobs.json"
+    queue = IndexingJobQueue(asyncio.get_running_loop(), state_file)
+
+    async def index(progress: ProgressCallback) -> None:
+        progress(IndexingStage.LOAD, 3, 10)
+        progress(IndexingStage.LOAD, 10, 10)
+        progress(IndexingStage.EMBED, 25, 0)
+
+    async def fail(_: ProgressCallback) -> None:
+        raise RuntimeError("clone failed")
+
+    succeeded = await queue.wait_async(queue.submit("tool0", "Add tool0", index).id)
+    failed = await queue.wait_async(queue.submit("tool1", "Add tool1", fail).id)
+
+    assert succeeded.status == IndexingJobStatus.SUCCEEDED
+    assert succeeded.stages == {
+        IndexingStage.LOAD: StageProgress(processed=10, total=10),
+        IndexingStage.EMBED: StageProgress(processed=25, total=0),
+    }
+    assert (failed.status, failed.error) == (IndexingJobStatus.FAILED, "clone failed")
+    assert [job.tool_name for job in queue.jobs] == ["tool1", "tool0"]
+    assert [job.status for job in IndexingJobQueue(asyncio.get_running_loop(), state_file).jobs] == [
+        IndexingJobStatus.FAILED,
+        IndexingJobStatus.SUCCEEDED,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cancel_and_interrupt(tmp_path: Path) -> None:
+    state_file = tmp_path / "indexing_jobs.json"
+    queue = IndexingJobQueue(asyncio.get_running_loop(), state_file, workers=1)
+    started = asyncio.Event()
+
+    async def block(_: ProgressCallback) -> None:
+        started.set()
+        await asyncio.Event().wait()
+
+    running = queue.submit("tool0", "Add tool0", block)
+    queued = queue.submit("tool1", "Add tool1", block)
+    with pytest.raises(ValueError):
+        queue.submit("tool0", "Refresh tool0", block)
+    await started.wait()
+
+    # a restart while jobs are active marks them as failed
+    reloaded = IndexingJobQueue(asyncio.get_running_loop(), state_file).jobs
+    assert [(job.status, job.error) for job in reloaded] == [
+        (IndexingJobStatus.FAILED, "Interrupted by a restart.")
+    ] * 2
+
+    assert queue.cancel(queued.id)
+    assert (await queue.wait_async(queued.id)).status == IndexingJobStatus.CANCELLED
+    assert queue.cancel(running.id)
+    assert (await queue.wait_async(running.id)).status == IndexingJobStatus.CANCELLED
+    assert not queue.cancel(running.id)
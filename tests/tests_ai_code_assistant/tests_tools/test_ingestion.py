@@ -0,0 +1,57 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+from typing import Any, AsyncIterator
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from ai_code_assistant.tools.ingestion import ingest_documents_async
+from ai_code_assistant.tools.interfaces import IngestionSettings
+
+
+class RecordingVectorStore(InMemoryVectorStore):
+    def __init__(self) -> None:
+        super().__init__(DeterministicFakeEmbedding(size=4))
+        self.batch_sizes: list[int] = []
+        self.running = 0
+        self.max_running = 0
+
+    async def aadd_documents(self, documents: list[Document], ids: list[str] | None = None, **kwargs: Any) -> list[str]:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.batch_sizes.append(len(documents))
+        self.running -= 1
+        return await super().aadd_documents(documents, ids, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_ingest_documents_async_batches_concurrently() -> None:
+    vector_store = RecordingVectorStore()
+    documents = [Document(page_content=f"document {i}") for i in range(25)]
+
+    added = await ingest_documents_async(vector_store, documents, IngestionSettings(batch_size=4, concurrency=3))
+
+    assert added == 25
+    assert sorted(vector_store.batch_sizes) == [1, 4, 4, 4, 4, 4, 4]
+    assert vector_store.max_running == 3
+    assert len(vector_store.store) == 25
+
+
+@pytest.mark.asyncio
+async def test_ingest_documents_async_from_async_iterable() -> None:
+    vector_store = RecordingVectorStore()
+
+    async def generate() -> AsyncIterator[Document]:
+        for i in range(5):
+            yield Document(page_content=f"document {i}")
+
+    added = await ingest_documents_async(vector_store, generate(), IngestionSettings(batch_size=2, concurrency=1))
+
+    assert added == 5
+    assert vector_store.batch_sizes == [2, 2, 1]
@@ -0,0 +1,47 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import time
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
+
+from ai_code_assistant.tools.lazy_retriever import LazyVectorStoreRetriever
+
+
+class VectorStoreOpener:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self) -> VectorStore:
+        self.count += 1
+        return InMemoryVectorStore.from_texts(["France", "Babe Ruth"], DeterministicFakeEmbedding(size=4))
+
+
+@pytest.mark.asyncio
+async def test_opens_vector_store_on_first_use() -> None:
+    opener = VectorStoreOpener()
+    retriever = LazyVectorStoreRetriever(name="tool", open_vector_store=opener)
+    assert opener.count == 0
+    assert not retriever.is_loaded
+
+    assert len(await retriever.ainvoke("France")) == 2
+    assert len(retriever.invoke("Babe Ruth")) == 2
+    assert opener.count == 1
+    assert retriever.is_loaded
+
+
+def test_unloads_when_idle() -> None:
+    opener = VectorStoreOpener()
+    retriever = LazyVectorStoreRetriever(name="tool", open_vector_store=opener, idle_timeout=0.05)
+
+    retriever.invoke("France")
+    assert retriever.is_loaded
+    time.sleep(0.5)
+    assert not retriever.is_loaded
+
+    retriever.invoke("France")
+    assert opener.count == 2
+    retriever.unload()
@@ -0,0 +1,43 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from ai_code_assistant.tools.lexical_index import LexicalIndex, LexicalRetriever
+
+
+def _document(source: str, content: str) -> Document:
+    return Document(page_content=content, metadata={"source": source, "file_type": Path(source).suffix})
+
+
+def test_search(tmp_path: Path) -> None:
+    index = LexicalIndex(tmp_path / "lexical.sqlite3")
+    index.add_documents(
+        [
+            _document("user.py", "def get_user_name(user_id):\n    return users[user_id].name"),
+            _document("http.py", "class HttpServerConfig:\n    port = 8080"),
+            _document("README.md", "The user name is shown on the profile page."),
+        ]
+    )
+
+    assert [doc.metadata["source"] for doc in index.search("where is get_user_name defined?", k=2)][0] == "user.py"
+    assert [doc.metadata["source"] for doc in index.search("http server config", k=3)] == ["http.py"]
+    assert [doc.metadata["source"] for doc in index.search("user name", k=3, file_types=[".md"])] == ["README.md"]
+    assert index.search("?!", k=3) == []
+
+
+def test_delete_sources_and_reopen(tmp_path: Path) -> None:
+    index = LexicalIndex(tmp_path / "lexical.sqlite3")
+    index.add_documents([_document("a.py", "alpha = 1"), _document("b.py", "alpha = 2")])
+    index.delete_sources(["a.py"])
+    index.close()
+
+    reopened = LexicalIndex(tmp_path / "lexical.sqlite3")
+    retriever = LexicalRetriever(index=reopened, k=4)
+
+    assert [doc.page_content for doc in retriever.invoke("alpha")] == ["alpha = 2"]
+    reopened.clear()
+    assert retriever.invoke("alpha") == []
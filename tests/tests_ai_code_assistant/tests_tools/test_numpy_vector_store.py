@@ -0,0 +1,108 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from pathlib import Path
+from typing import Any
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from ai_code_assistant.tools.interfaces import VectorStoreSettings, VectorStoreType
+from ai_code_assistant.tools.numpy_vector_store import NumpyVectorStore, HNSW_INDEX_FILE_NAME
+
+_EMBEDDING = DeterministicFakeEmbedding(size=16)
+
+
+def _documents(*sources: str) -> list[Document]:
+    return [
+        Document(id=source, page_content=f"content of {source}", metadata={"source": source, "file_type": ".py"})
+        for source in sources
+    ]
+
+
+def _open(directory: Path, hnsw_min_vectors: int | None = None) -> NumpyVectorStore:
+    settings = VectorStoreSettings(type=VectorStoreType.NUMPY, hnsw_min_vectors=hnsw_min_vectors)
+    return NumpyVectorStore(directory, _EMBEDDING, settings)
+
+
+def test_search_and_reopen(tmp_path: Path) -> None:
+    store = _open(tmp_path)
+    store.add_documents(_documents("a.py", "b.py", "c.py"))
+
+    found = store.similarity_search("content of b.py", k=2)
+    assert [document.id for document in found][0] == "b.py"
+    assert len(found) == 2
+    assert store.similarity_search_with_relevance_scores("content of b.py", k=1)[0][1] == pytest.approx(1.0)
+    assert [document.id for document in store.similarity_search("content of b.py", k=3, filter={"source": "c.py"})] == [
+        "c.py"
+    ]
+    assert store.similarity_search("x", k=3, filter={"source": {"$in": ["a.py", "b.py"]}, "file_type": ".md"}) == []
+    assert len(store.max_marginal_relevance_search("content of a.py", k=2, fetch_k=3)) == 2
+
+    reopened = _open(tmp_path)
+    assert len(reopened) == 3
+    assert reopened.get_by_ids(["c.py", "unknown"]) == [_documents("c.py")[0]]
+
+
+def test_filters(tmp_path: Path) -> None:
+    store = _open(tmp_path)
+    store.add_documents(_documents("a.py", "b.py", "c.py", "d.py"))
+    store.add_documents([Document(id="a.py", page_content="a", metadata={"source": "a.md", "file_type": ".md"})])
+    store.delete(["d.py"])
+
+    def search(filter: dict[str, Any]) -> list[str]:
+        return sorted(str(document.id) for document in store.similarity_search("content", k=4, filter=filter))
+
+    assert search({"file_type": ".py"}) == ["b.py", "c.py"]
+    assert search({"file_type": {"$ne": ".py"}}) == ["a.py"]
+    assert search({"source": {"$nin": ["b.py"]}, "file_type": {"$in": [".py", ".md"]}}) == ["a.py", "c.py"]
+    # keys without a column are matched row by row
+    assert search({"page": {"$eq": None}, "source": "c.py"}) == ["c.py"]
+    with pytest.raises(ValueError):
+        search({"source": {"$gt": "a"}})
+
+
+def test_reopen_after_interrupted_write(tmp_path: Path) -> None:
+    store = _open(tmp_path)
+    store.add_documents(_documents("a.py", "b.py"))
+    # vectors without records and a partially written record
+    with (tmp_path / "vectors.f32").open("ab") as file:
+        file.write(b"\0" * (16 * 4 * 3 + 5))
+    with (tmp_path / "records.jsonl").open("a", encoding="utf-8") as file:
+        file.write('{"id": "c.py", "te')
+
+    reopened = _open(tmp_path)
+    assert len(reopened) == 2
+    assert (tmp_path / "vectors.f32").stat().st_size == 2 * 16 * 4
+    reopened.add_documents(_documents("c.py"))
+    reopened = _open(tmp_path)
+    assert [document.id for document in reopened.similarity_search("content of c.py", k=3)][0] == "c.py"
+    assert reopened.get_by_ids(["a.py", "c.py"]) == _documents("a.py", "c.py")
+
+
+@pytest.mark.asyncio
+async def test_upsert_delete_and_compact(tmp_path: Path) -> None:
+    store = _open(tmp_path)
+    await store.aadd_documents(_documents("a.py", "b.py", "c.py"))
+    await store.aadd_documents([Document(id="a.py", page_content="new a", metadata={"source": "a.py"})])
+    assert store.delete_sources(["b.py", "c.py"]) == 2
+
+    # 3 of 4 rows were replaced or deleted, so the files have been compacted to the live row
+    assert (tmp_path / "vectors.f32").stat().st_size == 16 * 4
+    for opened in [store, _open(tmp_path)]:
+        assert len(opened) == 1
+        assert [document.page_content for document in opened.similarity_search("content", k=4)] == ["new a"]
+
+
+def test_hnsw_index(tmp_path: Path) -> None:
+    store = _open(tmp_path, hnsw_min_vectors=2)
+    store.add_documents(_documents(*[f"{index}.py" for index in range(20)]))
+
+    assert [document.id for document in store.similarity_search("content of 7.py", k=1)] == ["7.py"]
+    assert (tmp_path / HNSW_INDEX_FILE_NAME).exists()
+    store.add_documents(_documents("new.py"))
+    assert [document.id for document in store.similarity_search("content of new.py", k=1)] == ["new.py"]
+    # filtered out candidates of the HNSW index fall back to the brute-force search
+    assert [document.id for document in store.similarity_search("x", k=2, filter={"source": "3.py"})] == ["3.py"]
@@ -0,0 +1,95 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import io
+from pathlib import Path
+
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from ai_code_assistant.tools.interfaces import PdfDocumentSourceSettings, IndexingStage, ChunkingSettings
+from ai_code_assistant.common.app_context import AppContext
+from ai_code_assistant.tools.pdf_source import (
+    iter_pdf_chunks_async,
+    pdf_upload_path,
+    save_pdf_upload,
+    count_pdf_pages,
+)
+from ai_code_assistant.tools.interfaces import RetrieverToolSettings
+
+
+def _write_pdf(file_path: Path, page_count: int) -> None:
+    writer = PdfWriter()
+    font = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+    )
+    for number in range(page_count):
+        page = writer.add_blank_page(width=200, height=200)
+        contents = DecodedStreamObject()
+        contents.set_data(f"BT /F1 12 Tf 20 100 Td (page {number}) Tj ET".encode("ascii"))
+        page[NameObject("/Contents")] = writer._add_object(contents)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+    with open(file_path, "wb") as file:
+        writer.write(file)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("page_count", [3, 7])
+async def test_iter_pdf_chunks_async(tmp_path: Path, page_count: int) -> None:
+    file_path = tmp_path / "manual.pdf"
+    _write_pdf(file_path, page_count)
+    source = PdfDocumentSourceSettings(file_path=str(file_path), pages_per_task=3, max_workers=2)
+    progress: list[tuple[IndexingStage, int, int]] = []
+
+    chunks = [
+        chunk
+        async for chunk in iter_pdf_chunks_async(
+            source,
+            ChunkingSettings(chunk_size=4, chunk_overlap=0),
+            lambda stage, parsed, total: progress.append((stage, parsed, total)),
+        )
+    ]
+
+    assert [chunk.page_content for chunk in chunks] == [
+        text for number in range(page_count) for text in ["page", str(number)]
+    ]
+    assert [chunk.metadata for chunk in chunks] == [
+        {"source": str(file_path), "page": number, "start_index": start_index}
+        for number in range(page_count)
+        for start_index in [0, 5]
+    ]
+    assert progress[0] == (IndexingStage.LOAD, 0, page_count)
+    assert progress[-2:] == [(IndexingStage.LOAD, page_count, page_count), (IndexingStage.SPLIT, 2 * page_count, 0)]
+
+
+def test_save_pdf_upload(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("ai_code_assistant.tools.pdf_source.UPLOAD_CHUNK_SIZE", 16)
+    uploaded = tmp_path / "uploaded.pdf"
+    _write_pdf(uploaded, 2)
+    file_path = pdf_upload_path(AppContext(data_dir=tmp_path / "data"), "manual")
+
+    size = save_pdf_upload(io.BytesIO(uploaded.read_bytes()), file_path)
+
+    assert file_path == tmp_path / "data" / "uploads" / "manual.pdf"
+    assert size == uploaded.stat().st_size
+    assert file_path.read_bytes() == uploaded.read_bytes()
+    assert list(file_path.parent.iterdir()) == [file_path]
+    assert count_pdf_pages(str(file_path)) == 2
+
+
+@pytest.mark.parametrize("source_name", ["../x", "a/b", "a\\b", "..", ""])
+def test_pdf_upload_path_rejects_paths(tmp_path: Path, source_name: str) -> None:
+    with pytest.raises(ValueError):
+        pdf_upload_path(AppContext(data_dir=tmp_path), source_name)
+    with pytest.raises(ValueError):
+        RetrieverToolSettings.of_pdf_source(source_name=source_name, file_path="manual.pdf")
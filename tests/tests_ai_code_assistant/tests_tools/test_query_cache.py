@@ -0,0 +1,71 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from pathlib import Path
+
+import pytest
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from ai_code_assistant.tools.interfaces import QueryCacheSettings
+from ai_code_assistant.tools.query_cache import CachedRetriever, QueryResultCache, normalize_query
+
+
+class CountingRetriever(BaseRetriever):
+    calls: int = 0
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        self.calls += 1
+        return [Document(page_content=f"result of {query}", metadata={"source": "a.py"})]
+
+
+def test_normalize_query() -> None:
+    assert normalize_query("  Where is  AiAssistant defined? ") == "where is aiassistant defined"
+
+
+@pytest.mark.asyncio
+async def test_cached_retriever() -> None:
+    base = CountingRetriever()
+    cache = QueryResultCache(QueryCacheSettings())
+    retriever = CachedRetriever(retriever=base, cache=cache, namespace="tool\0v1")
+    other_version = CachedRetriever(retriever=base, cache=cache, namespace="tool\0v2")
+
+    first = await retriever.ainvoke("Where is foo?")
+    second = retriever.invoke("where is   foo")
+    second[0].metadata["source"] = "changed.py"
+
+    assert base.calls == 1
+    assert first == [Document(page_content="result of Where is foo?", metadata={"source": "a.py"})]
+    assert (await retriever.ainvoke("where is foo"))[0].metadata["source"] == "a.py"
+    other_version.invoke("where is foo")
+    assert base.calls == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_eviction_and_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [1000.0]
+    monkeypatch.setattr("ai_code_assistant.tools.query_cache.time.time", lambda: now[0])
+    cache = QueryResultCache(QueryCacheSettings(max_entries=2, ttl_seconds=10))
+    documents = [Document(page_content="content")]
+
+    cache.put("a", documents)
+    cache.put("b", documents)
+    assert cache.get("a") == documents
+    cache.put("c", documents)
+    assert cache.get("b") is None
+    now[0] += 11
+    assert cache.get("a") is None
+
+
+def test_persistent(tmp_path: Path) -> None:
+    settings = QueryCacheSettings(persistent=True)
+    cache = QueryResultCache(settings, tmp_path / "query_cache.sqlite3")
+    cache.put("key", [Document(page_content="content", metadata={"source": "a.py", "start_index": 3})])
+    cache.close()
+
+    reopened = QueryResultCache(settings, tmp_path / "query_cache.sqlite3")
+
+    assert reopened.get("key") == [Document(page_content="content", metadata={"source": "a.py", "start_index": 3})]
+    assert reopened.get("other") is None
@@ -0,0 +1,96 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import uuid
+from pathlib import Path
+
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from ai_code_assistant.tools.interfaces import RetrieverSearchSettings
+from ai_code_assistant.tools.lexical_index import LexicalIndex
+from ai_code_assistant.tools.retriever_search import (
+    create_vector_store_retriever,
+    search_kwargs,
+    create_hybrid_retriever,
+)
+
+_DOCUMENTS = [
+    Document(page_content=f"content {path}", metadata={"source": path, "file_type": "." + path.split(".")[-1]})
+    for path in ["src/a.py", "src/b.py", "docs/c.md", "tests/d.py"]
+]
+
+
+@pytest.fixture
+def vector_store() -> Chroma:
+    vector_store = Chroma(collection_name=uuid.uuid4().hex, embedding_function=DeterministicFakeEmbedding(size=8))
+    vector_store.add_documents(_DOCUMENTS)
+    return vector_store
+
+
+def test_search_kwargs() -> None:
+    assert search_kwargs(RetrieverSearchSettings()) == {"k": 4}
+    assert search_kwargs(RetrieverSearchSettings(search_type="mmr", k=3, fetch_k=10, lambda_mult=0.2)) == {
+        "k": 3,
+        "fetch_k": 10,
+        "lambda_mult": 0.2,
+    }
+    assert search_kwargs(
+        RetrieverSearchSettings(
+            search_type="similarity_score_threshold", score_threshold=0.3, include_extensions=[".py"]
+        )
+    ) == {"k": 4, "score_threshold": 0.3, "filter": {"file_type": {"$in": [".py"]}}}
+    assert search_kwargs(RetrieverSearchSettings(k=2, fetch_k=10, path_patterns=["src/*"])) == {"k": 10}
+
+
+def test_score_threshold_is_required() -> None:
+    with pytest.raises(ValueError):
+        RetrieverSearchSettings(search_type="similarity_score_threshold")
+
+
+def test_create_vector_store_retriever_filters(vector_store: Chroma) -> None:
+    by_extension = create_vector_store_retriever(vector_store, RetrieverSearchSettings(include_extensions=[".md"]))
+    by_path = create_vector_store_retriever(vector_store, RetrieverSearchSettings(k=1, path_patterns=["src/*"]))
+
+    assert [document.metadata["source"] for document in by_extension.invoke("content")] == ["docs/c.md"]
+    assert [document.metadata["source"][:4] for document in by_path.invoke("content")] == ["src/"]
+
+
+@pytest.mark.asyncio
+async def test_create_vector_store_retriever_mmr(vector_store: Chroma) -> None:
+    retriever = create_vector_store_retriever(vector_store, RetrieverSearchSettings(search_type="mmr", k=2, fetch_k=4))
+
+    documents = await retriever.ainvoke("content")
+
+    assert len(documents) == 2
+
+
+def test_create_hybrid_retriever(vector_store: Chroma, tmp_path: Path) -> None:
+    lexical_index = LexicalIndex(tmp_path / "lexical.sqlite3")
+    lexical_index.add_documents(_DOCUMENTS)
+    settings = RetrieverSearchSettings(k=1, path_patterns=["tests/*"])
+    vector_retriever = create_vector_store_retriever(vector_store, settings)
+
+    hybrid = create_hybrid_retriever(vector_retriever, lexical_index, settings)
+    vector_only = create_hybrid_retriever(
+        vector_retriever, lexical_index, settings.model_copy(update={"lexical_weight": 0})
+    )
+
+    assert [document.metadata["source"] for document in hybrid.invoke("tests/d.py")] == ["tests/d.py"]
+    assert vector_only is vector_retriever
+
+
+@pytest.mark.asyncio
+async def test_create_hybrid_retriever_returns_k_chunks(vector_store: Chroma, tmp_path: Path) -> None:
+    lexical_index = LexicalIndex(tmp_path / "lexical.sqlite3")
+    lexical_index.add_documents(_DOCUMENTS)
+    settings = RetrieverSearchSettings(k=2)
+
+    hybrid = create_hybrid_retriever(create_vector_store_retriever(vector_store, settings), lexical_index, settings)
+
+    # the vector and the lexical search each return 2 chunks, which are not all the same
+    assert len(hybrid.invoke("content src/a.py docs/c.md tests/d.py")) == 2
+    assert len(await hybrid.ainvoke("content")) <= 2
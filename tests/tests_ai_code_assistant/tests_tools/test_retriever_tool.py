@@ -0,0 +1,149 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+from pathlib import Path
+
+import pytest
+from git import Repo
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from ai_code_assistant.common.app_context import AppContext
+from ai_code_assistant.tools.index_versions import IndexVersions, VERSIONS_DIR_NAME
+from ai_code_assistant.tools.interfaces import RetrieverToolSettings, IndexingStage, VectorStoreType
+from ai_code_assistant.tools.numpy_vector_store import NumpyVectorStore
+from ai_code_assistant.tools.lexical_index import LexicalIndex, LEXICAL_INDEX_FILE_NAME
+from ai_code_assistant.tools.retriever_tool import RetrieverTool
+
+
+@pytest.fixture
+def app_context(tmp_path: Path) -> AppContext:
+    return AppContext(
+        data_dir=tmp_path / "data",
+        db_dir=tmp_path / "db",
+        repository_dir=tmp_path / "repository",
+        tools_dir_path=tmp_path / "tools",
+    )
+
+
+@pytest.fixture(autouse=True)
+def fake_embedding(monkeypatch: pytest.MonkeyPatch) -> None:
+    def create_fake_embedding(*_: object, **__: object) -> Embeddings:
+        return DeterministicFakeEmbedding(size=8)
+
+    monkeypatch.setattr("ai_code_assistant.tools.retriever_tool.create_embedding", create_fake_embedding)
+
+
+def _commit(repo: Repo, files: dict[str, str | None]) -> str:
+    work_dir = Path(str(repo.working_tree_dir))
+    for name, content in files.items():
+        if content is None:
+            repo.index.remove([name], working_tree=True)
+        else:
+            (work_dir / name).write_text(content, encoding="utf-8")
+            repo.index.add([name])
+    return repo.index.commit("commit").hexsha
+
+
+def _sources(app_context: AppContext, tool_settings: RetrieverToolSettings) -> list[str]:
+    vector_store = Chroma(
+        collection_name=tool_settings.name,
+        persist_directory=str(IndexVersions(app_context.db_dir / tool_settings.name).current_dir()),
+    )
+    return sorted(str(metadata["source"]) for metadata in vector_store.get()["metadatas"])
+
+
+@pytest.mark.asyncio
+async def test_refresh_tool_async_is_incremental(tmp_path: Path, app_context: AppContext) -> None:
+    remote = Repo.init(tmp_path / "remote", initial_branch="main")
+    first_commit = _commit(remote, {"a.py": "a = 1\n", "b.py": "b = 1\n"})
+    tool_settings = RetrieverToolSettings.of_git_source(
+        source_name="repo",
+        clone_url=str(remote.working_tree_dir),
+        branch="main",
+    )
+
+    progress: dict[IndexingStage, tuple[int, int]] = {}
+
+    def on_progress(stage: IndexingStage, processed: int, total: int) -> None:
+        progress[stage] = (processed, total)
+
+    _, index_state = await RetrieverTool.create_tool_async(tool_settings, app_context, on_progress)
+    assert index_state.indexed_commit == first_commit
+    assert IndexVersions(app_context.db_dir / "repo").current == index_state.version
+    assert progress == {
+        IndexingStage.CLONE: (1, 1),
+        IndexingStage.LOAD: (2, 2),
+        IndexingStage.SPLIT: (2, 0),
+        IndexingStage.EMBED: (2, 0),
+    }
+    assert _sources(app_context, tool_settings) == ["a.py", "b.py"]
+
+    unchanged_state = (await RetrieverTool.refresh_tool_async(tool_settings, app_context, index_state))[1]
+    assert unchanged_state.version == index_state.version
+
+    second_commit = _commit(remote, {"a.py": "a = 2\n", "b.py": None, "c.py": "c = 1\n"})
+    _, new_index_state = await RetrieverTool.refresh_tool_async(tool_settings, app_context, index_state)
+    assert new_index_state.version != index_state.version
+    first_version, index_state = index_state.version, new_index_state
+    assert index_state.indexed_commit == second_commit
+    versions = IndexVersions(app_context.db_dir / "repo")
+    assert versions.current == index_state.version
+    # the incremental update is applied to a copy, so the replaced version is still intact
+    assert (versions.version_dir(first_version) / LEXICAL_INDEX_FILE_NAME).exists()
+    assert _sources(app_context, tool_settings) == ["a.py", "c.py"]
+    lexical_index = LexicalIndex(versions.current_dir() / LEXICAL_INDEX_FILE_NAME)
+    assert [document.page_content for document in lexical_index.search("a b c", k=10)] == ["a = 2", "c = 1"]
+
+
+@pytest.mark.asyncio
+async def test_create_tool_async_swaps_versions(tmp_path: Path, app_context: AppContext) -> None:
+    remote = Repo.init(tmp_path / "remote", initial_branch="main")
+    _commit(remote, {"a.py": "a = 1\n"})
+    tool_settings = RetrieverToolSettings.of_git_source(
+        source_name="repo",
+        clone_url=str(remote.working_tree_dir),
+        branch="main",
+    )
+    versions = IndexVersions(app_context.db_dir / "repo")
+
+    states = [(await RetrieverTool.create_tool_async(tool_settings, app_context))[1] for _ in range(3)]
+    assert versions.current == states[2].version
+    assert sorted(path.name for path in (app_context.db_dir / "repo" / VERSIONS_DIR_NAME).iterdir()) == sorted(
+        state.version for state in states[1:]
+    )
+    assert _sources(app_context, tool_settings) == ["a.py"]
+
+    await RetrieverTool.load_tool_async(tool_settings, app_context, states[0])
+
+
+@pytest.mark.asyncio
+async def test_numpy_vector_store(tmp_path: Path, app_context: AppContext) -> None:
+    remote = Repo.init(tmp_path / "remote", initial_branch="main")
+    _commit(remote, {"a.py": "a = 1\n", "b.py": "b = 1\n"})
+    tool_settings = RetrieverToolSettings.of_git_source(
+        source_name="repo",
+        clone_url=str(remote.working_tree_dir),
+        branch="main",
+    )
+    _, index_state = await RetrieverTool.create_tool_async(tool_settings, app_context)
+    assert index_state.vector_store == VectorStoreType.CHROMA
+
+    # switching the backend re-creates the index instead of updating it incrementally
+    tool_settings.vector_store.type = VectorStoreType.NUMPY
+    _commit(remote, {"b.py": None, "c.py": "c = 1\n"})
+    _, index_state = await RetrieverTool.refresh_tool_async(tool_settings, app_context, index_state)
+    assert index_state.vector_store == VectorStoreType.NUMPY
+
+    _commit(remote, {"a.py": None})
+    _, index_state = await RetrieverTool.refresh_tool_async(tool_settings, app_context, index_state)
+    vector_store = NumpyVectorStore(
+        IndexVersions(app_context.db_dir / "repo").current_dir(),
+        DeterministicFakeEmbedding(size=8),
+        tool_settings.vector_store,
+    )
+    assert [document.metadata["source"] for document in vector_store.similarity_search("c", k=4)] == ["c.py"]
+
+    tool = await RetrieverTool.load_tool_async(tool_settings, app_context, index_state)
+    assert "c = 1" in await tool.ainvoke("c")
@@ -0,0 +1,77 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import pytest
+from langchain_core.documents import Document
+from langchain_text_splitters import Language
+
+from ai_code_assistant.tools.interfaces import ChunkingSettings
+from ai_code_assistant.tools.text_splitters import DocumentSplitter, LANGUAGES_BY_EXTENSION
+
+_PYTHON_SOURCE = """import os
+
+
+class Foo:
+    def bar(self) -> None:
+        print("bar bar bar bar bar bar")
+
+
+def baz() -> None:
+    print("baz baz baz baz baz baz")
+"""
+
+
+def test_split_document_by_language() -> None:
+    splitter = DocumentSplitter(ChunkingSettings(chunk_size=80, chunk_overlap=0))
+    document = Document(page_content=_PYTHON_SOURCE, metadata={"source": "foo.py", "file_type": ".py"})
+
+    chunks = splitter.split_document(document)
+
+    assert [chunk.page_content.split("\n")[0] for chunk in chunks] == [
+        "import os",
+        "class Foo:",
+        "def baz() -> None:",
+    ]
+    assert all(chunk.metadata["source"] == "foo.py" for chunk in chunks)
+    assert all(_PYTHON_SOURCE[chunk.metadata["start_index"] :].startswith(chunk.page_content) for chunk in chunks)
+
+
+@pytest.mark.parametrize("file_type", sorted(LANGUAGES_BY_EXTENSION))
+def test_split_document_for_every_extension(file_type: str) -> None:
+    document = Document(page_content="print 1;\n\nprint 2;", metadata={"file_type": file_type})
+
+    chunks = DocumentSplitter().split_document(document)
+
+    assert [chunk.page_content for chunk in chunks] == ["print 1;\n\nprint 2;"]
+
+
+def test_split_document_of_language_without_separators(monkeypatch: pytest.MonkeyPatch) -> None:
+    # langchain_text_splitters has no separators for Perl
+    monkeypatch.setitem(LANGUAGES_BY_EXTENSION, ".pl", Language.PERL)
+    splitter = DocumentSplitter(ChunkingSettings(chunk_size=10, chunk_overlap=0))
+    document = Document(page_content="aaaa bbbb cccc", metadata={"file_type": ".pl"})
+
+    chunks = splitter.split_document(document)
+
+    assert [chunk.page_content for chunk in chunks] == ["aaaa bbbb", "cccc"]
+
+
+def test_split_document_without_language() -> None:
+    splitter = DocumentSplitter(ChunkingSettings(chunk_size=10, chunk_overlap=0))
+    document = Document(page_content="aaaa bbbb cccc", metadata={"source": "manual.pdf", "page": 0})
+
+    chunks = splitter.split_document(document)
+
+    assert [chunk.page_content for chunk in chunks] == ["aaaa bbbb", "cccc"]
+    assert chunks[1].metadata == {"source": "manual.pdf", "page": 0, "start_index": 10}
+
+
+@pytest.mark.asyncio
+async def test_split_documents_async() -> None:
+    splitter = DocumentSplitter(ChunkingSettings(chunk_size=10, chunk_overlap=0))
+    documents = [Document(page_content="aaaa bbbb cccc"), Document(page_content="dddd")]
+
+    chunks = [chunk async for chunk in splitter.split_documents_async(documents)]
+
+    assert [chunk.page_content for chunk in chunks] == ["aaaa bbbb", "cccc", "dddd"]
@@ -14,6 +14,7 @@ from ai_code_assistant.tools.interfaces import (
     GitDocumentSourceSettings,
     ToolType,
     ModelServiceType,
+    ToolIndexState,
 )
 from ai_code_assistant.tools.tool_settings_manager import ToolSettingsManager
 
@@ -79,3 +80,16 @@ async def test_save_tool_setting(app_context: AppContext) -> None:
 
     tools2 = await toolkit.load_tool_settings()
     assert len(tools2) == 0
+
+
+@pytest.mark.asyncio
+async def test_save_index_state(app_context: AppContext) -> None:
+    toolkit = ToolSettingsManager(app_context)
+    state0 = await toolkit.load_index_state("tool2")
+    assert state0.indexed_commit is None
+
+    await toolkit.save_index_state("tool2", ToolIndexState(indexed_commit="0123abcd"))
+    assert app_context.tools_dir_path.joinpath("tool2").joinpath("index_state.json").exists()
+
+    state1 = await toolkit.load_index_state("tool2")
+    assert state1.indexed_commit == "0123abcd"
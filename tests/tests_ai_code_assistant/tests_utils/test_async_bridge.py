@@ -0,0 +1,90 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import asyncio
+import threading
+from typing import AsyncIterator, Iterator
+
+import pytest
+
+from ai_code_assistant.utils.async_bridge import BackgroundEventLoop
+
+
+@pytest.fixture
+def event_loop_thread() -> Iterator[BackgroundEventLoop]:
+    event_loop = BackgroundEventLoop()
+    yield event_loop
+    event_loop.close()
+
+
+async def _count(n: int, delay: float = 0.0) -> AsyncIterator[int]:
+    for i in range(n):
+        await asyncio.sleep(delay)
+        yield i
+
+
+def test_run(event_loop_thread: BackgroundEventLoop) -> None:
+    async def add(a: int, b: int) -> int:
+        return a + b
+
+    assert event_loop_thread.run(add(1, 2)) == 3
+
+
+def test_run_async(event_loop_thread: BackgroundEventLoop) -> None:
+    async def loop_of_coroutine() -> asyncio.AbstractEventLoop:
+        return asyncio.get_running_loop()
+
+    async def run_from_other_loop() -> asyncio.AbstractEventLoop:
+        return await event_loop_thread.run_async(loop_of_coroutine())
+
+    assert asyncio.run(run_from_other_loop()) is event_loop_thread.loop
+    assert event_loop_thread.run(run_from_other_loop()) is event_loop_thread.loop
+
+
+def test_iterate(event_loop_thread: BackgroundEventLoop) -> None:
+    assert list(event_loop_thread.iterate(_count(5))) == [0, 1, 2, 3, 4]
+
+
+def test_iterate_concurrently(event_loop_thread: BackgroundEventLoop) -> None:
+    results: dict[int, list[int]] = {}
+
+    def consume(index: int) -> None:
+        results[index] = list(event_loop_thread.iterate(_count(10, delay=0.01)))
+
+    threads = [threading.Thread(target=consume, args=(index,)) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {index: list(range(10)) for index in range(3)}
+
+
+def test_iterate_raises_errors(event_loop_thread: BackgroundEventLoop) -> None:
+    async def fail() -> AsyncIterator[int]:
+        yield 1
+        raise ValueError("error")
+
+    iterator = event_loop_thread.iterate(fail())
+    assert next(iterator) == 1
+    with pytest.raises(ValueError):
+        next(iterator)
+
+
+def test_iterate_cancels_on_close(event_loop_thread: BackgroundEventLoop) -> None:
+    cancelled = threading.Event()
+
+    async def endless() -> AsyncIterator[int]:
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield 1
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    iterator = event_loop_thread.iterate(endless())
+    assert next(iterator) == 1
+    iterator.close()
+    assert cancelled.wait(timeout=5)
@@ -0,0 +1,33 @@
+#  Copyright (c) 2024 LongbowXXX
+#
+#  This software is released under the MIT License.
+#  http://opensource.org/licenses/mit-license.php
+import operator
+import time
+from contextlib import aclosing
+
+import pytest
+
+from ai_code_assistant.utils.process_pool import map_in_processes_async
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("task_count", [0, 1, 9])
+async def test_map_in_processes_async(task_count: int) -> None:
+    tasks = [(number, number) for number in range(task_count)]
+
+    results = [result async for result in map_in_processes_async(operator.mul, tasks, max_workers=2)]
+
+    assert results == [number * number for number in range(task_count)]
+
+
+@pytest.mark.asyncio
+async def test_map_in_processes_async_does_not_wait_when_closed() -> None:
+    tasks = [(0.0,), (5.0,), (5.0,)]
+
+    async with aclosing(map_in_processes_async(time.sleep, tasks, max_workers=2)) as results:
+        async for _ in results:
+            break
+        start = time.perf_counter()
+    # the running task is not waited for
+    assert time.perf_counter() - start < 1.0